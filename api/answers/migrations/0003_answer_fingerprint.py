@@ -0,0 +1,35 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+from utils.fingerprint import fill_fingerprints
+
+
+def fill_answer_fingerprints(apps, schema_editor):
+    """
+    Fingerprints the bodies of existing answers
+    """
+    Answer = apps.get_model('answers', 'Answer')
+    fill_fingerprints(Answer.objects.all(), 'fingerprint', ('body',), ('question_id',))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('questions', '0009_question_fingerprint'),
+        ('answers', '0002_remove_answervote_votes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='fingerprint',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_answer_fingerprints, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='answer',
+            unique_together={('question', 'fingerprint')},
+        ),
+    ]
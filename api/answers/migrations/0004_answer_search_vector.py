@@ -0,0 +1,46 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def fill_answer_search_vectors(apps, schema_editor):
+    """
+    Computes the search vectors of existing answers in batches
+    """
+    Answer = apps.get_model('answers', 'Answer')
+    vector = (
+        SearchVector('body', config='english')
+    )
+    batch = []
+    ids = Answer.objects.order_by('pk').values_list('pk', flat=True)
+    for pk in ids.iterator(chunk_size=2000):
+        batch.append(pk)
+        if len(batch) == 2000:
+            Answer.objects.filter(pk__in=batch).update(search_vector=vector)
+            batch = []
+    if batch:
+        Answer.objects.filter(pk__in=batch).update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('answers', '0003_answer_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_answer_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='answer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='answer_search_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:41
+
+from django.conf import settings
+from django.db import migrations
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """
+    Keeps the latest vote of a user on an answer
+    """
+    AnswerVote = apps.get_model('answers', 'AnswerVote')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            DELETE FROM {votes} a USING {votes} b
+            WHERE a.answer_id = b.answer_id AND a.creator_id = b.creator_id
+            AND (a.updated_on, a.id) < (b.updated_on, b.id)
+        """.format(votes=AnswerVote._meta.db_table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('answers', '0004_answer_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='answervote',
+            unique_together={('creator', 'answer')},
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 2.2.10 on 2026-10-18 11:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+
+def fill_votes(apps, schema_editor):
+    """
+    Converts the vote types of existing votes to vote values in batches
+    walked by id, each batch is committed on its own. Votes without an
+    upvote or downvote type are not votes and are removed with their batch
+    """
+    AnswerVote = apps.get_model('answers', 'AnswerVote')
+    table = AnswerVote._meta.db_table
+    last_id = '00000000-0000-0000-0000-000000000000'
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute("""
+                WITH batch AS (
+                    SELECT id, vote_type NOT IN ('upvote', 'downvote') AS invalid
+                    FROM {table} WHERE id > %s ORDER BY id LIMIT %s
+                ),
+                removed AS (
+                    DELETE FROM {table} v USING batch
+                    WHERE v.id = batch.id AND batch.invalid
+                ),
+                converted AS (
+                    UPDATE {table} v
+                    SET vote = CASE v.vote_type WHEN 'upvote' THEN 1 ELSE -1 END
+                    FROM batch WHERE v.id = batch.id AND batch.invalid IS NOT TRUE
+                )
+                SELECT id FROM batch
+            """.format(table=table), [last_id, BATCH_SIZE])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            last_id = max(ids)
+
+
+def fill_vote_types(apps, schema_editor):
+    """
+    Converts vote values back to vote types in batches
+    """
+    AnswerVote = apps.get_model('answers', 'AnswerVote')
+    table = AnswerVote._meta.db_table
+    last_id = '00000000-0000-0000-0000-000000000000'
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute("""
+                WITH batch AS (
+                    SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s
+                )
+                UPDATE {table} v
+                SET vote_type = CASE WHEN v.vote >= 1 THEN 'upvote' ELSE 'downvote' END
+                FROM batch WHERE v.id = batch.id
+                RETURNING v.id
+            """.format(table=table), [last_id, BATCH_SIZE])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            last_id = max(ids)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('answers', '0005_answervote_voter_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answervote',
+            name='vote',
+            field=models.SmallIntegerField(choices=[(1, 'upvote'), (-1, 'downvote')], null=True),
+        ),
+        migrations.RunPython(fill_votes, fill_vote_types),
+        migrations.RemoveField(
+            model_name='answervote',
+            name='vote_type',
+        ),
+        migrations.AlterField(
+            model_name='answervote',
+            name='vote',
+            field=models.SmallIntegerField(choices=[(1, 'upvote'), (-1, 'downvote')]),
+        ),
+        migrations.AlterField(
+            model_name='answervote',
+            name='answer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='answers.Answer'),
+        ),
+        migrations.AddIndex(
+            model_name='answervote',
+            index=models.Index(fields=['answer', 'vote'], name='answervote_answer_vote_idx'),
+        ),
+    ]
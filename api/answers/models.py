@@ -4,31 +4,98 @@ Models for the answers
 import uuid
 import datetime
 
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField
+)
+from django.db import connections, models, transaction
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
 from users.models import User
 from questions.models import Question
+from utils.fingerprint import content_fingerprint
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+
+class AnswerQuerySet(models.QuerySet):
+    """
+    Queryset for answers
+    """
+
+    def with_votes(self) -> 'AnswerQuerySet':
+        """
+        Annotates answers with their vote statistics and joins the creator
+        so that serializing a page does not query per answer
+        """
+        return self.select_related('creator').annotate(
+            upvotes=Count('answervote', filter=Q(answervote__vote=1)),
+            downvotes=Count('answervote', filter=Q(answervote__vote=-1))
+        ).annotate(vote_score=F('upvotes') - F('downvotes'))
+
+    def update_search_vector(self) -> int:
+        """
+        Recomputes the stored full text search vector of the answers
+        """
+        return self.update(search_vector=Answer.SEARCH_VECTOR)
+
+    def search(self, text: str) -> 'AnswerQuerySet':
+        """
+        Filters answers matching the search text through the GIN index
+        on search_vector and ranks them from the best match
+        """
+        query = SearchQuery(text, config=Answer.SEARCH_CONFIG)
+        # ts_rank returns real, a double precision rank round-trips exactly
+        # through the cursors of paginated searches
+        return self.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        ).order_by('-rank', '-date_created_on')
 
 
 class Answer(models.Model):
     """
     Database Model for Answer
     """
+    SEARCH_CONFIG = 'english'
+    SEARCH_VECTOR = SearchVector('body', config=SEARCH_CONFIG)
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     date_created_on = models.DateTimeField(auto_now_add=True)
     date_updated_on = models.DateTimeField(auto_now=True)
     body = models.TextField()
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    fingerprint = models.CharField(
+        max_length=64, null=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = AnswerQuerySet.as_manager()
 
     class Meta:
         ordering = ['-date_created_on']
+        unique_together = ('question', 'fingerprint')
+        indexes = [
+            GinIndex(fields=['search_vector'], name='answer_search_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.fingerprint = content_fingerprint(self.body)
+        super().save(*args, **kwargs)
+        Answer.objects.filter(id=self.id).update_search_vector()
 
     @property
     def votes(self):
-        upvotes = AnswerVote.objects.filter(answer=self.id,
-                                            vote_type='upvote').count()
-        downvotes = AnswerVote.objects.filter(answer=self.id,
-                                              vote_type='downvote').count()
+        if hasattr(self, 'vote_score'):
+            return {
+                'upvotes': self.upvotes,
+                'downvotes': self.downvotes,
+                'vote_score': self.vote_score
+            }
+        upvotes = AnswerVote.objects.filter(answer=self.id, vote=1).count()
+        downvotes = AnswerVote.objects.filter(answer=self.id, vote=-1).count()
         votes = upvotes-downvotes
         resultset = {
             'upvotes': upvotes,
@@ -41,19 +108,115 @@ class Answer(models.Model):
         return self.body + " on " + self.date_created_on.strftime('%m-%d-%Y')
 
 
+class AnswerVoteQuerySet(models.QuerySet):
+    """
+    Queryset for answer votes
+    """
+
+    def upsert_votes(self, creator: User, votes: Dict[UUID, int]) -> Dict[UUID, Optional[int]]:
+        """
+        Writes the votes of creator on many answers, returns the previous
+        vote of every answer whose vote changed
+        """
+        changes = self.upsert_voter_votes({
+            (answer_id, creator.id): vote for answer_id, vote in votes.items()
+        })
+        return {answer_id: previous_vote
+                for (answer_id, creator_id), previous_vote in changes.items()}
+
+    def upsert_voter_votes(self, votes: Dict[Tuple[UUID, UUID], int]) -> Dict[Tuple[UUID, UUID], Optional[int]]:
+        """
+        Writes votes keyed by (answer id, creator id). First time votes are
+        inserted by an INSERT ... ON CONFLICT DO NOTHING statement that waits
+        for concurrent inserts of the same keys, the other votes are then
+        updated from the vote rows locked by SELECT ... FOR UPDATE. Returns
+        the vote actually overwritten for every key whose vote changed,
+        None for a first time vote, keys already holding the same vote are
+        left out
+        """
+        if not votes:
+            return {}
+        vote_table = AnswerVote._meta.db_table
+        # sorted keys and answer locks taken in id order before any vote
+        # row keep concurrent requests voting on the same answers from
+        # locking them in opposite orders
+        votes = sorted(votes.items(), key=lambda item: (str(item[0][0]), str(item[0][1])))
+        with transaction.atomic(using=self.db, savepoint=False), connections[self.db].cursor() as cursor:
+            rows = ', '.join(
+                ['(%s::uuid, %s::uuid, %s::uuid, %s::smallint)'] * len(votes))
+            params = []
+            for (answer_id, creator_id), vote in votes:
+                params.extend([uuid.uuid4(), answer_id, creator_id, vote])
+            cursor.execute("""
+                WITH input (id, answer_id, creator_id, vote) AS (VALUES {rows}),
+                locked AS (
+                    SELECT id FROM {answers}
+                    WHERE id IN (SELECT answer_id FROM input)
+                    ORDER BY id FOR NO KEY UPDATE
+                )
+                INSERT INTO {votes} (id, vote, answer_id, creator_id, created_on, updated_on)
+                SELECT id, vote, answer_id, creator_id, now(), now() FROM input
+                WHERE (SELECT count(*) FROM locked) >= 0
+                ON CONFLICT (creator_id, answer_id) DO NOTHING
+                RETURNING answer_id, creator_id
+            """.format(rows=rows, votes=vote_table, answers=Answer._meta.db_table), params)
+            changes = {(answer_id, creator_id): None
+                       for answer_id, creator_id in cursor.fetchall()}
+            inserted = {(str(answer_id), str(creator_id))
+                        for answer_id, creator_id in changes}
+            updates = [(answer_id, creator_id, vote)
+                       for (answer_id, creator_id), vote in votes
+                       if (str(answer_id), str(creator_id)) not in inserted]
+            if not updates:
+                return changes
+            rows = ', '.join(
+                ['(%s::uuid, %s::uuid, %s::smallint)'] * len(updates))
+            cursor.execute("""
+                WITH input (answer_id, creator_id, vote) AS (VALUES {rows}),
+                previous AS (
+                    SELECT v.id, v.vote FROM {votes} v
+                    JOIN input ON input.answer_id = v.answer_id
+                    AND input.creator_id = v.creator_id
+                    WHERE v.vote <> input.vote
+                    ORDER BY v.answer_id, v.creator_id FOR UPDATE OF v
+                )
+                UPDATE {votes} v SET vote = input.vote, updated_on = now()
+                FROM previous, input
+                WHERE v.id = previous.id AND input.answer_id = v.answer_id
+                AND input.creator_id = v.creator_id AND previous.vote <> input.vote
+                RETURNING v.answer_id, v.creator_id, previous.vote
+            """.format(rows=rows, votes=vote_table),
+                [value for update in updates for value in update])
+            changes.update({(answer_id, creator_id): previous_vote
+                            for answer_id, creator_id, previous_vote in cursor.fetchall()})
+            return changes
+
+
 class AnswerVote(models.Model):
     """
     Voting for answers model
     """
+    VOTE_CHOICES = (
+        (1, 'upvote'),
+        (-1, 'downvote'),
+    )
+    VOTE_VALUES = {name: value for value, name in VOTE_CHOICES}
     id = models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True)
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
-    answer = models.ForeignKey(Answer, on_delete=models.CASCADE)
-    vote_type = models.TextField(default='none')
+    # answervote_answer_vote_idx leads with the answer and serves its lookups
+    answer = models.ForeignKey(Answer, on_delete=models.CASCADE, db_index=False)
+    vote = models.SmallIntegerField(choices=VOTE_CHOICES)
+
+    objects = AnswerVoteQuerySet.as_manager()
 
     class Meta:
-        unique_together = ('creator', 'answer', 'vote_type')
+        unique_together = ('creator', 'answer')
+        indexes = [
+            models.Index(fields=['answer', 'vote'],
+                         name='answervote_answer_vote_idx'),
+        ]
 
     def __str__(self):
-        return self.vote_type
+        return self.get_vote_display()
@@ -38,4 +38,4 @@ class GetAnswerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Answer
-        fields = '__all__'
+        exclude = ('fingerprint', 'search_vector')
@@ -1,7 +1,10 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
+from rest_framework.reverse import reverse
 
 from .basetests import BaseTest
-from answers.models import Answer
+from answers.models import Answer, AnswerVote
 
 
 class PostAnswerTest(BaseTest):
@@ -37,6 +40,79 @@ class PostAnswerTest(BaseTest):
         response = self.get_answer()
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_duplicate_answer(self):
+        """
+        Test 400 when the same answer is posted twice to a question
+        """
+        self.is_authenticated(self.user1)
+        self.post_answer()
+        response = self.post_answer()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data.get('error'), 'Answer already exist')
+
+    def test_same_answer_other_question(self):
+        """
+        Test that the same answer can be given to another question
+        """
+        self.is_authenticated(self.user1)
+        self.post_answer()
+        url = reverse('post_answer', args=[
+                      str(self.meetup.id), str(self.question3.id)])
+        response = self.client.post(
+            url,
+            data={"body": "Will there be food"},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_search_answers(self):
+        """
+        Test full text search over the answers of a meetup
+        """
+        Answer.objects.create(
+            body="Lunch will be served at noon",
+            creator=self.user1,
+            question=self.question1
+        )
+        Answer.objects.create(
+            body="The talk starts in the morning",
+            creator=self.user1,
+            question=self.question3
+        )
+        url = reverse('search_answers', args=[str(self.meetup.id)])
+        response = self.client.get(url, {'q': 'serving lunch'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data.get('results')), 1)
+        self.assertEqual(response.data.get('results')[0].get('body'),
+                         "Lunch will be served at noon")
+        response = self.client.get(url, {'q': 'dinner'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_answer_page_query_count(self):
+        """
+        Test that the number of queries for a page does not grow with its size
+        """
+        url = reverse('Get_all_answers', args=[
+                      str(self.meetup.id), str(self.question1.id)])
+        Answer.objects.create(
+            body="The first answer", creator=self.user1, question=self.question1)
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get(url)
+        for index in range(5):
+            answer = Answer.objects.create(
+                body="Answer number {}".format(index),
+                creator=self.user2,
+                question=self.question1
+            )
+            AnswerVote.objects.create(
+                creator=self.user1, answer=answer, vote=1)
+        with CaptureQueriesContext(connection) as large_page:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data.get('results')), 6)
+        self.assertEqual(
+            response.data.get('results')[0].get('votes').get('upvotes'), 1)
+        self.assertEqual(len(large_page), len(small_page))
+
     def test_unsuccessful_get_an_answer_without_question(self):
         """
         Test 404 get answer with no question
@@ -67,7 +67,7 @@ class BaseTest(APITestCase):
         self.question1.save()
 
         self.question2 = Question.objects.create(
-            title="Why are we testing models",
+            title="Why are we testing views",
             body="We test models cause we also want to know if the are working",
             meetup=self.meetup,
             created_by=self.user2
@@ -15,7 +15,7 @@ from datetime import datetime
 
 from questions.models import Question
 from meetups.models import Meetup
-from answers.models import Answer
+from answers.models import Answer, AnswerVote
 from users.models import User
 # Create your tests here.
 
@@ -163,6 +163,17 @@ class VoteAnswer(BaseTest):
         self.assertEqual(response.data.get('error'),
                          'You cannot downvote an answer more than once')
 
+    def test_change_answer_vote(self):
+        self.is_logged_in(self.user)
+        self.upvote_answer(self.meetupId, self.questionId, self.answerId)
+        response = self.downvote_answer(self.meetupId, self.questionId,
+                                        self.answerId)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data.get('upvotes'), 0)
+        self.assertEqual(response.data.get('downvotes'), 1)
+        self.assertEqual(AnswerVote.objects.filter(
+            answer=self.answerId).count(), 1)
+
     def test_meetup_does_not_exist_upvote(self):
         self.is_logged_in(self.user)
         response = self.upvote_answer(self.invalid_id, self.questionId,
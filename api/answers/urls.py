@@ -2,7 +2,7 @@
 url patterns for answers
 """
 from django.urls import path
-from .views import AnswersPostView, UpdateAnswer, GetAnswerView, DeleteAnswer, UpvoteAnswer, DownvoteAnswer
+from .views import AnswersPostView, UpdateAnswer, GetAnswerView, DeleteAnswer, UpvoteAnswer, DownvoteAnswer, SearchAnswersView
 
 
 urlpatterns = [
@@ -11,5 +11,6 @@ urlpatterns = [
     path('<str:meetupId>/questions/<str:questionId>/answers', GetAnswerView.as_view(), name='Get_all_answers'),
     path('<str:meetupId>/questions/<str:questionId>/answers/<str:answerId>/', DeleteAnswer.as_view(), name='delete_answer'),
     path('<str:meetupId>/questions/<str:questionId>/answers/<str:answerId>/upvote', UpvoteAnswer.as_view(), name='upvote_answer'),
-    path('<str:meetupId>/questions/<str:questionId>/answers/<str:answerId>/downvote', DownvoteAnswer.as_view(), name='downvote_answer')
+    path('<str:meetupId>/questions/<str:questionId>/answers/<str:answerId>/downvote', DownvoteAnswer.as_view(), name='downvote_answer'),
+    path('<str:meetupId>/answers/search', SearchAnswersView.as_view(), name='search_answers')
 ]
@@ -3,21 +3,24 @@ Views operations for the answers
 """
 from django.shortcuts import get_object_or_404, _get_queryset
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
+from django.db import IntegrityError, transaction
 
 from rest_framework.views import APIView, Response
 from rest_framework.request import Request
 from rest_framework import status, permissions
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.decorators import permission_classes, api_view
-from rest_framework.pagination import PageNumberPagination
 
 from .models import Answer, AnswerVote
 from questions.models import Question
+from questions.vote_buffer import ANSWER, buffer_vote, buffered_scores, get_vote_buffer
+from meetups.events import publish
 from meetups.models import Meetup
 from .serializers import AnswerSerializer, GetAnswerSerializer, VoteSerializer
 from utils.validators import valid_string
 from users.serializers import FetchUserSerializer
 from utils.token_validation import TokenAllowedPermission
+from utils.pagination import get_paginator
 
 
 
@@ -37,8 +40,6 @@ class AnswersPostView(APIView):
                 queryset = Question.objects.all()
                 request.data['creator'] = request.user
                 serializer = AnswerSerializer(data=request.data)
-                answer_body = Answer.objects.filter(
-                    body=request.data.get('body'))
 
                 if valid_string(request.data.get('body')) == False:
                     return Response(
@@ -49,20 +50,21 @@ class AnswersPostView(APIView):
                     )
 
                 if serializer.is_valid():
-                    if answer_body:
+                    question = get_object_or_404(queryset, id=questionId)
+                    try:
+                        with transaction.atomic():
+                            Answer.objects.create(
+                                body=request.data.get('body').strip(),
+                                question=question,
+                                creator=request.data.get('creator')
+                            )
+                    except IntegrityError:
                         return Response(
                             {
                                 'error': 'Answer already exist'
                             },
                             status=status.HTTP_400_BAD_REQUEST
                         )
-                    Answer.objects.update_or_create(
-                        body=request.data.get('body').strip(),
-                        defaults={
-                            'question': get_object_or_404(queryset, id=questionId),
-                            'creator': request.data.get('creator')
-                        }
-                    )
                     return Response(
                         serializer.data,
                         status=status.HTTP_201_CREATED
@@ -102,14 +104,12 @@ class GetAnswerView(APIView):
             Meetup.objects.get(id=meetupId)
             try:
                 question = Question.objects.filter(id=questionId, meetup=meetupId)
-                if question:
-                    answer = Answer.objects.filter(question=questionId)
-                    if answer:
-                        page_limit = request.GET.get('page_limit')
-                        if not page_limit:
-                            page_limit = 10
-                        pagination_class = PageNumberPagination()
-                        pagination_class.page_size = page_limit
+                if question.exists():
+                    answer = Answer.objects.filter(
+                        question=questionId).with_votes()
+                    if answer.exists():
+                        pagination_class = get_paginator(
+                            request, ordering='-date_created_on')
                         page = pagination_class.paginate_queryset(answer, request)
                         serializer = GetAnswerSerializer(page, many=True)
                         paginated_response = pagination_class.get_paginated_response(serializer.data)
@@ -137,6 +137,49 @@ class GetAnswerView(APIView):
             )
 
 
+class SearchAnswersView(APIView):
+    """
+    Full text search over the answers given in a meetup
+    GET /api/meetups/{meetupId}/answers/search?q=
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, meetupId):
+        """
+        Search answers of a meetup, best matches first
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response(
+                {
+                    'error': 'Please provide a search query'
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            answers = Answer.objects.filter(
+                question__meetup=meetupId).with_votes().search(text)
+            if not answers.exists():
+                return Response(
+                    {
+                        'error': 'No answers match your search'
+                    },
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        except ValidationError:
+            return Response(
+                {
+                    'error': 'Meetup does not exist'
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        pagination_class = get_paginator(
+            request, ordering=('-rank', '-date_created_on'))
+        page = pagination_class.paginate_queryset(answers, request)
+        serializer = GetAnswerSerializer(page, many=True)
+        return pagination_class.get_paginated_response(serializer.data)
+
+
 class UpdateAnswer(APIView):
     """
     Deals with updating a specific answer
@@ -169,16 +212,15 @@ class UpdateAnswer(APIView):
                                     status=status.HTTP_400_BAD_REQUEST
                                     )
             elif userid == answer.creator.id:
-                qs = Answer.objects.filter(
-                    body=request.data.get('body'))
-                qs = qs.exclude(pk=answer.id)
-                if qs.exists():
+                newbody = request.data.get('body').strip()
+                answer.body = newbody
+                try:
+                    with transaction.atomic():
+                        answer.save()
+                except IntegrityError:
                     return Response(
                         data={'Error': 'That answer already exists'},
                         status=status.HTTP_406_NOT_ACCEPTABLE)
-                newbody = request.data.get('body').strip()
-                answer.body = newbody
-                answer.save()
                 serializer = AnswerSerializer(answer)
                 context = {
                     'message': 'You have successfully updated the answer',
@@ -271,10 +313,40 @@ class DownvoteAnswer(APIView):
         return downvoting
 
 
+def buffer_answer_vote(meetup_id, answer, user, vote_choice):
+        """
+        Accepts an answer vote into the vote buffer, the vote is written
+        to the database by the next flush of the buffer
+        """
+        if not buffer_vote(ANSWER, answer.id, user.id, vote_choice):
+            return Response(
+                data={
+                    "error": "You cannot {} an answer more than once".format(vote_choice)
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        scores = buffered_scores(ANSWER, answer.id, answer.votes)
+        publish(meetup_id, 'answer_votes', dict(
+            scores, id=answer.id, question_id=answer.question_id))
+        return Response(
+                data={
+                    "user": FetchUserSerializer(user.__dict__, many=False).data,
+                    "answer": answer.body,
+                    "vote_type": vote_choice,
+                    "upvotes": scores["upvotes"],
+                    "downvotes": scores["downvotes"],
+                    "vote_score": scores["vote_score"],
+                    "message": "Vote accepted"
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
+
+
 def user_vote(request, meetupId, questionId, answerId, vote_choice, message):
         """
         vote for an answer
         """
+        buffered_answer = None
         try:
             meetup = Meetup.objects.get(id=meetupId)
             try:
@@ -288,48 +360,43 @@ def user_vote(request, meetupId, questionId, answerId, vote_choice, message):
                     )
                 try:
                     answer = Answer.objects.filter(id=answerId, question=questionId)
-                    if answer:
+                    if answer and get_vote_buffer():
+                        buffered_answer = answer.with_votes().get()
+                    elif answer:
                         user = request.user
-                        vote = AnswerVote.objects.filter(answer=answerId, creator=user,
-                                                         vote_type=vote_choice)
-                        if vote:
+                        voted_answer = answer[0]
+                        changed = AnswerVote.objects.upsert_votes(
+                            user, {voted_answer.id: AnswerVote.VOTE_VALUES[vote_choice]})
+                        if voted_answer.id not in changed:
                             return Response(
                                 data={
                                     "error": "You cannot {} an answer more than once".format(vote_choice)
                                 },
                                 status=status.HTTP_400_BAD_REQUEST
                             )
-                        userVote, created = AnswerVote.objects.update_or_create(
-                            creator=user,
-                            answer=Answer.objects.get(id=answerId),
-                            defaults={
-                                "vote_type": vote_choice
-                            }
-                        )
-                        upvotes = AnswerVote.objects.filter(answer=answerId,
-                                                            vote_type='upvote').count()
-                        downvotes = AnswerVote.objects.filter(answer=answerId,
-                                                              vote_type='downvote').count()
-                        total = upvotes-downvotes
-                        voter = FetchUserSerializer(userVote.creator.__dict__, many=False).data
+                        votes = Answer.objects.with_votes().get(id=voted_answer.id).votes
+                        publish(meetup.id, 'answer_votes', dict(
+                            votes, id=voted_answer.id, question_id=voted_answer.question_id))
+                        voter = FetchUserSerializer(user.__dict__, many=False).data
                         return Response(
                                 data={
                                     "user": voter,
-                                    "answer": userVote.answer.body,
-                                    "vote_type": userVote.vote_type,
-                                    "upvotes": upvotes,
-                                    "downvotes": downvotes,
-                                    "vote_score": total,
+                                    "answer": voted_answer.body,
+                                    "vote_type": vote_choice,
+                                    "upvotes": votes["upvotes"],
+                                    "downvotes": votes["downvotes"],
+                                    "vote_score": votes["vote_score"],
                                     "message": message
                                 },
                                 status=status.HTTP_201_CREATED
                             )
-                    return Response(
-                            data={
-                                "error": "Answer not in given question"
-                            },
-                            status=status.HTTP_404_NOT_FOUND
-                        )
+                    else:
+                        return Response(
+                                data={
+                                    "error": "Answer not in given question"
+                                },
+                                status=status.HTTP_404_NOT_FOUND
+                            )
                 except:
                     return Response(
                         data={
@@ -351,3 +418,5 @@ def user_vote(request, meetupId, questionId, answerId, vote_choice, message):
                 },
                 status=status.HTTP_404_NOT_FOUND
             )
+        # errors of the buffer backend are not reported as a missing answer
+        return buffer_answer_vote(meetup.id, buffered_answer, request.user, vote_choice)
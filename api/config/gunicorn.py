@@ -0,0 +1,25 @@
+"""
+Gunicorn configuration, the workers are gevent workers so that the
+long lived meetup event streams do not each hold a worker. Every request
+served by a worker may open its own database connection, so the requests
+a worker serves at once are capped by the database connections given to
+the web process
+"""
+import os
+
+worker_class = 'gevent'
+# the workers of the process share DATABASE_MAX_CONNECTIONS, each worker
+# also keeps one LISTEN connection for the meetup event streams
+database_connections = int(os.environ.get('DATABASE_MAX_CONNECTIONS', 20))
+web_workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_connections = int(os.environ.get(
+    'GUNICORN_WORKER_CONNECTIONS',
+    max(1, database_connections // web_workers - 1)))
+
+
+def post_fork(server, worker):
+    """
+    Makes psycopg2 yield to other greenlets while waiting for the database
+    """
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
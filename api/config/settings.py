@@ -125,6 +125,58 @@ REST_FRAMEWORK = {
     'config.exceptions.api_exception_handler',
 }
 
+# Upper bound of the page_limit query parameter on list endpoints
+
+MAX_PAGE_SIZE = env.int('DJANGO_MAX_PAGE_SIZE', default=100)
+
+# Trigram similarity a question title needs to be suggested as a duplicate
+# of a newly posted question, and the number of suggestions returned. The
+# threshold is also set as pg_trgm.similarity_threshold for the lookup so
+# that values below the 0.3 default of pg_trgm apply
+
+SIMILAR_QUESTIONS_THRESHOLD = env.float(
+    'DJANGO_SIMILAR_QUESTIONS_THRESHOLD', default=0.4)
+SIMILAR_QUESTIONS_LIMIT = env.int('DJANGO_SIMILAR_QUESTIONS_LIMIT', default=5)
+
+# Maximum number of question and answer votes accepted by one bulk vote request
+
+MAX_BULK_VOTES = env.int('DJANGO_MAX_BULK_VOTES', default=100)
+
+# Write-behind buffering of votes. An empty VOTE_BUFFER writes votes
+# synchronously, 'memory' buffers them in the web process for single node
+# setups and 'redis' buffers them in the cache redis until the
+# flush_vote_buffer command writes them. Scores lag buffered votes by at
+# most VOTE_BUFFER_FLUSH_INTERVAL seconds, a durable redis buffer keeps
+# drained votes until they are committed to the database
+
+VOTE_BUFFER = env.str('DJANGO_VOTE_BUFFER', default='')
+VOTE_BUFFER_FLUSH_INTERVAL = env.float(
+    'DJANGO_VOTE_BUFFER_FLUSH_INTERVAL', default=1.0)
+VOTE_BUFFER_BATCH_SIZE = env.int('DJANGO_VOTE_BUFFER_BATCH_SIZE', default=1000)
+VOTE_BUFFER_DURABLE = env.bool('DJANGO_VOTE_BUFFER_DURABLE', default=False)
+
+# Seconds between keep-alive comments of idle meetup event streams, clients
+# reconnect after the same delay when a stream is interrupted
+
+EVENT_STREAM_HEARTBEAT = env.int('DJANGO_EVENT_STREAM_HEARTBEAT', default=15)
+
+# Longest time in seconds a page of upcoming meetups is cached, pages are
+# dropped earlier when a meetup changes or the earliest upcoming meetup starts
+
+UPCOMING_MEETUPS_CACHE_TIMEOUT = env.int(
+    'DJANGO_UPCOMING_MEETUPS_CACHE_TIMEOUT', default=3600)
+
+# Default and largest radius in kilometres of proximity searches over the
+# upcoming meetups
+
+DEFAULT_SEARCH_RADIUS = env.float('DJANGO_DEFAULT_SEARCH_RADIUS', default=10)
+MAX_SEARCH_RADIUS = env.float('DJANGO_MAX_SEARCH_RADIUS', default=200)
+
+# Longest time in seconds a rendered calendar feed is cached, feeds are
+# dropped earlier when a meetup changes or their user responds to a meetup
+
+CALENDAR_CACHE_TIMEOUT = env.int('DJANGO_CALENDAR_CACHE_TIMEOUT', default=86400)
+
 # JWT authentication settings
 
 JWT_AUTH = {
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MeetupsConfig(AppConfig):
     name = 'meetups'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,79 @@
+"""
+Cache of the upcoming meetups feed. Pages are cached under a version that
+is replaced whenever a meetup changes, a page is dropped once the earliest
+upcoming meetup starts since the feed changes by itself at that moment
+"""
+import hashlib
+import math
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import Meetup
+
+VERSION_KEY = 'upcoming_meetups:version'
+
+
+def feed_version() -> str:
+    """
+    Returns the current version of the upcoming meetups feed
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def page_key(request: Request, version: str) -> str:
+    """
+    Returns the cache key of the page of the feed asked by request, the
+    pagination links of a page depend on the host it was asked through
+    """
+    url = hashlib.sha1(
+        request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return 'upcoming_meetups:{}:{}'.format(version, url)
+
+
+def get_upcoming_page(request: Request, now: datetime, version: str) -> Optional[Dict]:
+    """
+    Returns the cached page of the feed asked by request when it is
+    still valid at now, None otherwise
+    """
+    page = cache.get(page_key(request, version))
+    if page is None or (page['boundary'] and now > page['boundary']):
+        return None
+    return page
+
+
+def set_upcoming_page(request: Request, now: datetime, response: Response, version: str) -> None:
+    """
+    Caches a rendered page of the feed until the earliest upcoming meetup
+    starts, a page rendered while the version was replaced is stored
+    under the old version and never read
+    """
+    boundary = Meetup.objects.filter(scheduled_date__gte=now).order_by(
+        'scheduled_date').values_list('scheduled_date', flat=True).first()
+    timeout = settings.UPCOMING_MEETUPS_CACHE_TIMEOUT
+    if boundary:
+        timeout = min(timeout, math.ceil((boundary - now).total_seconds()) + 1)
+    cache.set(page_key(request, version), {
+        'data': response.data,
+        'status': response.status_code,
+        'boundary': boundary
+    }, timeout)
+
+
+def invalidate_upcoming_meetups() -> None:
+    """
+    Replaces the version of the feed once the current transaction commits
+    so that no request caches a page rendered before the change
+    """
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
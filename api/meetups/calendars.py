@@ -0,0 +1,156 @@
+"""
+iCalendar feeds of meetups. A feed is rendered once and cached with its
+validators under the version of all feeds and the version of the feed, the
+version of all feeds is replaced when a meetup changes and the version of a
+user feed when the user responds to a meetup. Polls of an unchanged feed are
+answered from the cache without querying the database
+"""
+import uuid
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from utils.conditional import make_etag
+from utils.icalendar import render_calendar
+from .models import Meetup, Rsvp
+
+VERSION_KEY = 'calendars:version'
+TOKEN_SALT = 'meetups.calendars'
+
+
+def meetup_feed(meetup_id) -> str:
+    """
+    Returns the name of the feed of a meetup
+    """
+    return 'meetup:{}'.format(meetup_id)
+
+
+def user_feed(user_id) -> str:
+    """
+    Returns the name of the feed of the meetups a user attends
+    """
+    return 'user:{}'.format(user_id)
+
+
+def calendar_token(user_id) -> str:
+    """
+    Returns the signed token identifying the feed of a user in its url,
+    calendar clients subscribe to feeds without authenticating
+    """
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user_id))
+
+
+def token_user_id(token: str) -> Optional[uuid.UUID]:
+    """
+    Returns the id of the user of a feed token, None for invalid tokens
+    """
+    try:
+        return uuid.UUID(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def version_key(feed: str) -> str:
+    """
+    Returns the cache key of the version of a feed
+    """
+    return 'calendars:{}:version'.format(feed)
+
+
+def calendar_version(feed: str) -> str:
+    """
+    Returns the current version of a feed, made of the version of all
+    feeds and the version of the feed
+    """
+    keys = [VERSION_KEY, version_key(feed)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return '{}:{}'.format(versions[VERSION_KEY], versions[version_key(feed)])
+
+
+def get_calendar(feed: str, render: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+    """
+    Returns the cached rendering of a feed, a feed missing from the cache is
+    rendered by render and cached. A feed rendered while its version was
+    replaced is stored under the old version and never read
+    """
+    key = 'calendars:{}:{}'.format(feed, calendar_version(feed))
+    calendar = cache.get(key)
+    if calendar is None:
+        calendar = render()
+        if calendar is not None:
+            cache.set(key, calendar, settings.CALENDAR_CACHE_TIMEOUT)
+    return calendar
+
+
+def invalidate_calendars(feed: Optional[str] = None) -> None:
+    """
+    Replaces the version of a feed, or of all feeds when no feed is given,
+    once the current transaction commits
+    """
+    key = version_key(feed) if feed else VERSION_KEY
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, None))
+
+
+def meetup_event(meetup: Meetup) -> Dict:
+    """
+    Returns the calendar event of a meetup
+    """
+    event = {
+        'uid': '{}@questioner'.format(meetup.id),
+        'stamp': meetup.updated_on,
+        'start': meetup.scheduled_date,
+        'summary': meetup.title,
+        'description': meetup.body,
+        'location': meetup.location,
+        'last_modified': meetup.updated_on
+    }
+    if meetup.latitude is not None and meetup.longitude is not None:
+        event['geo'] = (meetup.latitude, meetup.longitude)
+    return event
+
+
+def build_calendar(name: str, meetups, last_modified) -> Dict:
+    """
+    Renders the calendar of meetups with its validators
+    """
+    body = render_calendar(name, (meetup_event(meetup) for meetup in meetups))
+    return {
+        'body': body,
+        'etag': make_etag(body),
+        'last_modified': last_modified
+    }
+
+
+def render_meetup_calendar(meetup_id: uuid.UUID) -> Optional[Dict]:
+    """
+    Renders the feed of a meetup, None when the meetup does not exist
+    """
+    meetup = Meetup.objects.filter(id=meetup_id).first()
+    if meetup is None:
+        return None
+    return build_calendar(meetup.title, [meetup], meetup.updated_on)
+
+
+def render_user_calendar(user_id: uuid.UUID) -> Dict:
+    """
+    Renders the feed of the meetups a user responded yes to. The meetups are
+    found through the responder and response index of rsvps, the feed was
+    last modified by the latest of its meetups and of the user's rsvps
+    """
+    meetups = list(Meetup.objects.filter(
+        rsvp__responder_id=user_id,
+        rsvp__response=Rsvp.RESPONSE_VALUES['yes']
+    ).order_by('scheduled_date'))
+    responded = Rsvp.objects.filter(
+        responder_id=user_id).aggregate(latest=Max('updated_on'))['latest']
+    last_modified = max([meetup.updated_on for meetup in meetups]
+                        + ([responded] if responded else []), default=None)
+    return build_calendar('My meetups', meetups, last_modified)
@@ -0,0 +1,144 @@
+"""
+Live events of a meetup. Events are published with Postgres NOTIFY so that
+they are only sent once the transaction that produced them commits, every
+process holds a single LISTEN connection and fans the events out to the
+event streams of its clients
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+import psycopg2
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'meetup_events'
+# Postgres rejects notification payloads of 8000 bytes or more
+MAX_PAYLOAD_SIZE = 7999
+
+
+def publish(meetup_id, event: str, data: Dict) -> None:
+    """
+    Publishes an event to the streams of a meetup when the current
+    transaction commits
+    """
+    publish_many(meetup_id, [(event, data)])
+
+
+def publish_many(meetup_id, events: Iterable[Tuple[str, Dict]]) -> None:
+    """
+    Publishes many events to the streams of a meetup in one statement,
+    events too large for a notification are dropped so that publishing
+    never fails the write that produced them
+    """
+    payloads = []
+    for event, data in events:
+        payload = json.dumps({'meetup': meetup_id, 'event': event, 'data': data},
+                             cls=DjangoJSONEncoder)
+        size = len(payload.encode('utf-8'))
+        if size > MAX_PAYLOAD_SIZE:
+            logger.warning('Dropped the %s event of meetup %s, its payload is %s bytes',
+                           event, meetup_id, size)
+            continue
+        payloads.append(payload)
+    if not payloads:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload',
+            [CHANNEL, payloads]
+        )
+
+
+class EventHub:
+    """
+    Fans the events received by the LISTEN connection of the process
+    out to the queues of the event streams subscribed to each meetup
+    """
+    queue_size = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.listener = None
+
+    def subscribe(self, meetup_id: str) -> queue.Queue:
+        """
+        Returns a queue receiving the events of a meetup
+        """
+        events = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.setdefault(meetup_id, set()).add(events)
+        self.start()
+        return events
+
+    def unsubscribe(self, meetup_id: str, events: queue.Queue) -> None:
+        """
+        Stops sending the events of a meetup to events
+        """
+        with self.lock:
+            subscribers = self.subscribers.get(meetup_id, set())
+            subscribers.discard(events)
+            if not subscribers:
+                self.subscribers.pop(meetup_id, None)
+
+    def dispatch(self, payload: str) -> None:
+        """
+        Sends a notification payload to the subscribers of its meetup,
+        events are dropped for streams too slow to keep up
+        """
+        message = json.loads(payload)
+        with self.lock:
+            subscribers = list(self.subscribers.get(message['meetup'], ()))
+        for events in subscribers:
+            try:
+                events.put_nowait((message['event'], message['data']))
+            except queue.Full:
+                pass
+
+    def start(self) -> None:
+        """
+        Starts the listener thread of the process when it is not running
+        """
+        with self.lock:
+            if self.listener and self.listener.is_alive():
+                return
+            self.listener = threading.Thread(
+                target=self.listen, name='meetup-event-listener', daemon=True)
+            self.listener.start()
+
+    def listen(self) -> None:
+        """
+        Receives the notifications of the channel on a dedicated connection
+        and reconnects when the connection is lost
+        """
+        while True:
+            listener = None
+            try:
+                listener = psycopg2.connect(**connection.get_connection_params())
+                listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with listener.cursor() as cursor:
+                    cursor.execute('LISTEN {}'.format(CHANNEL))
+                while True:
+                    if select.select([listener], [], [], 5) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        self.dispatch(listener.notifies.pop(0).payload)
+            except Exception:
+                logger.exception('Listening to meetup events failed')
+                time.sleep(1)
+            finally:
+                if listener is not None:
+                    listener.close()
+
+
+hub = EventHub()
+
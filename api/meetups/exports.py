@@ -0,0 +1,95 @@
+"""
+Exports of the rsvps, questions, answers and votes of a meetup. Rows are
+read through server-side cursors with their authors joined and streamed
+as they are read, so an export runs in constant memory whatever its size
+"""
+from typing import Iterator
+
+from django.db import transaction
+
+from answers.models import Answer, AnswerVote
+from questions.models import Question, QuestionVote
+from utils.exports import FORMATS, chunked
+from .models import Meetup, Rsvp
+
+# rows fetched from a server-side cursor at a time
+CHUNK_SIZE = 100
+
+
+def rsvp_rows(meetup: Meetup) -> Iterator:
+    """
+    Yields the rsvps of the meetup with their responders
+    """
+    responses = dict(Rsvp.RESPONSE_CHOICES)
+    rows = Rsvp.objects.filter(meetup=meetup).order_by('responder_id').values_list(
+        'responder_id', 'responder__name', 'responder__email',
+        'responder__nick_name', 'response', 'created_on', 'updated_on'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    for row in rows:
+        yield row[:4] + (responses.get(row[4]),) + row[5:]
+
+
+def question_rows(meetup: Meetup) -> Iterator:
+    """
+    Returns the questions of the meetup with their authors and scores
+    """
+    return Question.objects.filter(meetup=meetup).order_by('created_at').values_list(
+        'id', 'title', 'body', 'created_by_id', 'created_by__name',
+        'created_by__email', 'upvotes', 'downvotes', 'vote_score', 'created_at'
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def answer_rows(meetup: Meetup) -> Iterator:
+    """
+    Returns the answers to the questions of the meetup with their authors
+    """
+    return Answer.objects.filter(question__meetup=meetup).order_by(
+        'question_id', 'date_created_on').values_list(
+        'id', 'question_id', 'body', 'creator_id', 'creator__name',
+        'creator__email', 'date_created_on'
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def vote_rows(meetup: Meetup) -> Iterator:
+    """
+    Yields the question votes and then the answer votes of the meetup
+    with their voters
+    """
+    question_votes = QuestionVote.objects.filter(
+        question__meetup=meetup).order_by('question_id').values_list(
+        'question_id', 'question_id', 'user_id', 'user__name',
+        'user__email', 'vote', 'updated_on'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    answer_votes = AnswerVote.objects.filter(
+        answer__question__meetup=meetup).order_by('answer_id').values_list(
+        'answer_id', 'answer__question_id', 'creator_id', 'creator__name',
+        'creator__email', 'vote', 'updated_on'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    for target, votes in (('question', question_votes), ('answer', answer_votes)):
+        for row in votes:
+            yield (target,) + row[:5] + (
+                'upvote' if row[5] >= 1 else 'downvote',) + row[6:]
+
+
+EXPORTS = {
+    'rsvps': (('responder_id', 'name', 'email', 'nick_name', 'response',
+               'created_on', 'updated_on'), rsvp_rows),
+    'questions': (('id', 'title', 'body', 'author_id', 'author_name', 'author_email',
+                   'upvotes', 'downvotes', 'vote_score', 'created_at'), question_rows),
+    'answers': (('id', 'question_id', 'body', 'author_id', 'author_name',
+                 'author_email', 'created_at'), answer_rows),
+    'votes': (('target', 'target_id', 'question_id', 'voter_id', 'voter_name',
+               'voter_email', 'vote', 'updated_on'), vote_rows),
+}
+
+
+def export_lines(meetup: Meetup, export: str, format: str) -> Iterator[str]:
+    """
+    Yields an export of the meetup in chunks of lines. The export is read
+    in one transaction so that its server-side cursors stream the rows
+    instead of materializing them when the request transaction ends
+    """
+    columns, rows = EXPORTS[export]
+    lines = FORMATS[format][1]
+    with transaction.atomic():
+        yield from chunked(lines(columns, rows(meetup)))
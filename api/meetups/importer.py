@@ -0,0 +1,167 @@
+"""
+Bulk import of meetups from CSV or newline delimited JSON. Rows are read
+lazily and validated and written in batches so that catalogs of any size
+are imported with bounded memory
+"""
+import csv
+import json
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+
+from users.models import User
+from utils.fingerprint import content_fingerprint
+from utils.validators import meetup_errors
+from .cache import invalidate_upcoming_meetups
+from .models import Image, Meetup, Tag
+from .serializers import MeetupSerializer
+
+FORMATS = ('csv', 'ndjson')
+LIST_SEPARATOR = '|'
+DUPLICATE_ERROR = 'A meetup with that title or body is already scheduled at that time and location'
+
+# line number, parsed row and parsing errors
+Row = Tuple[int, Optional[Dict], List[str]]
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Row]:
+    """
+    Reads the rows of a CSV document with a header row, the tags and
+    images of a row are separated by | within their cells and empty
+    coordinates are left out
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        data = dict(row)
+        for field in ('tags', 'images'):
+            data[field] = [value.strip() for value in (data.get(field) or '').split(LIST_SEPARATOR)
+                           if value.strip()]
+        for field in ('latitude', 'longitude'):
+            if not (data.get(field) or '').strip():
+                data.pop(field, None)
+        yield reader.line_num, data, []
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[Row]:
+    """
+    Reads the rows of a document holding one JSON object per line
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield number, None, ['The line is not valid JSON']
+            continue
+        if not isinstance(data, dict):
+            yield number, None, ['The line is not a JSON object']
+            continue
+        yield number, data, []
+
+
+def validate_row(data: Dict) -> Tuple[Optional[Dict], List[str]]:
+    """
+    Validates a row with the rules of the meetup creation endpoint,
+    returns the validated meetup fields or the errors of the row
+    """
+    errors = []
+    for field in ('tags', 'images'):
+        values = data.get(field) or []
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            errors.append('{} must be a list of strings'.format(field))
+    if errors:
+        return None, errors
+    errors = [error['error'] for error in meetup_errors(data)]
+    serializer = MeetupSerializer(data=data)
+    if not serializer.is_valid():
+        for field, messages in serializer.errors.items():
+            prefix = '' if field == 'non_field_errors' else '{}: '.format(field)
+            errors.extend(prefix + str(message) for message in messages)
+    if errors:
+        return None, errors
+    validated = dict(serializer.validated_data)
+    validated['tags'] = list(dict.fromkeys(data.get('tags') or []))
+    validated['images'] = list(dict.fromkeys(data.get('images') or []))
+    return validated, []
+
+
+def import_batch(rows: List[Row], creator: User) -> List[Dict]:
+    """
+    Validates a batch of rows and writes its meetups, tags, images and
+    their links with one statement each in a transaction, returns the
+    report of every row of the batch
+    """
+    reports = {}
+    accepted = []
+    seen = set()
+    for number, data, errors in rows:
+        validated = None
+        if data is not None and not errors:
+            validated, errors = validate_row(data)
+        if errors:
+            reports[number] = {'row': number, 'errors': errors}
+            continue
+        meetup = Meetup(
+            title=validated['title'],
+            body=validated['body'],
+            body_fingerprint=content_fingerprint(validated['body']),
+            location=validated['location'],
+            scheduled_date=validated['scheduled_date'],
+            latitude=validated.get('latitude'),
+            longitude=validated.get('longitude'),
+            creator=creator
+        )
+        keys = {(meetup.title, meetup.scheduled_date, meetup.location),
+                (meetup.body_fingerprint, meetup.scheduled_date, meetup.location)}
+        if keys & seen:
+            reports[number] = {'row': number, 'errors': [DUPLICATE_ERROR]}
+            continue
+        seen.update(keys)
+        accepted.append((number, meetup, validated['tags'], validated['images']))
+    if accepted:
+        with transaction.atomic():
+            # rows clashing with stored meetups are skipped by the insert
+            Meetup.objects.bulk_create(
+                [meetup for _, meetup, _, _ in accepted], ignore_conflicts=True)
+            created = set(Meetup.objects.filter(
+                id__in=[meetup.id for _, meetup, _, _ in accepted]
+            ).values_list('id', flat=True))
+            accepted = [row for row in accepted if row[1].id in created]
+            tags = {tag.tag_name: tag for tag in Tag.resolve(
+                [name for _, _, names, _ in accepted for name in names])}
+            images = {image.image_url: image for image in Image.resolve(
+                [url for _, _, _, urls in accepted for url in urls])}
+            links = [
+                Meetup.tags.through(meetup_id=meetup.id, tag_id=tags[name].id)
+                for _, meetup, names, _ in accepted for name in names
+            ]
+            Meetup.tags.through.objects.bulk_create(links)
+            Tag.count_meetups(Counter(link.tag_id for link in links))
+            Meetup.image_url.through.objects.bulk_create([
+                Meetup.image_url.through(meetup_id=meetup.id, image_id=images[url].id)
+                for _, meetup, _, urls in accepted for url in urls
+            ])
+            if created:
+                invalidate_upcoming_meetups()
+        for number, meetup, _, _ in accepted:
+            reports[number] = {'row': number, 'id': str(meetup.id)}
+    return [reports.get(number) or {'row': number, 'errors': [DUPLICATE_ERROR]}
+            for number, _, _ in rows]
+
+
+def import_meetups(lines: Iterable[str], format: str, creator: User,
+                   batch_size: int = 500) -> Iterator[Dict]:
+    """
+    Imports the meetups of a CSV or newline delimited JSON document read
+    line by line and yields the report of every row, a report holds the
+    id of the created meetup or the errors of the row
+    """
+    rows = read_csv(lines) if format == 'csv' else read_ndjson(lines)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        yield from import_batch(batch, creator)
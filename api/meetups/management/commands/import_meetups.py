@@ -0,0 +1,63 @@
+"""
+Command for importing catalogs of meetups
+"""
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from meetups.importer import FORMATS, import_meetups
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Imports meetups from a CSV or newline delimited JSON file in batches
+    and writes the report of every row that was not imported
+    """
+    help = 'Imports meetups from a CSV or newline delimited JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='File to import, - reads the standard input'
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Format of the file, guessed from its extension by default'
+        )
+        parser.add_argument(
+            '--creator',
+            required=True,
+            help='Email of the user the meetups are created by'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows validated and written together'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            creator = User.objects.get(email=options['creator'])
+        except User.DoesNotExist:
+            raise CommandError(
+                'There is no user with the email {}'.format(options['creator']))
+        path = options['path']
+        format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        document = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        created = failed = 0
+        try:
+            for report in import_meetups(document, format, creator, options['batch_size']):
+                if 'errors' in report:
+                    failed += 1
+                    self.stdout.write(json.dumps(report))
+                else:
+                    created += 1
+        finally:
+            if document is not sys.stdin:
+                document.close()
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {} meetups, {} rows failed'.format(created, failed)))
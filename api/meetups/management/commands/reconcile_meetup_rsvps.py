@@ -0,0 +1,32 @@
+"""
+Command for recomputing the stored meetup rsvp counters
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from meetups.models import Meetup
+
+
+class Command(BaseCommand):
+    """
+    Recomputes rsvp_yes, rsvp_no and rsvp_maybe of meetups
+    from the Rsvp table
+    """
+    help = 'Recomputes the stored rsvp counters of meetups from their rsvps'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meetup',
+            action='append',
+            dest='meetups',
+            help='Only reconcile the meetup with the given id'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Meetup.objects.all()
+        if options.get('meetups'):
+            queryset = queryset.filter(id__in=options['meetups'])
+        with transaction.atomic():
+            updated = Meetup.reconcile_rsvps(queryset)
+        self.stdout.write(self.style.SUCCESS(
+            'Reconciled rsvp counters of {} meetups'.format(updated)))
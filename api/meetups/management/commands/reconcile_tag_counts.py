@@ -0,0 +1,31 @@
+"""
+Command for recomputing the stored meetup counts of tags
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from meetups.models import Tag
+
+
+class Command(BaseCommand):
+    """
+    Recomputes meetup_count of tags from the links of meetups and tags
+    """
+    help = 'Recomputes the stored meetup counts of tags from their meetups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tag',
+            action='append',
+            dest='tags',
+            help='Only reconcile the tag with the given name'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Tag.objects.all()
+        if options.get('tags'):
+            queryset = queryset.filter(tag_name__in=options['tags'])
+        with transaction.atomic():
+            updated = Tag.reconcile_counts(queryset)
+        self.stdout.write(self.style.SUCCESS(
+            'Reconciled meetup counts of {} tags'.format(updated)))
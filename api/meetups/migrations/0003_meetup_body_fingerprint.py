@@ -0,0 +1,34 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+from utils.fingerprint import fill_fingerprints
+
+
+def fill_meetup_fingerprints(apps, schema_editor):
+    """
+    Fingerprints the bodies of existing meetups
+    """
+    Meetup = apps.get_model('meetups', 'Meetup')
+    fill_fingerprints(Meetup.objects.all(), 'body_fingerprint', ('body',), ('scheduled_date', 'location'))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('meetups', '0002_auto_20190318_1458'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meetup',
+            name='body_fingerprint',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_meetup_fingerprints, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='meetup',
+            unique_together={('body_fingerprint', 'scheduled_date', 'location'), ('title', 'scheduled_date', 'location')},
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.10 on 2026-10-18 11:06
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_rsvp_counters(apps, schema_editor):
+    """
+    Fills the rsvp counters of existing meetups from the rsvp table
+    """
+    Meetup = apps.get_model('meetups', 'Meetup')
+    Rsvp = apps.get_model('meetups', 'Rsvp')
+    rsvps = Rsvp.objects.filter(
+        meetup=OuterRef('pk')).order_by().values('meetup')
+    Meetup.objects.update(**{
+        'rsvp_' + response: Coalesce(Subquery(rsvps.filter(response__iexact=response).annotate(
+            count=Count('id')).values('count')), Value(0))
+        for response in ('yes', 'no', 'maybe')
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetups', '0003_meetup_body_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meetup',
+            name='rsvp_maybe',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meetup',
+            name='rsvp_no',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='meetup',
+            name='rsvp_yes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rsvp_counters,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,154 @@
+# Generated by Django 2.2.10 on 2026-10-18 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+
+def fill_responses(apps, schema_editor):
+    """
+    Converts the free text responses of existing rsvps to response values
+    in batches walked by id, the way the old validator read them. Rsvps
+    naming no response are removed with their batch. Duplicate rsvps of a responder are
+    then removed keeping the latest one and the rsvp counters of the
+    meetups are recomputed, one batch of meetups at a time
+    """
+    Rsvp = apps.get_model('meetups', 'Rsvp')
+    Meetup = apps.get_model('meetups', 'Meetup')
+    rsvps = Rsvp._meta.db_table
+    meetups = Meetup._meta.db_table
+    last_id = '00000000-0000-0000-0000-000000000000'
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute("""
+                WITH batch AS (
+                    SELECT id, CASE
+                        WHEN lower(response) LIKE '%%yes%%' THEN 1
+                        WHEN lower(response) LIKE '%%no%%' THEN 2
+                        WHEN lower(response) LIKE '%%maybe%%' THEN 3
+                    END AS response_value
+                    FROM {rsvps} WHERE id > %s ORDER BY id LIMIT %s
+                ),
+                removed AS (
+                    DELETE FROM {rsvps} r USING batch
+                    WHERE r.id = batch.id AND batch.response_value IS NULL
+                ),
+                converted AS (
+                    UPDATE {rsvps} r SET response_value = batch.response_value
+                    FROM batch WHERE r.id = batch.id
+                    AND batch.response_value IS NOT NULL
+                )
+                SELECT id FROM batch
+            """.format(rsvps=rsvps), [last_id, BATCH_SIZE])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            last_id = max(ids)
+        last_id = '00000000-0000-0000-0000-000000000000'
+        while True:
+            cursor.execute(
+                'SELECT id FROM {} WHERE id > %s ORDER BY id LIMIT %s'.format(meetups),
+                [last_id, BATCH_SIZE])
+            meetup_ids = [row[0] for row in cursor.fetchall()]
+            if not meetup_ids:
+                break
+            last_id = meetup_ids[-1]
+            cursor.execute("""
+                DELETE FROM {rsvps} a USING {rsvps} b
+                WHERE a.meetup_id = ANY(%s::uuid[])
+                AND a.meetup_id = b.meetup_id AND a.responder_id = b.responder_id
+                AND (a.updated_on, a.id) < (b.updated_on, b.id)
+            """.format(rsvps=rsvps), [meetup_ids])
+            cursor.execute("""
+                UPDATE {meetups} m SET
+                rsvp_yes = COALESCE(counts.yes, 0),
+                rsvp_no = COALESCE(counts.no, 0),
+                rsvp_maybe = COALESCE(counts.maybe, 0)
+                FROM unnest(%s::uuid[]) AS batch(id)
+                LEFT JOIN (
+                    SELECT meetup_id,
+                    COUNT(*) FILTER (WHERE response_value = 1) AS yes,
+                    COUNT(*) FILTER (WHERE response_value = 2) AS no,
+                    COUNT(*) FILTER (WHERE response_value = 3) AS maybe
+                    FROM {rsvps} WHERE meetup_id = ANY(%s::uuid[])
+                    GROUP BY meetup_id
+                ) counts ON counts.meetup_id = batch.id
+                WHERE m.id = batch.id
+            """.format(meetups=meetups, rsvps=rsvps), [meetup_ids, meetup_ids])
+
+
+def fill_response_names(apps, schema_editor):
+    """
+    Converts response values back to free text responses in batches
+    """
+    Rsvp = apps.get_model('meetups', 'Rsvp')
+    table = Rsvp._meta.db_table
+    last_id = '00000000-0000-0000-0000-000000000000'
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute("""
+                WITH batch AS (
+                    SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s
+                )
+                UPDATE {table} r
+                SET response = CASE r.response_value
+                    WHEN 1 THEN 'yes' WHEN 2 THEN 'no' ELSE 'maybe' END
+                FROM batch WHERE r.id = batch.id
+                RETURNING r.id
+            """.format(table=table), [last_id, BATCH_SIZE])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            last_id = max(ids)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('meetups', '0004_meetup_rsvp_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rsvp',
+            name='response',
+            field=models.CharField(max_length=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='rsvp',
+            name='response_value',
+            field=models.SmallIntegerField(choices=[(1, 'yes'), (2, 'no'), (3, 'maybe')], null=True),
+        ),
+        migrations.RunPython(fill_responses, fill_response_names),
+        migrations.RemoveField(
+            model_name='rsvp',
+            name='response',
+        ),
+        migrations.RenameField(
+            model_name='rsvp',
+            old_name='response_value',
+            new_name='response',
+        ),
+        migrations.AlterField(
+            model_name='rsvp',
+            name='response',
+            field=models.SmallIntegerField(choices=[(1, 'yes'), (2, 'no'), (3, 'maybe')]),
+        ),
+        migrations.AlterField(
+            model_name='rsvp',
+            name='meetup',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='meetups.Meetup'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rsvp',
+            unique_together={('meetup', 'responder')},
+        ),
+        migrations.AddIndex(
+            model_name='rsvp',
+            index=models.Index(fields=['meetup', 'response'], name='rsvp_meetup_response_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.10 on 2026-10-18 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetups', '0005_rsvp_response_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='meetup',
+            index=models.Index(fields=['scheduled_date', '-created_on'], name='meetup_schedule_idx'),
+        ),
+    ]
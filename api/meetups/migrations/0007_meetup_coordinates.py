@@ -0,0 +1,33 @@
+# Generated by Django 2.2.10 on 2026-10-18 11:35
+
+import django.core.validators
+from django.contrib.postgres.operations import CreateExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetups', '0006_meetup_schedule_idx'),
+    ]
+
+    operations = [
+        CreateExtension('cube'),
+        CreateExtension('earthdistance'),
+        migrations.AddField(
+            model_name='meetup',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='meetup',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX meetup_position_idx ON meetups_meetup '
+            'USING gist (ll_to_earth(latitude, longitude)) '
+            'WHERE latitude IS NOT NULL AND longitude IS NOT NULL',
+            'DROP INDEX meetup_position_idx'
+        ),
+    ]
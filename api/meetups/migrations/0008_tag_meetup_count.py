@@ -0,0 +1,39 @@
+# Generated by Django 2.2.10 on 2026-10-18 11:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_meetup_counts(apps, schema_editor):
+    """
+    Fills the meetup counts of existing tags from the links of meetups
+    and tags
+    """
+    Tag = apps.get_model('meetups', 'Tag')
+    Meetup = apps.get_model('meetups', 'Meetup')
+    links = Meetup.tags.through.objects.filter(
+        tag=OuterRef('pk')).order_by().values('tag')
+    Tag.objects.update(meetup_count=Coalesce(Subquery(
+        links.annotate(count=Count('id')).values('count')), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetups', '0007_meetup_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='meetup_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_meetup_counts,
+                             migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-meetup_count', 'tag_name'], name='tag_meetup_count_idx'),
+        ),
+    ]
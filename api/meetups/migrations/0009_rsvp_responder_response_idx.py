@@ -0,0 +1,24 @@
+# Generated by Django 2.2.10 on 2026-10-18 11:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetups', '0008_tag_meetup_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rsvp',
+            index=models.Index(fields=['responder', 'response'], name='rsvp_responder_response_idx'),
+        ),
+        migrations.AlterField(
+            model_name='rsvp',
+            name='responder',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
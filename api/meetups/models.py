@@ -1,23 +1,50 @@
 import uuid
 import datetime
-from django.db import models
+from django.db import models, transaction
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models import BooleanField, Case, Count, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.expressions import RawSQL
 from users.models import User
-from typing import List, Dict
-from django.db.models.functions import Lower
+from utils.fingerprint import content_fingerprint
+from typing import List, Dict, Optional
+from django.db.models.functions import Coalesce, Lower
 """
 Models for the meetups
 """
 
 
+def resolve_unique(model, field: str, values: List[str]) -> List:
+    """
+    Returns the objects of model whose unique field holds values in the
+    order of values, the missing ones are created by a single insert that
+    skips values created concurrently
+    """
+    values = list(dict.fromkeys(values))
+    objects = {getattr(obj, field): obj
+               for obj in model.objects.filter(**{field + '__in': values})}
+    missing = [value for value in values if value not in objects]
+    if missing:
+        model.objects.bulk_create(
+            [model(**{field: value}) for value in missing], ignore_conflicts=True)
+        objects.update({getattr(obj, field): obj
+                        for obj in model.objects.filter(**{field + '__in': missing})})
+    return [objects[value] for value in values]
+
+
 class Tag(models.Model):
     """
     Database Model for meetup tags
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     tag_name = models.CharField(max_length=255)
+    meetup_count = models.IntegerField(default=0)
 
     class Meta:
         unique_together = ('tag_name',)
+        indexes = [
+            models.Index(fields=['-meetup_count', 'tag_name'],
+                         name='tag_meetup_count_idx'),
+        ]
 
     def __str__(self):
         return self.tag_name
@@ -28,6 +55,40 @@ class Tag(models.Model):
         """
         return self.tag_name
 
+    @classmethod
+    def resolve(cls, tag_names: List[str]) -> List['Tag']:
+        """
+        Returns the tags with tag_names, creating the missing ones
+        """
+        return resolve_unique(cls, 'tag_name', tag_names)
+
+    @classmethod
+    def count_meetups(cls, changes: Dict) -> None:
+        """
+        Moves the stored meetup counts of tags by the changes keyed by
+        tag id with a single update
+        """
+        changes = {tag_id: change for tag_id, change in changes.items() if change}
+        if not changes:
+            return
+        cls.objects.filter(id__in=changes).update(meetup_count=F('meetup_count') + Case(
+            *[When(id=tag_id, then=Value(change)) for tag_id, change in changes.items()],
+            output_field=models.IntegerField()
+        ))
+
+    @classmethod
+    def reconcile_counts(cls, queryset=None) -> int:
+        """
+        Recomputes the stored meetup counts from the links of meetups and
+        tags and returns the number of tags updated
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        links = Meetup.tags.through.objects.filter(
+            tag=OuterRef('pk')).order_by().values('tag')
+        return queryset.update(meetup_count=Coalesce(Subquery(
+            links.annotate(count=Count('id')).values('count')), Value(0)))
+
 
 class Image(models.Model):
     """
@@ -48,6 +109,57 @@ class Image(models.Model):
         """
         return self.image_url
 
+    @classmethod
+    def resolve(cls, image_urls: List[str]) -> List['Image']:
+        """
+        Returns the images with image_urls, creating the missing ones
+        """
+        return resolve_unique(cls, 'image_url', image_urls)
+
+
+class MeetupQuerySet(models.QuerySet):
+    """
+    Queryset for meetups
+    """
+
+    def with_details(self) -> 'MeetupQuerySet':
+        """
+        Joins the creator and prefetches the tags and images for
+        serializing pages of meetups in a constant number of queries
+        """
+        return self.select_related('creator').prefetch_related('tags', 'image_url')
+
+    def tagged(self, tag_names: List[str]) -> 'MeetupQuerySet':
+        """
+        Filters meetups tagged with all of tag_names. The links of the tags
+        are read through the tag index of the through table and grouped by
+        meetup instead of joining the table once per tag
+        """
+        tag_names = list(dict.fromkeys(tag_names))
+        links = self.model.tags.through.objects.filter(
+            tag__tag_name__in=tag_names
+        ).values('meetup_id').annotate(
+            matched=Count('tag_id')
+        ).filter(matched=len(tag_names)).values('meetup_id')
+        return self.filter(id__in=links)
+
+    def near(self, latitude: float, longitude: float, radius: float) -> 'MeetupQuerySet':
+        """
+        Filters meetups within radius meters of a point and annotates their
+        distance in meters. Candidates are found through the GiST index on
+        the earth positions of meetups, the box around the point is then
+        narrowed to the exact distance
+        """
+        table = self.model._meta.db_table
+        position = 'll_to_earth("{0}"."latitude", "{0}"."longitude")'.format(table)
+        return self.annotate(
+            in_box=RawSQL('earth_box(ll_to_earth(%s, %s), %s) @> ' + position,
+                          (latitude, longitude, radius), output_field=BooleanField()),
+            distance=RawSQL('earth_distance(ll_to_earth(%s, %s), ' + position + ')',
+                            (latitude, longitude), output_field=FloatField())
+        ).filter(latitude__isnull=False, longitude__isnull=False,
+                 in_box=True, distance__lte=radius)
+
 
 class Meetup(models.Model):
     """
@@ -58,27 +170,50 @@ class Meetup(models.Model):
     updated_on = models.DateTimeField(auto_now=True)
     title = models.CharField(max_length=255)
     body = models.TextField()
+    body_fingerprint = models.CharField(
+        max_length=64, null=True, editable=False)
     location = models.CharField(max_length=255)
     scheduled_date = models.DateTimeField()
     tags = models.ManyToManyField(Tag)
     image_url = models.ManyToManyField(Image)
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
+    rsvp_yes = models.IntegerField(default=0)
+    rsvp_no = models.IntegerField(default=0)
+    rsvp_maybe = models.IntegerField(default=0)
+    # meetup_position_idx is a GiST index on ll_to_earth(latitude, longitude)
+    # created by migration 0007, django cannot declare expression indexes
+    latitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)])
+
+    objects = MeetupQuerySet.as_manager()
 
     class Meta:
         ordering = ['scheduled_date', '-created_on']
-        unique_together = (('body', 'scheduled_date', 'location'),
+        unique_together = (('body_fingerprint', 'scheduled_date', 'location'),
                            ('title', 'scheduled_date', 'location'))
+        indexes = [
+            models.Index(fields=['scheduled_date', '-created_on'],
+                         name='meetup_schedule_idx'),
+        ]
 
     def __str__(self):
         return self.title + " on " + self.scheduled_date.strftime('%m-%d-%Y')
 
+    def save(self, *args, **kwargs):
+        self.body_fingerprint = content_fingerprint(self.body)
+        super().save(*args, **kwargs)
+
     @property
     def rsvps(self) -> List:
         """
         Gets all rsvp for the meetup
         """
         from meetups.serializers import FetchRsvpSerializer
-        rsvps = Rsvp.objects.filter(meetup=self.id)
+        rsvps = Rsvp.objects.filter(meetup=self.id).select_related('responder')
         serializer = FetchRsvpSerializer(rsvps, many=True)
         return serializer.data
 
@@ -87,36 +222,112 @@ class Meetup(models.Model):
         """
         Gets rsvp summary
         """
-        maybe_count = Rsvp.objects.filter(
-            meetup=self.id, response__iexact='maybe').count()
-        yes_count = Rsvp.objects.filter(
-            meetup=self.id, response__iexact='yes').count()
-        no_count = Rsvp.objects.filter(
-            meetup=self.id, response__iexact='no').count()
         result = {
-            'maybe': maybe_count,
-            'yes': yes_count,
-            'no': no_count
+            'maybe': self.rsvp_maybe,
+            'yes': self.rsvp_yes,
+            'no': self.rsvp_no
         }
         return result
 
+    def respond(self, responder: User, response: int) -> None:
+        """
+        Records the rsvp of responder and moves the rsvp counters in the
+        same transaction, the meetup row is locked so that concurrent
+        responses to the meetup are counted one after the other
+        """
+        with transaction.atomic():
+            meetup = Meetup.objects.select_for_update().get(id=self.id)
+            previous = Rsvp.objects.filter(
+                meetup=meetup, responder=responder).first()
+            Rsvp.objects.update_or_create(
+                meetup=meetup,
+                responder=responder,
+                defaults={'response': response}
+            )
+            previous_counter = Rsvp.counter(previous.response) if previous else None
+            counter = Rsvp.counter(response)
+            deltas = {}
+            if previous_counter != counter:
+                if previous_counter:
+                    deltas[previous_counter] = -1
+                if counter:
+                    deltas[counter] = 1
+                Meetup.objects.filter(id=meetup.id).update(**{
+                    field: F(field) + delta for field, delta in deltas.items()
+                })
+            for field in Rsvp.COUNTERS.values():
+                setattr(self, field, getattr(meetup, field) + deltas.get(field, 0))
+            if deltas:
+                from meetups.cache import invalidate_upcoming_meetups
+                from meetups.calendars import invalidate_calendars, user_feed
+                invalidate_upcoming_meetups()
+                invalidate_calendars(user_feed(responder.id))
+
+    @classmethod
+    def reconcile_rsvps(cls, queryset=None) -> int:
+        """
+        Recomputes the stored rsvp counters from the rsvp table
+        and returns the number of meetups updated
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        rsvps = Rsvp.objects.filter(
+            meetup=OuterRef('pk')).order_by().values('meetup')
+        counters = {
+            counter: Coalesce(Subquery(rsvps.filter(response=response).annotate(
+                count=Count('id')).values('count')), Value(0))
+            for response, counter in Rsvp.COUNTERS.items()
+        }
+        return queryset.update(**counters)
+
 
 class Rsvp(models.Model):
     """
     Rsvp class to pick user response to a meetup
     """
+    RESPONSE_CHOICES = (
+        (1, 'yes'),
+        (2, 'no'),
+        (3, 'maybe'),
+    )
+    RESPONSE_VALUES = {name: value for value, name in RESPONSE_CHOICES}
+    COUNTERS = {
+        1: 'rsvp_yes',
+        2: 'rsvp_no',
+        3: 'rsvp_maybe'
+    }
     id = models.UUIDField(
         primary_key=True, default=uuid.uuid4, editable=False)
     created_on = models.DateTimeField(
         auto_now_add=True)
     updated_on = models.DateTimeField(
         auto_now=True)
+    # rsvp_responder_response_idx leads with the responder and serves
+    # its lookups
     responder = models.ForeignKey(
-        User, on_delete=models.CASCADE)
+        User, on_delete=models.CASCADE, db_index=False)
+    # the unique key and rsvp_meetup_response_idx lead with the meetup
+    # and serve its lookups
     meetup = models.ForeignKey(
-        Meetup, on_delete=models.CASCADE)
-    response = models.CharField(
-        max_length=5)
+        Meetup, on_delete=models.CASCADE, db_index=False)
+    response = models.SmallIntegerField(
+        choices=RESPONSE_CHOICES)
+
+    class Meta:
+        unique_together = ('meetup', 'responder')
+        indexes = [
+            models.Index(fields=['meetup', 'response'],
+                         name='rsvp_meetup_response_idx'),
+            models.Index(fields=['responder', 'response'],
+                         name='rsvp_responder_response_idx'),
+        ]
 
     def __str__(self):
-        return self.response
+        return self.get_response_display()
+
+    @classmethod
+    def counter(cls, response: Optional[int]) -> Optional[str]:
+        """
+        Returns the meetup counter field of a response
+        """
+        return cls.COUNTERS.get(response)
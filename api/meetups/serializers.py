@@ -17,16 +17,21 @@ class MeetupSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Meetup
-        fields = ('title', 'body', 'location', 'scheduled_date')
+        fields = ('title', 'body', 'location', 'scheduled_date',
+                  'latitude', 'longitude')
 
     def validate(self, data):
         """
-        Check if a meetup was scheduled on a past date
+        Check if a meetup was scheduled on a past date and that its
+        coordinates are given together
         """
         scheduled_date = data.get('scheduled_date')
-        if scheduled_date < timezone.now():
+        if scheduled_date and scheduled_date < timezone.now():
             raise serializers.ValidationError(
                 'You cannot schedule a meetup on a past time')
+        if (data.get('latitude') is None) != (data.get('longitude') is None):
+            raise serializers.ValidationError(
+                'A meetup needs both a latitude and a longitude')
         return data
 
 
@@ -39,6 +44,18 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class TagFacetSerializer(serializers.ModelSerializer):
+    """
+    Serializes a tag with the number of meetups tagged with it
+    """
+    tag = serializers.CharField(source='tag_name')
+    meetups = serializers.IntegerField(source='meetup_count')
+
+    class Meta:
+        model = Tag
+        fields = ('tag', 'meetups')
+
+
 class FetchMeetupSerializer(serializers.ModelSerializer):
     """
     Serializes all the data from fields
@@ -51,7 +68,18 @@ class FetchMeetupSerializer(serializers.ModelSerializer):
     class Meta:
         model = Meetup
         fields = ('id', 'created_on', 'updated_on', 'title', 'body', 'location',
-                  'scheduled_date', 'tags', 'image_url', 'creator', 'rsvp_summary')
+                  'latitude', 'longitude', 'scheduled_date', 'tags', 'image_url',
+                  'creator', 'rsvp_summary')
+
+    def to_representation(self, instance):
+        """
+        Adds the distance in kilometres of meetups found by a proximity search
+        """
+        data = super().to_representation(instance)
+        distance = getattr(instance, 'distance', None)
+        if distance is not None:
+            data['distance'] = round(distance / 1000, 3)
+        return data
 
 
 class UpdateMeetupSerializer(serializers.ModelSerializer):
@@ -63,25 +91,33 @@ class UpdateMeetupSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Meetup
-        fields = '__all__'
+        exclude = ('body_fingerprint',)
+
+
+class RsvpResponseField(serializers.Field):
+    """
+    Reads Yes, No or Maybe in any case into the stored response value
+    and writes the stored value back as its name
+    """
+    default_error_messages = {
+        'invalid': 'RSVP, can only take Yes, No or Maybe'
+    }
+
+    def to_internal_value(self, data):
+        value = Rsvp.RESPONSE_VALUES.get(str(data).strip().lower())
+        if value is None:
+            self.fail('invalid')
+        return value
+
+    def to_representation(self, value):
+        return dict(Rsvp.RESPONSE_CHOICES).get(value)
 
 
 class RsvpSerializer(serializers.ModelSerializer):
     """
     Serializers for rsvp
     """
-    response = serializers.CharField()
-
-    def validate_response(self, value):
-        """
-        Validate User response
-        """
-        if "yes" not in value.lower():
-            if "no" not in value.lower():
-                if "maybe" not in value.lower():
-                    raise serializers.ValidationError(
-                        "RSVP, can only take Yes, No or Maybe")
-        return value
+    response = RsvpResponseField()
 
     class Meta:
         model = Rsvp
@@ -93,6 +129,7 @@ class FetchRsvpSerializer(serializers.ModelSerializer):
     Serializer for fetching rsvp data
     """
     responder = FetchUserSerializer()
+    response = RsvpResponseField()
 
     class Meta:
         model = Rsvp
@@ -0,0 +1,64 @@
+"""
+Signal receivers of the meetups app
+"""
+from collections import Counter
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_upcoming_meetups
+from .calendars import invalidate_calendars
+from .models import Meetup, Tag
+
+
+@receiver(post_save, sender=Meetup)
+@receiver(post_delete, sender=Meetup)
+@receiver(m2m_changed, sender=Meetup.tags.through)
+@receiver(m2m_changed, sender=Meetup.image_url.through)
+def meetup_changed(sender, **kwargs):
+    """
+    Drops the cached upcoming meetups feed when a meetup, its tags or its
+    images change
+    """
+    invalidate_upcoming_meetups()
+
+
+@receiver(post_save, sender=Meetup)
+@receiver(post_delete, sender=Meetup)
+def meetup_calendar_changed(sender, **kwargs):
+    """
+    Drops the cached calendar feeds when a meetup changes, the feeds of
+    all users attending the meetup may hold it
+    """
+    invalidate_calendars()
+
+
+@receiver(m2m_changed, sender=Meetup.tags.through)
+def meetup_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Moves the meetup counts of tags as meetups are tagged and untagged,
+    removed links are read before they are deleted since the ids given
+    to remove and clear may not be linked
+    """
+    if action == 'post_add':
+        if reverse:
+            Tag.count_meetups({instance.pk: len(pk_set)})
+        else:
+            Tag.count_meetups(dict.fromkeys(pk_set, 1))
+    elif action in ('pre_remove', 'pre_clear'):
+        links = sender.objects.filter(**{'tag' if reverse else 'meetup': instance})
+        if action == 'pre_remove':
+            links = links.filter(**{('meetup' if reverse else 'tag') + '__in': pk_set})
+        removed = Counter(links.values_list('tag_id', flat=True))
+        Tag.count_meetups({tag_id: -count for tag_id, count in removed.items()})
+
+
+@receiver(pre_delete, sender=Meetup)
+def meetup_deleted(sender, instance, **kwargs):
+    """
+    Drops a deleted meetup from the meetup counts of its tags, its links
+    are deleted by cascade without m2m signals
+    """
+    tag_ids = Meetup.tags.through.objects.filter(
+        meetup=instance).values_list('tag_id', flat=True)
+    Tag.count_meetups(dict.fromkeys(tag_ids, -1))
@@ -0,0 +1,108 @@
+"""
+Tests for the iCalendar feeds of meetups
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from meetups.models import Meetup, Rsvp
+from meetups.tests.initial_setup import TestSetUp
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+@mock.patch('meetups.calendars.transaction.on_commit', lambda func: func())
+class TestMeetupCalendars(TestSetUp):
+    """
+    Tests for the calendar feeds of meetups and of their attendees
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.meetup = Meetup.objects.get(title='Test Driven Development')
+
+    def get_meetup_calendar(self, **headers):
+        """
+        Gets the feed of the test meetup
+        """
+        return self.client.get(
+            reverse('meetup_calendar', args=[str(self.meetup.id)]), **headers)
+
+    def get_user_calendar(self):
+        """
+        Subscribes to the feed of the test user and gets it
+        """
+        self.force_authenticate_user()
+        response = self.client.get(reverse('calendar_subscription'))
+        self.client.credentials()
+        return self.client.get(response.data['data']['url'])
+
+    def test_meetup_calendar(self) -> None:
+        """
+        Tests that the feed of a meetup holds its event in folded lines
+        """
+        self.meetup.body = 'A long description, with commas; and a line\nbreak ' * 4
+        self.meetup.save()
+        response = self.get_meetup_calendar()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        lines = response.content.split(b'\r\n')
+        self.assertIn(b'UID:' + str(self.meetup.id).encode() + b'@questioner', lines)
+        self.assertIn(b'SUMMARY:Test Driven Development', lines)
+        self.assertTrue(all(len(line) <= 75 for line in lines))
+        self.assertIn('DESCRIPTION:A long description\\, with commas\\; and a line\\nbreak',
+                      response.content.decode().replace('\r\n ', ''))
+
+    def test_unchanged_feed_is_not_modified(self) -> None:
+        """
+        Tests that polls of an unchanged feed are answered with 304 from
+        the cache and that changing the meetup changes the feed
+        """
+        etag = self.get_meetup_calendar()['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_meetup_calendar(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse([query for query in queries
+                          if 'meetups_' in query['sql']])
+        self.meetup.title = 'Behaviour Driven Development'
+        self.meetup.save()
+        response = self.get_meetup_calendar(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'SUMMARY:Behaviour Driven Development', response.content)
+
+    def test_missing_meetup_calendar(self) -> None:
+        """
+        Tests getting the feed of meetups that do not exist
+        """
+        for meetup_id in ('390239202SFHEIFHJHH', '6f1c1e4e-5d1e-4b3f-9d5b-0a3f3f0f0f0f'):
+            response = self.client.get(reverse('meetup_calendar', args=[meetup_id]))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_user_calendar_follows_rsvps(self) -> None:
+        """
+        Tests that the feed of a user holds the meetups they responded yes to
+        """
+        response = self.get_user_calendar()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(b'BEGIN:VEVENT', response.content)
+        self.meetup.respond(self.user, Rsvp.RESPONSE_VALUES['yes'])
+        response = self.get_user_calendar()
+        self.assertIn(b'SUMMARY:Test Driven Development', response.content)
+        self.meetup.respond(self.user, Rsvp.RESPONSE_VALUES['no'])
+        response = self.get_user_calendar()
+        self.assertNotIn(b'BEGIN:VEVENT', response.content)
+
+    def test_invalid_calendar_token(self) -> None:
+        """
+        Tests getting a feed with a forged token
+        """
+        url = reverse('user_calendar', args=['{}:forged'.format(self.user.id)])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,120 @@
+"""
+Tests for the live event stream of a meetup
+"""
+import json
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+
+from meetups.events import CHANNEL, hub, publish_many
+from meetups.models import Meetup
+from meetups.tests.initial_setup import TestSetUp
+from questions.models import Question
+
+
+class TestMeetupEvents(TestSetUp):
+    """
+    Tests for streaming the events of a meetup
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.meetup = Meetup.objects.get(title='Test Driven Development')
+        self.events_url = reverse('meetup_events', args=[str(self.meetup.id)])
+
+    def test_events_of_invalid_meetup(self):
+        """
+        Tests streaming the events of a meetup that does not exist
+        """
+        response = self.client.get(
+            reverse('meetup_events', args=['invalid-id']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @mock.patch.object(hub, 'start')
+    def test_stream_receives_events(self, start):
+        """
+        Tests that events dispatched to the meetup are sent to its stream
+        and events of other meetups are not
+        """
+        response = self.client.get(self.events_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = iter(response.streaming_content)
+        self.assertTrue(next(stream).startswith(b'retry: '))
+        other_meetup = Meetup.objects.exclude(id=self.meetup.id).first()
+        for meetup, title in ((other_meetup, 'Elsewhere'), (self.meetup, 'Here')):
+            hub.dispatch(json.dumps({
+                'meetup': str(meetup.id),
+                'event': 'question',
+                'data': {'title': title}
+            }))
+        self.assertEqual(
+            next(stream), b'event: question\ndata: {"title": "Here"}\n\n')
+        response.close()
+        self.assertNotIn(str(self.meetup.id), hub.subscribers)
+
+    def test_question_publishes_event(self):
+        """
+        Tests that posting a question notifies the streams of the meetup
+        """
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        url = reverse('question', args=[str(self.meetup.id)])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                url,
+                data=json.dumps({
+                    'title': 'Where is the venue',
+                    'body': 'I would like to know where we are meeting'
+                }),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        notifications = [query['sql'] for query in queries
+                         if 'pg_notify' in query['sql']]
+        self.assertEqual(len(notifications), 1)
+        self.assertIn(CHANNEL, notifications[0])
+
+    def test_large_question_is_posted(self):
+        """
+        Tests that a question whose body does not fit in a notification is
+        saved and announced without its body
+        """
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        url = reverse('question', args=[str(self.meetup.id)])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                url,
+                data=json.dumps({
+                    'title': 'A very detailed question',
+                    'body': 'Every detail of the question ' * 400
+                }),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Question.objects.filter(
+            meetup=self.meetup, title='A very detailed question').exists())
+        notifications = [query['sql'] for query in queries
+                         if 'pg_notify' in query['sql']]
+        self.assertEqual(len(notifications), 1)
+        self.assertNotIn('Every detail', notifications[0])
+
+    def test_oversized_events_are_dropped(self):
+        """
+        Tests that events too large for a notification are not published
+        """
+        with CaptureQueriesContext(connection) as queries:
+            publish_many(str(self.meetup.id), [
+                ('question', {'title': 'x' * 8000}),
+                ('rsvp_summary', {'yes': 1})
+            ])
+        notifications = [query['sql'] for query in queries
+                         if 'pg_notify' in query['sql']]
+        self.assertEqual(len(notifications), 1)
+        self.assertNotIn('x' * 100, notifications[0])
+        self.assertIn('rsvp_summary', notifications[0])
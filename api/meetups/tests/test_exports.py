@@ -0,0 +1,97 @@
+"""
+Tests for exporting the rsvps, questions and votes of a meetup
+"""
+import csv
+import json
+from io import StringIO
+
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from answers.models import Answer, AnswerVote
+from meetups.models import Meetup, Rsvp
+from meetups.tests.initial_setup import TestSetUp
+from questions.models import Question, QuestionVote
+
+
+class TestMeetupExports(TestSetUp):
+    """
+    Tests for streaming exports of a meetup
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.meetup = Meetup.objects.get(title='Test Driven Development')
+        Rsvp.objects.create(meetup=self.meetup, responder=self.user,
+                            response=Rsvp.RESPONSE_VALUES['maybe'])
+        self.question = Question.objects.create(
+            title='Why are we testing models',
+            body='Models are tested by the framework',
+            meetup=self.meetup,
+            created_by=self.user
+        )
+        QuestionVote.objects.create(question=self.question, user=self.admin, vote=1)
+        answer = Answer.objects.create(
+            body='We test our own model methods',
+            creator=self.admin,
+            question=self.question
+        )
+        AnswerVote.objects.create(answer=answer, creator=self.user, vote=-1)
+
+    def export(self, export: str, extension: str):
+        """
+        Requests an export of the meetup as its organizer
+        """
+        self.force_athenticate_admin()
+        return self.client.get(reverse(
+            'meetup_export', args=[str(self.meetup.id), export, extension]))
+
+    def test_export_rsvps_csv(self) -> None:
+        """
+        Tests exporting the rsvps of a meetup as CSV
+        """
+        response = self.export('rsvps', 'csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['email'], self.user.email)
+        self.assertEqual(rows[0]['response'], 'maybe')
+
+    def test_export_questions_ndjson(self) -> None:
+        """
+        Tests exporting the questions of a meetup with their authors
+        """
+        response = self.export('questions', 'ndjson')
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['title'], row['author_email']) for row in rows],
+                         [(self.question.title, self.user.email)])
+
+    def test_export_votes(self) -> None:
+        """
+        Tests that question and answer votes are exported together
+        """
+        response = self.export('votes', 'ndjson')
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['target'], row['voter_email'], row['vote']) for row in rows],
+                         [('question', self.admin.email, 'upvote'),
+                          ('answer', self.user.email, 'downvote')])
+
+    def test_export_not_organizer(self) -> None:
+        """
+        Tests that only the organizer of the meetup exports it
+        """
+        self.force_authenticate_user()
+        response = self.client.get(reverse(
+            'meetup_export', args=[str(self.meetup.id), 'rsvps', 'csv']))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_export(self) -> None:
+        """
+        Tests requesting an export that does not exist
+        """
+        response = self.export('users', 'csv')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,108 @@
+"""
+Tests for importing catalogs of meetups
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from meetups.models import Image, Meetup, Tag
+from meetups.tests.initial_setup import TestSetUp
+
+
+class TestImportMeetups(TestSetUp):
+    """
+    Tests for the meetup import endpoint and command
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.import_url = reverse('import_meetups')
+        self.scheduled_date = str(timezone.now() + timezone.timedelta(days=10))
+
+    def import_meetups(self, body: str, content_type: str = 'text/csv'):
+        """
+        Posts a document to the import endpoint as an admin
+        """
+        self.force_athenticate_admin()
+        return self.client.generic(
+            'POST', self.import_url, body.encode('utf-8'),
+            content_type=content_type)
+
+    def test_import_csv(self) -> None:
+        """
+        Tests that valid rows are imported and every failing row is reported
+        """
+        rows = [
+            'title,body,location,scheduled_date,tags,images',
+            'Graph Theory,Walks and paths,MIT,{date},math|graphs,http://questioner.com/a.jpg',
+            'Number Theory,Primes,MIT,{date},math,',
+            '!@#$,Invalid title,MIT,{date},,',
+            'Past Meetup,In the past,MIT,2019-03-04 06:00Z,,',
+            'Graph Theory,Walks and paths again,MIT,{date},,',
+            'Test Driven Development,Another body,Andela Campus,{existing},,',
+        ]
+        existing = Meetup.objects.get(title='Test Driven Development')
+        response = self.import_meetups('\n'.join(rows).format(
+            date=self.scheduled_date, existing=existing.scheduled_date))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['data']['errors']],
+                         [4, 5, 6, 7])
+        self.assertEqual(response.data['data']['errors'][0]['errors'],
+                         ['!@#$ is not a valid meetup title'])
+        meetup = Meetup.objects.get(title='Graph Theory')
+        self.assertEqual(sorted(meetup.tags.values_list('tag_name', flat=True)),
+                         ['graphs', 'math'])
+        self.assertEqual(meetup.image_url.count(), 1)
+        self.assertIsNotNone(meetup.body_fingerprint)
+        self.assertEqual(Tag.objects.filter(tag_name='math').count(), 1)
+
+    def test_import_non_admin(self) -> None:
+        """
+        Tests that only admins import meetups
+        """
+        self.force_authenticate_user()
+        response = self.client.generic(
+            'POST', self.import_url, b'title\n', content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_import_unsupported_format(self) -> None:
+        """
+        Tests importing a document that is neither CSV nor NDJSON
+        """
+        response = self.import_meetups('<meetups/>', 'application/xml')
+        self.assertEqual(response.status_code,
+                         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_import_command(self) -> None:
+        """
+        Tests importing an NDJSON file in batches with the command
+        """
+        lines = [json.dumps({
+            'title': 'Meetup number {}'.format(index),
+            'body': 'Imported meetup number {}'.format(index),
+            'location': 'Andela Campus',
+            'scheduled_date': self.scheduled_date,
+            'tags': ['imported'],
+            'images': ['http://questioner.com/{}.jpg'.format(index % 2)]
+        }) for index in range(5)]
+        lines.insert(2, '{"title": ')
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as document:
+            document.write('\n'.join(lines))
+        self.addCleanup(os.remove, document.name)
+        output = StringIO()
+        call_command('import_meetups', document.name, creator=self.admin.email,
+                     batch_size=2, stdout=output)
+        reports = output.getvalue().splitlines()
+        self.assertEqual(json.loads(reports[0]),
+                         {'row': 3, 'errors': ['The line is not valid JSON']})
+        self.assertIn('Imported 5 meetups, 1 rows failed', reports[1])
+        self.assertEqual(Meetup.objects.filter(tags__tag_name='imported').count(), 5)
+        self.assertEqual(Tag.objects.get(tag_name='imported').meetup_count, 5)
+        self.assertEqual(Image.objects.count(), 2)
@@ -0,0 +1,111 @@
+"""
+Memory regression tests for list endpoints on large tables
+"""
+import tracemalloc
+from django.utils import timezone
+from rest_framework import status
+from meetups.models import Meetup
+from meetups.tests.initial_setup import TestSetUp
+from questions.models import Question
+from answers.models import Answer
+
+
+class TestListMemory(TestSetUp):
+    """
+    Tests that list endpoints do not load whole tables into memory
+    """
+    number_of_rows = 3000
+    peak_allocation_limit = 1024 * 1024
+    body = 'A long body that makes loading every row expensive ' * 40
+
+    def setUp(self):
+        super().setUp()
+        Meetup.objects.bulk_create([
+            Meetup(
+                title='Meetup number {}'.format(index),
+                body=self.body,
+                location='Andela Campus',
+                scheduled_date=timezone.now()+timezone.timedelta(days=3),
+                creator=self.admin
+            ) for index in range(self.number_of_rows)
+        ])
+        self.meetup = Meetup.objects.all()[0]
+        Question.objects.bulk_create([
+            Question(
+                title='Question number {}'.format(index),
+                body=self.body,
+                meetup=self.meetup,
+                created_by=self.user
+            ) for index in range(self.number_of_rows)
+        ])
+        self.question = Question.objects.filter(meetup=self.meetup)[0]
+        Answer.objects.bulk_create([
+            Answer(
+                body='{} {}'.format(self.body, index),
+                question=self.question,
+                creator=self.user
+            ) for index in range(self.number_of_rows)
+        ])
+
+    def get_peak_allocation(self, url: str) -> int:
+        """
+        Requests url and returns the peak memory allocated by the request,
+        a first request warms up caches that are filled once per process
+        """
+        self.client.get(path=url)
+        tracemalloc.start()
+        try:
+            response = self.client.get(path=url)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return peak
+
+    def test_all_meetups_memory(self) -> None:
+        """
+        Tests peak allocation of fetching all meetups
+        """
+        peak = self.get_peak_allocation(self.all_meetups_url)
+        self.assertLess(peak, self.peak_allocation_limit)
+
+    def test_upcoming_meetups_memory(self) -> None:
+        """
+        Tests peak allocation of fetching upcoming meetups
+        """
+        peak = self.get_peak_allocation(self.upcoming_meetups_url)
+        self.assertLess(peak, self.peak_allocation_limit)
+
+    def test_questions_memory(self) -> None:
+        """
+        Tests peak allocation of fetching the questions of a meetup
+        """
+        peak = self.get_peak_allocation(
+            '/api/meetups/{}/questions'.format(self.meetup.id))
+        self.assertLess(peak, self.peak_allocation_limit)
+
+    def test_answers_memory(self) -> None:
+        """
+        Tests peak allocation of fetching the answers of a question
+        """
+        peak = self.get_peak_allocation(
+            '/api/meetups/{}/questions/{}/answers'.format(
+                self.meetup.id, self.question.id))
+        self.assertLess(peak, self.peak_allocation_limit)
+
+    def test_questions_export_memory(self) -> None:
+        """
+        Tests peak allocation of exporting the questions of a meetup
+        """
+        self.force_athenticate_admin()
+        url = '/api/meetups/{}/exports/questions.csv'.format(self.meetup.id)
+        b''.join(self.client.get(path=url).streaming_content)
+        tracemalloc.start()
+        try:
+            response = self.client.get(path=url)
+            rows = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(rows, self.number_of_rows + 1)
+        self.assertLess(peak, self.peak_allocation_limit)
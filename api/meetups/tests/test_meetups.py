@@ -4,15 +4,23 @@ Tests for meetup views and models
 from meetups.tests.initial_setup import TestSetUp
 from rest_framework import status
 import django
-from meetups.models import Meetup, Rsvp
+from meetups.models import Meetup, Rsvp, Tag, Image
 from django.utils import timezone
+from django.conf import settings
 from rest_framework.authtoken.models import Token
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 import json
 from users.models import User
 from rest_framework.reverse import reverse
 from rest_framework.response import Response
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+from typing import List
+from unittest import mock
 
 
 class TestMeetupModel(TestSetUp):
@@ -107,6 +115,34 @@ class TestPostMeetup(TestSetUp):
         self.assertEqual(response.data.get('error'),
                          'Admin only can create meetup')
 
+    def test_tags_and_images_query_count(self) -> None:
+        """
+        Tests that the number of queries for creating a meetup does not
+        grow with its tags and images
+        """
+        Tag.objects.create(tag_name='tag0')
+        self.meetup_data['scheduled_date'] = str(
+            timezone.now()+timezone.timedelta(days=5))
+        self.force_athenticate_admin()
+        self.post_meetup()
+        queries = []
+        for number in (2, 30):
+            self.meetup_data['title'] = 'Meetup with {} tags'.format(number)
+            self.meetup_data['body'] = 'A meetup tagged {} times'.format(number)
+            self.meetup_data['tags'] = [
+                'tag{}'.format(index) for index in range(number)]
+            self.meetup_data['images'] = [
+                'http://questioner.com/{}.jpg'.format(index) for index in range(number)]
+            with CaptureQueriesContext(connection) as captured:
+                response = self.post_meetup()
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+        meetup = Meetup.objects.get(title='Meetup with 30 tags')
+        self.assertEqual(meetup.tags.count(), 30)
+        self.assertEqual(meetup.image_url.count(), 30)
+        self.assertEqual(Tag.objects.filter(tag_name='tag0').count(), 1)
+
     def test_missing_images(self) -> None:
         """
         Tests for successful creation of meetup without images
@@ -299,6 +335,71 @@ class TestViewMeetups(TestSetUp):
         response = self.get_all_meetups()
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_cursor_pagination_all_meetups(self) -> None:
+        """
+        Tests walking all meetups with cursor pagination
+        """
+        self.all_meetups_url = self.all_meetups_url + \
+            '?pagination=cursor&page_limit=1'
+        first_page = self.get_all_meetups()
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first_page.data.get('results')), 1)
+        self.assertNotIn('count', first_page.data)
+        second_page = self.client.get(first_page.data.get('next'))
+        self.assertEqual(len(second_page.data.get('results')), 1)
+        self.assertIsNone(second_page.data.get('next'))
+        self.assertNotEqual(first_page.data.get('results')[0].get('id'),
+                            second_page.data.get('results')[0].get('id'))
+
+    def test_max_page_size(self) -> None:
+        """
+        Tests that page_limit cannot exceed the maximum page size
+        """
+        Meetup.objects.bulk_create([
+            Meetup(
+                title='Meetup number {}'.format(index),
+                body='A meetup to test page sizes',
+                location='Andela Campus',
+                scheduled_date=timezone.now()+timezone.timedelta(days=3),
+                creator=self.admin
+            ) for index in range(settings.MAX_PAGE_SIZE)
+        ])
+        self.upcoming_meetups_url = self.upcoming_meetups_url + \
+            '?page_limit=100000'
+        response = self.get_upcoming_meetups()
+        self.assertEqual(len(response.data.get('results')),
+                         settings.MAX_PAGE_SIZE)
+
+    def test_meetup_page_query_count(self) -> None:
+        """
+        Tests that the number of queries for a page of meetups does not
+        grow with the page size
+        """
+        for index in range(6):
+            creator = User.objects.create(
+                email='creator{}@questioner.com'.format(index),
+                name='Creator {}'.format(index),
+                nick_name='creator{}'.format(index),
+                password='@Creator123'
+            )
+            meetup = Meetup.objects.create(
+                title='Meetup number {}'.format(index),
+                body='A meetup to count the queries of a page',
+                location='Andela Campus',
+                scheduled_date=timezone.now()+timezone.timedelta(days=3),
+                creator=creator
+            )
+            meetup.tags.add(Tag.objects.create(tag_name='tag{}'.format(index)))
+            meetup.image_url.add(Image.objects.create(
+                image_url='https://questioner.com/{}.png'.format(index)))
+        for url in (self.all_meetups_url, self.upcoming_meetups_url):
+            with CaptureQueriesContext(connection) as small_page:
+                self.client.get(url + '?page_limit=1')
+            with CaptureQueriesContext(connection) as large_page:
+                response = self.client.get(url + '?page_limit=8')
+            self.assertEqual(len(response.data.get('results')), 8)
+            self.assertEqual(len(large_page), len(small_page))
+
 
 class TestRsvpModel(TestCase):
     """
@@ -398,7 +499,7 @@ class TestGetRsvos(TestSetUp):
         self.rsvp = Rsvp.objects.create(
             meetup=self.meetup,
             responder=self.user,
-            response='yes',
+            response=Rsvp.RESPONSE_VALUES['yes'],
         )
 
     def get_rsvps_on_meetup(self, meetup_url: str) -> Response:
@@ -436,3 +537,390 @@ class TestGetRsvos(TestSetUp):
         """
         response = self.get_rsvps_on_meetup(meetup_url=self.rsvps_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def add_rsvps(self, number: int) -> None:
+        """
+        Adds yes rsvps of new users to the meetup
+        """
+        for index in range(number):
+            responder = User.objects.create(
+                email='responder{}@questioner.com'.format(index),
+                name='Responder {}'.format(index),
+                nick_name='responder{}'.format(index),
+                password='@Responder123'
+            )
+            Rsvp.objects.create(meetup=self.meetup, responder=responder,
+                                response=Rsvp.RESPONSE_VALUES['yes'])
+
+    def test_rsvp_page_query_count(self):
+        """
+        Tests that rsvps are paginated and their responders are joined
+        """
+        with CaptureQueriesContext(connection) as small_page:
+            self.get_rsvps_on_meetup(meetup_url=self.rsvps_url)
+        self.add_rsvps(5)
+        with CaptureQueriesContext(connection) as large_page:
+            response = self.get_rsvps_on_meetup(
+                meetup_url=self.rsvps_url + '?page_limit=4')
+        self.assertEqual(len(response.data.get('results')), 4)
+        self.assertEqual(response.data.get('count'), 6)
+        self.assertIn('summary', response.data)
+        self.assertEqual(len(large_page), len(small_page))
+
+    def test_stream_rsvps(self):
+        """
+        Tests that the organizer streams every rsvp as a line of JSON
+        """
+        self.add_rsvps(4)
+        token, _ = Token.objects.get_or_create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        with mock.patch('meetups.views.stream_rsvps.__defaults__', (2,)):
+            response = self.get_rsvps_on_meetup(
+                meetup_url=self.rsvps_url + '?stream=true')
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        responders = [json.loads(line)['responder']['id'] for line in lines]
+        self.assertEqual(len(responders), 5)
+        self.assertEqual(len(set(responders)), 5)
+
+    def test_stream_rsvps_not_organizer(self):
+        """
+        Tests that only the organizer of the meetup streams its rsvps
+        """
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = self.get_rsvps_on_meetup(
+            meetup_url=self.rsvps_url + '?stream=true')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestRsvpCounters(TestSetUp):
+    """
+    Tests for the rsvp counters stored on meetups
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.meetup = Meetup.objects.all()[0]
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    def respond(self, response: str) -> Response:
+        """
+        Posts an rsvp of the test user to the meetup
+        """
+        return self.client.post(
+            reverse('rsvp', args=[str(self.meetup.id)]),
+            data=json.dumps({"response": response}),
+            content_type="application/json"
+        )
+
+    def test_changing_response_moves_counters(self):
+        """
+        Tests that changing a response moves the counters of the meetup
+        """
+        self.assertEqual(self.respond('Yes').status_code,
+                         status.HTTP_201_CREATED)
+        self.meetup.refresh_from_db()
+        self.assertEqual(self.meetup.rsvp_summary,
+                         {'yes': 1, 'no': 0, 'maybe': 0})
+        self.respond('maybe')
+        self.respond('MAYBE')
+        self.meetup.refresh_from_db()
+        self.assertEqual(self.meetup.rsvp_summary,
+                         {'yes': 0, 'no': 0, 'maybe': 1})
+
+    def test_listing_does_not_count_rsvps(self):
+        """
+        Tests that listing meetups reads the counters instead of the rsvps
+        """
+        self.respond('no')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.all_meetups_url)
+        summaries = [meetup.get('rsvp_summary')
+                     for meetup in response.data.get('results')
+                     if meetup.get('id') == str(self.meetup.id)]
+        self.assertEqual(summaries, [{'yes': 0, 'no': 1, 'maybe': 0}])
+        self.assertFalse([query for query in queries
+                          if 'meetups_rsvp' in query['sql']])
+
+    def test_reconcile_rsvp_counters(self):
+        """
+        Tests that the reconcile command rebuilds the counters from the rsvps
+        """
+        Rsvp.objects.create(meetup=self.meetup, responder=self.admin,
+                            response=Rsvp.RESPONSE_VALUES['maybe'])
+        Meetup.objects.filter(id=self.meetup.id).update(rsvp_yes=7)
+        call_command('reconcile_meetup_rsvps', stdout=StringIO())
+        self.meetup.refresh_from_db()
+        self.assertEqual(self.meetup.rsvp_summary,
+                         {'yes': 0, 'no': 0, 'maybe': 1})
+
+    def test_response_must_be_a_choice(self):
+        """
+        Tests that responses only containing a choice are rejected
+        """
+        response = self.respond('yesss')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data.get('response'),
+                         ['RSVP, can only take Yes, No or Maybe'])
+
+    def test_one_rsvp_per_responder(self):
+        """
+        Tests that a responder keeps one rsvp listed by its response name
+        """
+        self.respond('Yes')
+        self.respond('No')
+        response = self.client.get(
+            '/api/meetups/{}/rsvps'.format(self.meetup.id))
+        self.assertEqual([rsvp.get('response') for rsvp in response.data.get('results')],
+                         ['no'])
+        with self.assertRaises(django.db.utils.IntegrityError):
+            Rsvp.objects.create(meetup=self.meetup, responder=self.user,
+                                response=Rsvp.RESPONSE_VALUES['maybe'])
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+@mock.patch('meetups.cache.transaction.on_commit', lambda func: func())
+class TestUpcomingMeetupsCache(TestSetUp):
+    """
+    Tests for the cached upcoming meetups feed
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def upcoming_titles(self) -> List[str]:
+        """
+        Returns the titles of the first page of upcoming meetups
+        """
+        response = self.get_upcoming_meetups()
+        return [meetup.get('title') for meetup in response.data.get('results')]
+
+    def test_feed_is_cached(self) -> None:
+        """
+        Tests that a cached page is answered without querying the database
+        """
+        self.get_upcoming_meetups()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_upcoming_meetups()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries
+                          if 'meetups_' in query['sql']])
+
+    def test_changed_meetup_invalidates_feed(self) -> None:
+        """
+        Tests that creating, updating and deleting meetups drops the cache
+        """
+        self.assertEqual(len(self.upcoming_titles()), 2)
+        meetup = Meetup.objects.create(
+            title='Behaviour Driven Development',
+            body='Writing specifications before the code',
+            location='Andela Campus',
+            creator=self.admin,
+            scheduled_date=timezone.now()+timezone.timedelta(days=5)
+        )
+        self.assertIn(meetup.title, self.upcoming_titles())
+        meetup.title = 'Behaviour Driven Design'
+        meetup.save()
+        self.assertIn(meetup.title, self.upcoming_titles())
+        meetup.delete()
+        self.assertNotIn(meetup.title, self.upcoming_titles())
+
+    def test_started_meetup_leaves_feed(self) -> None:
+        """
+        Tests that a cached page expires once its earliest meetup starts
+        """
+        Meetup.objects.create(
+            title='Behaviour Driven Development',
+            body='Writing specifications before the code',
+            location='Andela Campus',
+            creator=self.admin,
+            scheduled_date=timezone.now()+timezone.timedelta(hours=1)
+        )
+        self.assertEqual(self.upcoming_titles()[0],
+                         'Behaviour Driven Development')
+        later = timezone.now()+timezone.timedelta(hours=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertNotIn('Behaviour Driven Development',
+                             self.upcoming_titles())
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+@mock.patch('meetups.cache.transaction.on_commit', lambda func: func())
+class TestProximitySearch(TestSetUp):
+    """
+    Tests for finding upcoming meetups near a point
+    """
+
+    def setUp(self):
+        super().setUp()
+        for title, latitude, longitude in (('Nairobi Python', -1.2864, 36.8172),
+                                           ('Westlands Django', -1.2676, 36.8108),
+                                           ('Mombasa Rust', -4.0435, 39.6682)):
+            Meetup.objects.create(
+                title=title,
+                body='Meeting at {}'.format(title),
+                location=title.split()[0],
+                creator=self.admin,
+                scheduled_date=timezone.now()+timezone.timedelta(days=5),
+                latitude=latitude,
+                longitude=longitude
+            )
+
+    def search(self, **params) -> Response:
+        """
+        Searches the upcoming meetups with the given query parameters
+        """
+        return self.client.get(self.upcoming_meetups_url, params)
+
+    def test_meetups_within_radius(self) -> None:
+        """
+        Tests that only meetups within the radius are returned with their
+        distance and that meetups without coordinates are left out
+        """
+        response = self.search(lat=-1.2921, lon=36.8219, radius=5)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        distances = {meetup.get('title'): meetup.get('distance')
+                     for meetup in response.data.get('results')}
+        self.assertEqual(set(distances), {'Nairobi Python', 'Westlands Django'})
+        self.assertLess(distances['Nairobi Python'], 1)
+        response = self.search(lat=-1.2921, lon=36.8219, radius=200)
+        self.assertEqual(len(response.data.get('results')), 2)
+
+    def test_no_meetups_nearby(self) -> None:
+        """
+        Tests searching where no meetups are scheduled
+        """
+        response = self.search(lat=51.5072, lon=-0.1276)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_search(self) -> None:
+        """
+        Tests searching with invalid points and radiuses
+        """
+        for params in ({'lat': 'north', 'lon': 36.8},
+                       {'lat': -1.29},
+                       {'lat': 91, 'lon': 36.8},
+                       {'lat': -1.29, 'lon': 36.8, 'radius': 0},
+                       {'lat': -1.29, 'lon': 36.8, 'radius': settings.MAX_SEARCH_RADIUS + 1}):
+            response = self.search(**params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('error', response.data)
+
+    def test_search_is_not_cached(self) -> None:
+        """
+        Tests that proximity searches neither use nor fill the feed cache
+        """
+        cache.clear()
+        self.get_upcoming_meetups()
+        response = self.search(lat=-4.0435, lon=39.6682, radius=1)
+        self.assertEqual([meetup.get('title') for meetup in response.data.get('results')],
+                         ['Mombasa Rust'])
+        self.assertEqual(len(self.get_upcoming_meetups().data.get('results')), 5)
+
+    def test_coordinates_given_together(self) -> None:
+        """
+        Tests that a meetup is created with both of its coordinates or none
+        """
+        self.meetup_data['scheduled_date'] = str(
+            timezone.now()+timezone.timedelta(days=5))
+        self.meetup_data['latitude'] = -1.2864
+        response = self.create_meetup()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.meetup_data['longitude'] = 36.8172
+        response = self.create_meetup()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        meetup = Meetup.objects.get(title=self.meetup_data['title'])
+        self.assertEqual((meetup.latitude, meetup.longitude), (-1.2864, 36.8172))
+
+
+class TestTagFacets(TestSetUp):
+    """
+    Tests for filtering meetups by tags and counting meetups per tag
+    """
+
+    def setUp(self):
+        super().setUp()
+        python, django, rust = Tag.resolve(['python', 'django', 'rust'])
+        self.meetups = {}
+        for title, tags in (('Python Web', [python, django]),
+                            ('Python Data', [python]),
+                            ('Rust Systems', [rust])):
+            meetup = Meetup.objects.create(
+                title=title,
+                body='Meeting about {}'.format(title),
+                location='Andela Campus',
+                creator=self.admin,
+                scheduled_date=timezone.now()+timezone.timedelta(days=5)
+            )
+            meetup.tags.add(*tags)
+            self.meetups[title] = meetup
+
+    def counts(self) -> dict:
+        """
+        Returns the stored meetup counts of tags by tag name
+        """
+        return dict(Tag.objects.filter(meetup_count__gt=0).values_list(
+            'tag_name', 'meetup_count'))
+
+    def test_filter_by_tags(self) -> None:
+        """
+        Tests that listed meetups are tagged with all the requested tags
+        """
+        for url in (self.all_meetups_url, self.upcoming_meetups_url):
+            response = self.client.get(url, {'tags': 'python'})
+            self.assertEqual({meetup.get('title') for meetup in response.data.get('results')},
+                             {'Python Web', 'Python Data'})
+            response = self.client.get(url, {'tags': 'python, django'})
+            self.assertEqual([meetup.get('title') for meetup in response.data.get('results')],
+                             ['Python Web'])
+            response = self.client.get(url, {'tags': 'python,cobol'})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_counts_follow_tagging(self) -> None:
+        """
+        Tests that the counts move as meetups are tagged, untagged and deleted
+        """
+        self.assertEqual(self.counts(), {'python': 2, 'django': 1, 'rust': 1})
+        web = self.meetups['Python Web']
+        web.tags.set(Tag.resolve(['python', 'rust']))
+        self.assertEqual(self.counts(), {'python': 2, 'rust': 2})
+        rust = Tag.objects.get(tag_name='rust')
+        rust.meetup_set.remove(web, self.meetups['Python Data'])
+        self.assertEqual(self.counts(), {'python': 2, 'rust': 1})
+        self.meetups['Python Data'].tags.clear()
+        self.assertEqual(self.counts(), {'python': 1, 'rust': 1})
+        web.delete()
+        self.assertEqual(self.counts(), {'rust': 1})
+
+    def test_facets(self) -> None:
+        """
+        Tests that facets are read from the stored counts, most used first
+        """
+        url = reverse('meetup_tags')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get('results'), [
+            {'tag': 'python', 'meetups': 2},
+            {'tag': 'django', 'meetups': 1},
+            {'tag': 'rust', 'meetups': 1}
+        ])
+        self.assertFalse([query for query in queries
+                          if 'meetups_meetup_tags' in query['sql']])
+
+    def test_reconcile_tag_counts(self) -> None:
+        """
+        Tests that the reconcile command recomputes drifted counts
+        """
+        Tag.objects.update(meetup_count=7)
+        out = StringIO()
+        call_command('reconcile_tag_counts', stdout=out)
+        self.assertIn('Reconciled meetup counts of 3 tags', out.getvalue())
+        self.assertEqual(self.counts(), {'python': 2, 'django': 1, 'rust': 1})
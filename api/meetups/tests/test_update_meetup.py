@@ -3,7 +3,7 @@ from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 from rest_framework.authtoken.models import Token
 from users.models import User
-from meetups.models import Meetup
+from meetups.models import Meetup, Tag
 from django.utils import timezone
 
 
@@ -129,3 +129,35 @@ class BaseTest(APITestCase):
             format='json'
         )
         self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_update_replaces_tags_and_images(self):
+        token, created = Token.objects.get_or_create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION='Token '+token.key)
+        self.meetup.tags.add(Tag.objects.create(tag_name='old'))
+        self.update_data['tags'] = ['python', 'django', 'python']
+        self.update_data['images'] = ['http://questioner.com/new.jpg']
+        response = self.client.put(
+            path=self.update_meetup_url+self.id+'/',
+            data=self.update_data,
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(self.meetup.tags.values_list('tag_name', flat=True)),
+            ['django', 'python'])
+        self.assertEqual(
+            list(self.meetup.image_url.values_list('image_url', flat=True)),
+            ['http://questioner.com/new.jpg'])
+
+    def test_normal_user_keeps_tags(self):
+        token, created = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token '+token.key)
+        self.meetup.tags.add(Tag.objects.create(tag_name='old'))
+        self.update_data['tags'] = ['python']
+        self.client.put(
+            path=self.update_meetup_url+self.id+'/',
+            data=self.update_data,
+            format='json'
+        )
+        self.assertEqual(
+            list(self.meetup.tags.values_list('tag_name', flat=True)), ['old'])
@@ -5,19 +5,38 @@ from django.urls import path, re_path
 from django.conf.urls import url
 from meetups.views import (
     MeetupViews,
+    MeetupCalendarView,
+    UserCalendarView,
+    CalendarSubscriptionView,
     GetAllMeetups,
     GetSpecificMeetup,
     GetUpcomingMeetups,
+    GetTagFacets,
     RspvPostView,
-    GetRsvps
+    GetRsvps,
+    MeetupEventsView,
+    MeetupExportView,
+    MeetupImportView
 )
 
 urlpatterns = [
     path('meetups', MeetupViews.as_view()),
     path('meetups/', GetAllMeetups.as_view()),
+    path('meetups/import', MeetupImportView.as_view(), name='import_meetups'),
+    path('meetups/calendar', CalendarSubscriptionView.as_view(),
+         name='calendar_subscription'),
+    path('meetups/calendars/<str:token>.ics', UserCalendarView.as_view(),
+         name='user_calendar'),
     path('meetups/<str:meetupid>', GetSpecificMeetup.as_view()),
     path('meetups/upcoming/', GetUpcomingMeetups.as_view()),
+    path('meetups/tags/', GetTagFacets.as_view(), name='meetup_tags'),
     path('meetups/<str:id>/rsvp', RspvPostView.as_view(), name='rsvp'),
     path('meetups/<str:meetupid>/', MeetupViews.as_view()),
-    path('meetups/<str:meetup_id>/rsvps', GetRsvps.as_view())
+    path('meetups/<str:meetup_id>/rsvps', GetRsvps.as_view()),
+    path('meetups/<str:meetup_id>/exports/<str:export>.<str:extension>',
+         MeetupExportView.as_view(), name='meetup_export'),
+    path('meetups/<str:meetup_id>/events',
+         MeetupEventsView.as_view(), name='meetup_events'),
+    path('meetups/<str:meetup_id>/calendar.ics',
+         MeetupCalendarView.as_view(), name='meetup_calendar')
 ]
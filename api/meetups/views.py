@@ -1,31 +1,60 @@
 """
 Views for operations performed on meetups
 """
+import json
+import queue
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
 from django.db.utils import DataError
 
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.shortcuts import render
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView, Response
+from .cache import feed_version, get_upcoming_page, set_upcoming_page
+from .calendars import (
+    calendar_token,
+    get_calendar,
+    meetup_feed,
+    render_meetup_calendar,
+    render_user_calendar,
+    token_user_id,
+    user_feed
+)
+from .events import hub, publish
+from .exports import EXPORTS, export_lines
+from .importer import import_meetups
 from .models import Meetup, Tag, Image
 from .serializers import (
     MeetupSerializer,
     TagSerializer,
     UpdateMeetupSerializer,
     FetchMeetupSerializer,
-    RsvpSerializer
+    FetchRsvpSerializer,
+    RsvpSerializer,
+    TagFacetSerializer
 )
 from rest_framework import status, permissions
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from utils.validators import valid_meetup
 from utils.token_validation import TokenAllowedPermission
 from rest_framework.request import Request
+from rest_framework.reverse import reverse
 from .models import Meetup, Tag, Image, Rsvp
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 from rest_framework.decorators import permission_classes, api_view
-from rest_framework.pagination import PageNumberPagination
+from utils.conditional import not_modified, set_validators
+from utils.exports import FORMATS
+from utils.pagination import get_paginator
+from utils.renderers import CalendarRenderer, EventStreamRenderer, format_event
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 
 
 class MeetupViews(APIView):
@@ -45,26 +74,6 @@ class MeetupViews(APIView):
             request.data['creator'] = request.user
             tags = request.data.get('tags')
             images = request.data.get('images')
-            tag_list = []
-            image_list = []
-            if tags:
-                for tag in tags:
-                    tag_object, created = Tag.objects.update_or_create(
-                        tag_name=tag,
-                        defaults={
-                            'tag_name': tag
-                        }
-                    )
-                    tag_list.append(tag_object)
-            if images:
-                for image in images:
-                    image_object, created = Image.objects.update_or_create(
-                        image_url=image,
-                        defaults={
-                            'image_url': image
-                        }
-                    )
-                    image_list.append(image_object)
             data = request.data
             serializer = MeetupSerializer(data=data)
             if not (request.user.is_staff):
@@ -77,18 +86,30 @@ class MeetupViews(APIView):
                 )
             elif serializer.is_valid():
                 data = request.data
-                meetup, created = Meetup.objects.update_or_create(
-                    title=data.get('title'),
-                    location=data.get('location'),
-                    scheduled_date=data.get('scheduled_date'),
-                    defaults={
-                        'body': data.get('body'),
-                        'creator': data.get('creator')
-                    }
-                )
-                [meetup.image_url.add(image_object)
-                 for image_object in image_list]
-                [meetup.tags.add(tag_item) for tag_item in tag_list]
+                try:
+                    with transaction.atomic():
+                        meetup, created = Meetup.objects.update_or_create(
+                            title=data.get('title'),
+                            location=data.get('location'),
+                            scheduled_date=data.get('scheduled_date'),
+                            defaults={
+                                'body': data.get('body'),
+                                'creator': data.get('creator'),
+                                'latitude': serializer.validated_data.get('latitude'),
+                                'longitude': serializer.validated_data.get('longitude')
+                            }
+                        )
+                except IntegrityError:
+                    return Response(
+                        data={
+                            'error': 'A meetup with that body is already scheduled at that time and location'
+                        },
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                if images:
+                    meetup.image_url.add(*Image.resolve(images))
+                if tags:
+                    meetup.tags.add(*Tag.resolve(tags))
                 response = Response({
                     'data': serializer.data,
                     'status': status.HTTP_201_CREATED
@@ -153,28 +174,6 @@ class MeetupViews(APIView):
             request.data['creator'] = request.user
             tags = request.data.get('tags')
             images = request.data.get('images')
-            tag_list = []
-            image_list = []
-            if tags:
-                meetup.tags.clear()
-                for tag in tags:
-                    tag_object, created = Tag.objects.update_or_create(
-                        tag_name=tag,
-                        defaults={
-                            'tag_name': tag
-                        }
-                    )
-                    tag_list.append(tag_object)
-            if images:
-                meetup.image_url.clear()
-                for image in images:
-                    image_object, created = Image.objects.update_or_create(
-                        image_url=image,
-                        defaults={
-                            'image_url': image
-                        }
-                    )
-                    image_list.append(image_object)
             data = request.data
             if not(request.user.is_staff):
                 context = {
@@ -202,10 +201,32 @@ class MeetupViews(APIView):
                     meetup.scheduled_date = data.get('scheduled_date')
                 if data.get('body'):
                     meetup.body = data.get('body')
-                [meetup.image_url.add(image_object)
-                 for image_object in image_list]
-                [meetup.tags.add(tag_item) for tag_item in tag_list]
-                meetup.save()
+                if 'latitude' in data or 'longitude' in data:
+                    coordinates = MeetupSerializer(
+                        meetup, data={'latitude': data.get('latitude'),
+                                      'longitude': data.get('longitude')},
+                        partial=True)
+                    if not coordinates.is_valid():
+                        return Response(
+                            data=coordinates.errors,
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    meetup.latitude = coordinates.validated_data.get('latitude')
+                    meetup.longitude = coordinates.validated_data.get('longitude')
+                try:
+                    with transaction.atomic():
+                        meetup.save()
+                except IntegrityError:
+                    return Response(
+                        data={
+                            'Error': 'A meetup with that body is already scheduled at that time and location'
+                        },
+                        status=status.HTTP_406_NOT_ACCEPTABLE
+                    )
+                if images:
+                    meetup.image_url.set(Image.resolve(images))
+                if tags:
+                    meetup.tags.set(Tag.resolve(tags))
                 serializer = UpdateMeetupSerializer(meetup)
                 context = {
                     'data': [serializer.data],
@@ -222,6 +243,59 @@ class MeetupViews(APIView):
         return response
 
 
+@method_decorator(transaction.non_atomic_requests, name='dispatch')
+class MeetupImportView(APIView):
+    """
+    Imports catalogs of meetups
+    POST /api/meetups/import
+    """
+    permission_classes = [permissions.IsAuthenticated, TokenAllowedPermission]
+    formats = {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'ndjson'
+    }
+
+    def post(self, request: Request) -> Response:
+        """
+        Imports the meetups of a CSV or newline delimited JSON body, the
+        body is read line by line and every batch of rows is committed on
+        its own. Responds with the report of every row that failed
+        """
+        if not request.user.is_staff:
+            return Response({
+                'error': 'Admin only can import meetups'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        format = self.formats.get(request.content_type.split(';')[0].strip())
+        if not format:
+            return Response({
+                'error': 'Meetups are imported from text/csv or application/x-ndjson'
+            }, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        lines = (line.decode('utf-8', 'replace') for line in request._request)
+        created = 0
+        errors = []
+        for report in import_meetups(lines, format, request.user):
+            if 'errors' in report:
+                errors.append(report)
+            else:
+                created += 1
+        return Response({
+            'data': {
+                'created': created,
+                'failed': len(errors),
+                'errors': errors
+            },
+            'status': status.HTTP_200_OK
+        }, status=status.HTTP_200_OK)
+
+
+def tag_names(request: Request) -> List[str]:
+    """
+    Reads the comma separated tag names of the tags query parameter
+    """
+    return [name.strip() for name in request.query_params.get('tags', '').split(',')
+            if name.strip()]
+
+
 class GetAllMeetups(APIView):
     """
     Class view for requesting all meetups
@@ -230,22 +304,24 @@ class GetAllMeetups(APIView):
 
     def get(self, request: Request) -> Response:
         """
-        A GET endpoint for getting all meetups in the database
+        A GET endpoint for getting all meetups in the database, optionally
+        the ones tagged with all of the given tags
         GET /api/meetups/
+        GET /api/meetups/?tags=python,django
         """
-        page_limit = request.GET.get('page_limit')
-        if not page_limit or not page_limit.isdigit():
-            page_limit = 10
-        meetups = Meetup.objects.all()
+        meetups = Meetup.objects.with_details()
+        tags = tag_names(request)
+        if tags:
+            meetups = meetups.tagged(tags)
         response = None
-        if not meetups:
+        if not meetups.exists():
             response = Response({
                 "error": "There are no meetups",
                 "status": status.HTTP_404_NOT_FOUND
             }, status=status.HTTP_404_NOT_FOUND)
         else:
-            paginator = PageNumberPagination()
-            paginator.page_size = page_limit
+            paginator = get_paginator(
+                request, ordering=('scheduled_date', '-created_on'))
             result_page = paginator.paginate_queryset(meetups, request)
             serializer = FetchMeetupSerializer(result_page, many=True)
             response = paginator.get_paginated_response(serializer.data)
@@ -265,7 +341,7 @@ class GetSpecificMeetup(APIView):
         """
         response = {}
         try:
-            meetup = Meetup.objects.get(id=meetupid)
+            meetup = Meetup.objects.with_details().get(id=meetupid)
             serializer = FetchMeetupSerializer(meetup)
             response = {
                 "data": [serializer.data],
@@ -282,6 +358,29 @@ class GetSpecificMeetup(APIView):
         )
 
 
+def proximity(request: Request) -> Tuple[Optional[Tuple[float, float, float]], Optional[str]]:
+    """
+    Reads the point and radius in kilometres of a proximity search from the
+    lat, lon and radius query parameters, returns None without a point or
+    the error of invalid parameters
+    """
+    params = request.query_params
+    if 'lat' not in params and 'lon' not in params:
+        return None, None
+    try:
+        latitude = float(params.get('lat'))
+        longitude = float(params.get('lon'))
+        radius = float(params.get('radius', settings.DEFAULT_SEARCH_RADIUS))
+    except (TypeError, ValueError):
+        return None, 'lat, lon and radius must be numbers'
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None, 'lat must be between -90 and 90 and lon between -180 and 180'
+    if not 0 < radius <= settings.MAX_SEARCH_RADIUS:
+        return None, 'radius must be greater than 0 and at most {} kilometres'.format(
+            settings.MAX_SEARCH_RADIUS)
+    return (latitude, longitude, radius), None
+
+
 class GetUpcomingMeetups(APIView):
     """
     Class for handling the get of upcoming meetups
@@ -290,17 +389,37 @@ class GetUpcomingMeetups(APIView):
 
     def get(self, request: Request) -> Response:
         """
-        Gets upcoming meetups
+        Gets upcoming meetups, optionally the ones tagged with all of the
+        given tags or within radius kilometres of a point. Proximity
+        searches are not cached
         GET /api/meetups/upcoming/
+        GET /api/meetups/upcoming/?tags=python,django
+        GET /api/meetups/upcoming/?lat=-1.28&lon=36.82&radius=5
         """
-        page_limit = request.GET.get('page_limit')
-        if not page_limit or not page_limit.isdigit():
-            page_limit = 10
-        upcoming_meetups = Meetup.objects.filter(
-            scheduled_date__gte=timezone.now())
-        if upcoming_meetups:
-            paginator = PageNumberPagination()
-            paginator.page_size = page_limit
+        near, error = proximity(request)
+        if error:
+            return Response(data={
+                'error': error,
+                'status': status.HTTP_400_BAD_REQUEST
+            }, status=status.HTTP_400_BAD_REQUEST)
+        now = timezone.now()
+        version = feed_version()
+        if not near:
+            page = get_upcoming_page(request, now, version)
+            if page:
+                return Response(data=page['data'], status=page['status'])
+        upcoming_meetups = Meetup.objects.with_details().filter(
+            scheduled_date__gte=now)
+        tags = tag_names(request)
+        if tags:
+            upcoming_meetups = upcoming_meetups.tagged(tags)
+        if near:
+            latitude, longitude, radius = near
+            upcoming_meetups = upcoming_meetups.near(
+                latitude, longitude, radius * 1000)
+        if upcoming_meetups.exists():
+            paginator = get_paginator(
+                request, ordering=('scheduled_date', '-created_on'))
             result_page = paginator.paginate_queryset(
                 upcoming_meetups, request)
             serializer = FetchMeetupSerializer(result_page, many=True)
@@ -313,9 +432,37 @@ class GetUpcomingMeetups(APIView):
                 },
                 status=status.HTTP_404_NOT_FOUND
             )
+        if not near:
+            set_upcoming_page(request, now, response, version)
         return response
 
 
+class GetTagFacets(APIView):
+    """
+    Class for handling the get of meetup counts per tag
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request: Request) -> Response:
+        """
+        Gets the number of meetups tagged with every tag, most used tags
+        first. The counts are stored on the tags and kept up to date as
+        meetups are tagged, untagged and deleted
+        GET /api/meetups/tags/
+        """
+        tags = Tag.objects.filter(
+            meetup_count__gt=0).order_by('-meetup_count', 'tag_name')
+        if not tags.exists():
+            return Response({
+                'error': 'There are no tagged meetups',
+                'status': status.HTTP_404_NOT_FOUND
+            }, status=status.HTTP_404_NOT_FOUND)
+        paginator = get_paginator(request, ordering=('-meetup_count', 'tag_name'))
+        result_page = paginator.paginate_queryset(tags, request)
+        serializer = TagFacetSerializer(result_page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
 class RspvPostView(APIView):
     """
     User can post an Rsvp
@@ -332,16 +479,10 @@ class RspvPostView(APIView):
             serializer = RsvpSerializer(data=request.data)
 
             if serializer.is_valid():
-                Rsvp.objects.update_or_create(
-
-                    meetup=get_object_or_404(queryset, id=id),
-                    responder=request.data.get('responder'),
-                    defaults={
-                        'response': request.data.get('response'),
-                        'meetup': get_object_or_404(queryset, id=id),
-                        'responder': request.data.get('responder')
-                    }
-                )
+                meetup = get_object_or_404(queryset, id=id)
+                meetup.respond(request.data.get('responder'),
+                               serializer.validated_data['response'])
+                publish(meetup.id, 'rsvp_summary', meetup.rsvp_summary)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except (ValidationError, DataError) as e:
@@ -359,29 +500,226 @@ class GetRsvps(APIView):
     def get(self, request: Request, meetup_id: str) -> Response:
         """
         GET /api/meeetups/{meetupID}/rsvps/
-        Gets rsvps statistics on a meetup
+        Gets rsvps statistics on a meetup and a page of its rsvps,
+        the organizer of the meetup can stream all of its rsvps
+        GET /api/meeetups/{meetupID}/rsvps/?stream=true
         """
-        response = None
         try:
             meetup = Meetup.objects.get(id=meetup_id)
-            if not meetup.rsvps:
-                response = Response(
-                    data={
-                        'error': 'There are no rsvps for the meetup'
-                    }, status=status.HTTP_404_NOT_FOUND
-                )
-            else:
-                response = Response(
-                    data={
-                        'summary': meetup.rsvp_summary,
-                        'data': meetup.rsvps
-                    },
-                    status=status.HTTP_200_OK
-                )
-        except:
-            response = Response(
+        except (ObjectDoesNotExist, ValidationError):
+            return Response(
                 data={
                     'error': 'The meetup id is invalid'
                 }, status=status.HTTP_400_BAD_REQUEST
             )
+        rsvps = Rsvp.objects.filter(meetup=meetup).select_related('responder')
+        if request.query_params.get('stream') == 'true':
+            user = request.user
+            if not (user.is_staff or user.id == meetup.creator_id):
+                return Response(
+                    data={
+                        'error': 'Only the organizer of the meetup can stream its rsvps'
+                    }, status=status.HTTP_403_FORBIDDEN
+                )
+            return StreamingHttpResponse(
+                stream_rsvps(rsvps), content_type='application/x-ndjson')
+        paginator = get_paginator(request, ordering=('responder_id',))
+        result_page = paginator.paginate_queryset(
+            rsvps.order_by('responder_id'), request)
+        if not result_page:
+            return Response(
+                data={
+                    'error': 'There are no rsvps for the meetup'
+                }, status=status.HTTP_404_NOT_FOUND
+            )
+        serializer = FetchRsvpSerializer(result_page, many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        response.data['summary'] = meetup.rsvp_summary
+        return response
+
+
+def stream_rsvps(rsvps, batch_size: int = 2000):
+    """
+    Yields the rsvps as one JSON document per line, the rsvps are read in
+    batches walked by responder on the (meetup, responder) unique key so
+    that only one batch is held in memory
+    """
+    last_responder = None
+    while True:
+        batch = rsvps.order_by('responder_id')
+        if last_responder:
+            batch = batch.filter(responder_id__gt=last_responder)
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        last_responder = batch[-1].responder_id
+        for rsvp in FetchRsvpSerializer(batch, many=True).data:
+            yield json.dumps(rsvp, cls=DjangoJSONEncoder) + '\n'
+
+
+class MeetupExportView(APIView):
+    """
+    Exports the rsvps, questions, answers or votes of a meetup
+    GET /api/meetups/{meetupId}/exports/{export}.{csv|ndjson}
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request: Request, meetup_id: str, export: str, extension: str) -> Response:
+        """
+        Streams an export of the meetup to its organizer
+        """
+        if export not in EXPORTS or extension not in FORMATS:
+            return Response({
+                'error': 'There is no {}.{} export'.format(export, extension)
+            }, status=status.HTTP_404_NOT_FOUND)
+        try:
+            meetup = Meetup.objects.filter(id=meetup_id).first()
+        except ValidationError:
+            meetup = None
+        if not meetup:
+            return Response({
+                'error': 'The meetup id is invalid'
+            }, status=status.HTTP_404_NOT_FOUND)
+        user = request.user
+        if not (user.is_staff or user.id == meetup.creator_id):
+            return Response({
+                'error': 'Only the organizer of the meetup can export it'
+            }, status=status.HTTP_403_FORBIDDEN)
+        response = StreamingHttpResponse(
+            export_lines(meetup, export, extension),
+            content_type=FORMATS[extension][0])
+        response['Content-Disposition'] = 'attachment; filename="{}-{}.{}"'.format(
+            meetup.id, export, extension)
+        return response
+
+
+class MeetupEventsView(APIView):
+    """
+    Streams the live events of a meetup as server-sent events
+    GET /api/meetups/{meetupId}/events
+    """
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def get(self, request: Request, meetup_id: str) -> Response:
+        """
+        Sends new questions, question and answer vote statistics and
+        rsvp summaries of the meetup as they are committed
+        """
+        try:
+            meetup = Meetup.objects.filter(id=meetup_id).first()
+        except ValidationError:
+            meetup = None
+        if not meetup:
+            return Response({
+                'error': 'The meetup id is invalid'
+            }, status=status.HTTP_404_NOT_FOUND)
+        response = StreamingHttpResponse(
+            stream_events(str(meetup.id)), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
         return response
+
+
+def stream_events(meetup_id: str):
+    """
+    Yields the events of a meetup, a comment is sent when no event
+    arrives within EVENT_STREAM_HEARTBEAT seconds to keep the
+    connection open through proxies
+    """
+    if not connection.in_atomic_block:
+        # idle streams do not hold a database connection
+        connection.close()
+    events = hub.subscribe(meetup_id)
+    try:
+        yield 'retry: {}\n\n'.format(settings.EVENT_STREAM_HEARTBEAT * 1000)
+        while True:
+            try:
+                event, data = events.get(timeout=settings.EVENT_STREAM_HEARTBEAT)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(event, data)
+    finally:
+        hub.unsubscribe(meetup_id, events)
+
+
+def calendar_response(request: Request, calendar: Dict, filename: str) -> HttpResponse:
+    """
+    Returns a rendered calendar feed, or a 304 response when the client
+    already holds it
+    """
+    response = not_modified(request, calendar['etag'], calendar['last_modified'])
+    if response is None:
+        response = HttpResponse(
+            calendar['body'], content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="{}"'.format(filename)
+    return set_validators(response, calendar['etag'], calendar['last_modified'])
+
+
+class MeetupCalendarView(APIView):
+    """
+    iCalendar feed of a meetup
+    GET /api/meetups/{meetupId}/calendar.ics
+    """
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [JSONRenderer, CalendarRenderer]
+
+    def get(self, request: Request, meetup_id: str) -> Response:
+        """
+        Gets the feed of a meetup from the cache or renders it
+        """
+        try:
+            meetup_id = uuid.UUID(meetup_id)
+        except ValueError:
+            calendar = None
+        else:
+            calendar = get_calendar(
+                meetup_feed(meetup_id), lambda: render_meetup_calendar(meetup_id))
+        if calendar is None:
+            return Response({
+                'error': 'A meetup with that id does not exist'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return calendar_response(request, calendar, '{}.ics'.format(meetup_id))
+
+
+class UserCalendarView(APIView):
+    """
+    iCalendar feed of the meetups a user responded yes to, the feed is
+    identified by the signed token of its subscription url
+    GET /api/meetups/calendars/{token}.ics
+    """
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [JSONRenderer, CalendarRenderer]
+
+    def get(self, request: Request, token: str) -> Response:
+        """
+        Gets the feed of a user from the cache or renders it
+        """
+        user_id = token_user_id(token)
+        if not user_id:
+            return Response({
+                'error': 'The calendar token is invalid'
+            }, status=status.HTTP_404_NOT_FOUND)
+        calendar = get_calendar(
+            user_feed(user_id), lambda: render_user_calendar(user_id))
+        return calendar_response(request, calendar, 'meetups.ics')
+
+
+class CalendarSubscriptionView(APIView):
+    """
+    Subscription url of the calendar feed of the current user
+    GET /api/meetups/calendar
+    """
+    permission_classes = [permissions.IsAuthenticated, TokenAllowedPermission]
+
+    def get(self, request: Request) -> Response:
+        """
+        Gets the url calendar clients subscribe to
+        """
+        url = request.build_absolute_uri(
+            reverse('user_calendar', args=[calendar_token(request.user.id)]))
+        return Response({
+            'data': {'url': url},
+            'status': status.HTTP_200_OK
+        }, status=status.HTTP_200_OK)
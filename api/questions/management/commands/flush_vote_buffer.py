@@ -0,0 +1,52 @@
+"""
+Command for writing buffered votes to the database
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from questions.vote_buffer import RedisVoteBuffer, flush_votes, get_vote_buffer
+
+
+class Command(BaseCommand):
+    """
+    Flushes the votes buffered in redis to the QuestionVote
+    and AnswerVote tables in batches
+    """
+    help = 'Writes the votes buffered in redis to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep flushing every interval seconds instead of flushing once'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.VOTE_BUFFER_BATCH_SIZE,
+            help='Number of votes written by one upsert'
+        )
+
+    def handle(self, *args, **options):
+        buffer = get_vote_buffer()
+        if not isinstance(buffer, RedisVoteBuffer):
+            raise CommandError(
+                'Votes are only flushed by this command when DJANGO_VOTE_BUFFER is redis')
+        while True:
+            flushed = 0
+            while True:
+                batch = flush_votes(buffer, options['batch_size'])
+                if not batch:
+                    break
+                flushed += batch
+            close_old_connections()
+            if flushed:
+                self.stdout.write(self.style.SUCCESS(
+                    'Flushed {} buffered votes'.format(flushed)))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
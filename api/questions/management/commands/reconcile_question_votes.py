@@ -0,0 +1,32 @@
+"""
+Command for recomputing the stored question vote counters
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from questions.models import Question
+
+
+class Command(BaseCommand):
+    """
+    Recomputes upvotes, downvotes and vote_score of questions
+    from the QuestionVote table
+    """
+    help = 'Recomputes the stored vote counters of questions from their votes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meetup',
+            action='append',
+            dest='meetups',
+            help='Only reconcile questions of the given meetup id'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Question.objects.all()
+        if options.get('meetups'):
+            queryset = queryset.filter(meetup_id__in=options['meetups'])
+        with transaction.atomic():
+            updated = Question.reconcile_votes(queryset)
+        self.stdout.write(self.style.SUCCESS(
+            'Reconciled vote counters of {} questions'.format(updated)))
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_vote_counters(apps, schema_editor):
+    """
+    Fills the vote counters of existing questions from the votes table
+    """
+    Question = apps.get_model('questions', 'Question')
+    QuestionVote = apps.get_model('questions', 'QuestionVote')
+    votes = QuestionVote.objects.filter(
+        question=OuterRef('pk')).order_by().values('question')
+    upvotes = Coalesce(Subquery(votes.filter(vote__gte=1).annotate(
+        count=Count('id')).values('count')), Value(0))
+    downvotes = Coalesce(Subquery(votes.filter(vote__lt=1).annotate(
+        count=Count('id')).values('count')), Value(0))
+    Question.objects.update(
+        upvotes=upvotes,
+        downvotes=downvotes,
+        vote_score=upvotes - downvotes
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0006_merge_20190321_0928'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='downvotes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='upvotes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='vote_score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_vote_counters,
+                             migrations.RunPython.noop),
+    ]
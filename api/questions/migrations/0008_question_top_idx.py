@@ -0,0 +1,17 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0007_question_vote_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['meetup', '-vote_score', 'created_at'], name='question_top_idx'),
+        ),
+    ]
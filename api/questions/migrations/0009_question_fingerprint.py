@@ -0,0 +1,35 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+from utils.fingerprint import fill_fingerprints
+
+
+def fill_question_fingerprints(apps, schema_editor):
+    """
+    Fingerprints the titles and bodies of existing questions
+    """
+    Question = apps.get_model('questions', 'Question')
+    fill_fingerprints(Question.objects.all(), 'fingerprint', ('title', 'body'), ('meetup_id',))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('meetups', '0003_meetup_body_fingerprint'),
+        ('questions', '0008_question_top_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='fingerprint',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_question_fingerprints, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='question',
+            unique_together={('meetup', 'fingerprint')},
+        ),
+    ]
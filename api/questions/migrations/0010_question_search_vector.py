@@ -0,0 +1,47 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def fill_question_search_vectors(apps, schema_editor):
+    """
+    Computes the search vectors of existing questions in batches
+    """
+    Question = apps.get_model('questions', 'Question')
+    vector = (
+        SearchVector('title', weight='A', config='english') +
+        SearchVector('body', weight='B', config='english')
+    )
+    batch = []
+    ids = Question.objects.order_by('pk').values_list('pk', flat=True)
+    for pk in ids.iterator(chunk_size=2000):
+        batch.append(pk)
+        if len(batch) == 2000:
+            Question.objects.filter(pk__in=batch).update(search_vector=vector)
+            batch = []
+    if batch:
+        Question.objects.filter(pk__in=batch).update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('questions', '0009_question_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_question_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='question',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='question_search_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:38
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0010_question_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='question',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='question_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.10 on 2026-10-18 10:41
+
+from django.conf import settings
+from django.db import migrations
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """
+    Keeps the latest vote of a user on a question and recomputes the
+    vote counters of the questions that had duplicate votes
+    """
+    QuestionVote = apps.get_model('questions', 'QuestionVote')
+    Question = apps.get_model('questions', 'Question')
+    votes = QuestionVote._meta.db_table
+    questions = Question._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            DELETE FROM {votes} a USING {votes} b
+            WHERE a.question_id = b.question_id AND a.user_id = b.user_id
+            AND (a.updated_on, a.id) < (b.updated_on, b.id)
+            RETURNING a.question_id
+        """.format(votes=votes))
+        question_ids = list({row[0] for row in cursor.fetchall()})
+        if question_ids:
+            cursor.execute("""
+                UPDATE {questions} q SET
+                upvotes = counts.upvotes,
+                downvotes = counts.downvotes,
+                vote_score = counts.upvotes - counts.downvotes
+                FROM (
+                    SELECT question_id,
+                    COUNT(*) FILTER (WHERE vote >= 1) AS upvotes,
+                    COUNT(*) FILTER (WHERE vote < 1) AS downvotes
+                    FROM {votes} WHERE question_id = ANY(%s::uuid[])
+                    GROUP BY question_id
+                ) counts
+                WHERE q.id = counts.question_id
+            """.format(questions=questions, votes=votes), [question_ids])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('questions', '0011_question_title_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='questionvote',
+            unique_together={('question', 'user')},
+        ),
+    ]
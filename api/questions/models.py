@@ -1,17 +1,95 @@
 import uuid
 
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+    TrigramSimilarity
+)
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
 
 from users.models import User
 from meetups.models import Meetup
-from typing import Dict
+from utils.fingerprint import content_fingerprint
+from typing import Dict, NamedTuple, Optional, Tuple
+from uuid import UUID
 # Create your models here.
 
 
+class QuestionQuerySet(models.QuerySet):
+    """
+    Queryset for questions
+    """
+
+    def with_votes(self) -> 'QuestionQuerySet':
+        """
+        Joins the question author for serializing pages of questions,
+        vote statistics are read from the stored vote counters
+        """
+        return self.select_related('created_by')
+
+    def update_search_vector(self) -> int:
+        """
+        Recomputes the stored full text search vector of the questions
+        """
+        return self.update(search_vector=Question.SEARCH_VECTOR)
+
+    def search(self, text: str) -> 'QuestionQuerySet':
+        """
+        Filters questions matching the search text through the GIN index
+        on search_vector and ranks them from the best match
+        """
+        query = SearchQuery(text, config=Question.SEARCH_CONFIG)
+        # ts_rank returns real, a double precision rank round-trips exactly
+        # through the cursors of paginated searches
+        return self.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        ).order_by('-rank', 'created_at')
+
+    def similar_to(self, title: str) -> 'QuestionQuerySet':
+        """
+        Returns the questions whose titles are close to title, the trigram
+        match is served by question_title_trgm_idx and the result is capped
+        at SIMILAR_QUESTIONS_LIMIT best matches
+        """
+        connection = connections[self.db]
+        with connection.cursor() as cursor:
+            # the % operator filters by pg_trgm.similarity_threshold, it is
+            # set for the transaction, or the session outside one, so that
+            # thresholds below its 0.3 default apply
+            cursor.execute(
+                "SELECT set_config('pg_trgm.similarity_threshold', %s, %s)",
+                [str(settings.SIMILAR_QUESTIONS_THRESHOLD), connection.in_atomic_block])
+        return self.filter(title__trigram_similar=title).annotate(
+            similarity=TrigramSimilarity('title', title)
+        ).filter(
+            similarity__gte=settings.SIMILAR_QUESTIONS_THRESHOLD
+        ).order_by('-similarity')[:settings.SIMILAR_QUESTIONS_LIMIT]
+
+    def top(self) -> 'QuestionQuerySet':
+        """
+        Orders questions from the highest vote score, served by the
+        question_top_idx index on the stored vote counters
+        """
+        return self.order_by(*Question.TOP_ORDERING)
+
+
 class Question(models.Model):
     """
     Database Model for questions
     """
+    TOP_ORDERING = ('-vote_score', 'created_at')
+    SEARCH_CONFIG = 'english'
+    SEARCH_VECTOR = (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('body', weight='B', config=SEARCH_CONFIG)
+    )
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
     body = models.TextField()
@@ -20,32 +98,201 @@ class Question(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    upvotes = models.IntegerField(default=0)
+    downvotes = models.IntegerField(default=0)
+    vote_score = models.IntegerField(default=0)
+    fingerprint = models.CharField(
+        max_length=64, null=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = QuestionQuerySet.as_manager()
 
     class Meta:
         # db_table = 'Questions'
         ordering = ['created_at', ]
+        unique_together = ('meetup', 'fingerprint')
+        indexes = [
+            models.Index(fields=['meetup', '-vote_score', 'created_at'],
+                         name='question_top_idx'),
+            GinIndex(fields=['search_vector'], name='question_search_idx'),
+            GinIndex(fields=['title'], name='question_title_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+        ]
 
     @property
     def votes(self) -> Dict:
         """
         Gets votes statistics specific to a question
         """
-        upvotes = QuestionVote.objects.filter(
-            question=self.id, vote__gte=1).count()
-        downvotes = QuestionVote.objects.filter(
-            question=self.id, vote__lt=1).count()
-        votes = upvotes-downvotes
         resultset = {
-            'upvotes': upvotes,
-            'downvotes': downvotes,
-            'vote_score': votes
+            'upvotes': self.upvotes,
+            'downvotes': self.downvotes,
+            'vote_score': self.vote_score
         }
         return resultset
 
+    def save(self, *args, **kwargs):
+        self.fingerprint = content_fingerprint(self.title, self.body)
+        super().save(*args, **kwargs)
+        Question.objects.filter(id=self.id).update_search_vector()
+
+    @classmethod
+    def reconcile_votes(cls, queryset=None) -> int:
+        """
+        Recomputes the stored vote counters from the votes table
+        and returns the number of questions updated
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        votes = QuestionVote.objects.filter(
+            question=OuterRef('pk')).order_by().values('question')
+        upvotes = Coalesce(Subquery(votes.filter(vote__gte=1).annotate(
+            count=Count('id')).values('count')), Value(0))
+        downvotes = Coalesce(Subquery(votes.filter(vote__lt=1).annotate(
+            count=Count('id')).values('count')), Value(0))
+        return queryset.update(
+            upvotes=upvotes,
+            downvotes=downvotes,
+            vote_score=upvotes - downvotes
+        )
+
     def __str__(self):
         return self.title
 
 
+VoteChange = NamedTuple('VoteChange', [
+    ('previous_vote', Optional[int]),
+    ('upvotes', int),
+    ('downvotes', int),
+    ('vote_score', int),
+])
+
+
+class QuestionVoteQuerySet(models.QuerySet):
+    """
+    Queryset for question votes
+    """
+
+    def upsert_votes(self, user: User, votes: Dict[UUID, int]) -> Dict[UUID, 'VoteChange']:
+        """
+        Writes the votes of user on many questions, returns the previous
+        vote and the new counters of every question whose vote changed
+        """
+        changes = self.upsert_voter_votes({
+            (question_id, user.id): vote for question_id, vote in votes.items()
+        })
+        return {question_id: change
+                for (question_id, user_id), change in changes.items()}
+
+    def upsert_voter_votes(self, votes: Dict[Tuple[UUID, UUID], int]) -> Dict[Tuple[UUID, UUID], 'VoteChange']:
+        """
+        Writes votes keyed by (question id, user id) and moves the stored
+        vote counters of the questions. First time votes are inserted by an
+        INSERT ... ON CONFLICT DO NOTHING statement that waits for concurrent
+        inserts of the same keys, the other votes are then updated from the
+        vote rows locked by SELECT ... FOR UPDATE so that counters move by
+        the vote actually overwritten. Returns the previous vote, None for a
+        first time vote, and the new counters of the question for every key
+        whose vote changed, keys already holding the same vote are left out
+        """
+        if not votes:
+            return {}
+        vote_table = QuestionVote._meta.db_table
+        # sorted keys and question locks taken in id order before any vote
+        # row keep concurrent requests voting on the same questions from
+        # locking them in opposite orders
+        votes = sorted(votes.items(), key=lambda item: (str(item[0][0]), str(item[0][1])))
+        with transaction.atomic(using=self.db, savepoint=False), connections[self.db].cursor() as cursor:
+            rows = ', '.join(
+                ['(%s::uuid, %s::uuid, %s::uuid, %s::integer)'] * len(votes))
+            params = []
+            for (question_id, user_id), vote in votes:
+                params.extend([uuid.uuid4(), question_id, user_id, vote])
+            cursor.execute(self.vote_changes_sql("""
+                WITH input (id, question_id, user_id, vote) AS (VALUES {rows}),
+                locked AS (
+                    SELECT id FROM {questions}
+                    WHERE id IN (SELECT question_id FROM input)
+                    ORDER BY id FOR NO KEY UPDATE
+                ),
+                changes AS (
+                    INSERT INTO {votes} (id, vote, question_id, user_id, created_on, updated_on)
+                    SELECT id, vote, question_id, user_id, now(), now() FROM input
+                    WHERE (SELECT count(*) FROM locked) >= 0
+                    ON CONFLICT (question_id, user_id) DO NOTHING
+                    RETURNING question_id, user_id, vote, NULL::integer AS previous_vote
+                ),
+            """.format(rows=rows, votes=vote_table, questions=Question._meta.db_table)), params)
+            changes = {(question_id, user_id): VoteChange(*change)
+                       for question_id, user_id, *change in cursor.fetchall()}
+            inserted = {(str(question_id), str(user_id))
+                        for question_id, user_id in changes}
+            updates = [(question_id, user_id, vote)
+                       for (question_id, user_id), vote in votes
+                       if (str(question_id), str(user_id)) not in inserted]
+            if not updates:
+                return changes
+            rows = ', '.join(
+                ['(%s::uuid, %s::uuid, %s::integer)'] * len(updates))
+            cursor.execute(self.vote_changes_sql("""
+                WITH input (question_id, user_id, vote) AS (VALUES {rows}),
+                previous AS (
+                    SELECT v.id, v.vote FROM {votes} v
+                    JOIN input ON input.question_id = v.question_id
+                    AND input.user_id = v.user_id
+                    WHERE v.vote <> input.vote
+                    ORDER BY v.question_id, v.user_id FOR UPDATE OF v
+                ),
+                changes AS (
+                    UPDATE {votes} v SET vote = input.vote, updated_on = now()
+                    FROM previous, input
+                    WHERE v.id = previous.id AND input.question_id = v.question_id
+                    AND input.user_id = v.user_id AND previous.vote <> input.vote
+                    RETURNING v.question_id, v.user_id, v.vote,
+                    previous.vote AS previous_vote
+                ),
+            """.format(rows=rows, votes=vote_table)),
+                [value for update in updates for value in update])
+            updated = {(question_id, user_id): VoteChange(*change)
+                       for question_id, user_id, *change in cursor.fetchall()}
+            counters = {question_id: change for (question_id, user_id), change in updated.items()}
+            for key, change in changes.items():
+                if key[0] in counters:
+                    changes[key] = counters[key[0]]._replace(
+                        previous_vote=change.previous_vote)
+            changes.update(updated)
+            return changes
+
+    def vote_changes_sql(self, changes: str) -> str:
+        """
+        Completes a statement whose changes CTE returns the question id,
+        user id, vote and previous vote of written votes with the update of
+        the vote counters of the questions by the changes
+        """
+        return changes + """
+            counters AS (
+                UPDATE {questions} q SET
+                upvotes = q.upvotes + deltas.upvotes,
+                downvotes = q.downvotes + deltas.downvotes,
+                vote_score = q.vote_score + deltas.vote_score
+                FROM (
+                    SELECT question_id,
+                    SUM((vote >= 1)::integer
+                        - COALESCE((previous_vote >= 1)::integer, 0)) AS upvotes,
+                    SUM((vote < 1)::integer
+                        - COALESCE((previous_vote < 1)::integer, 0)) AS downvotes,
+                    SUM(vote - COALESCE(previous_vote, 0)) AS vote_score
+                    FROM changes GROUP BY question_id
+                ) deltas
+                WHERE q.id = deltas.question_id
+                RETURNING q.id, q.upvotes, q.downvotes, q.vote_score
+            )
+            SELECT changes.question_id, changes.user_id, changes.previous_vote,
+            counters.upvotes, counters.downvotes, counters.vote_score
+            FROM changes JOIN counters ON counters.id = changes.question_id
+        """.format(questions=Question._meta.db_table)
+
+
 class QuestionVote(models.Model):
     """
     Model for voting questions
@@ -61,8 +308,10 @@ class QuestionVote(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
 
+    objects = QuestionVoteQuerySet.as_manager()
+
     class Meta:
-        unique_together = ('vote', 'question', 'user')
+        unique_together = ('question', 'user')
 
     def __str__(self):
         return str(self.vote)
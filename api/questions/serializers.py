@@ -34,7 +34,20 @@ class ViewQuestionsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Question
-        fields = '__all__'
+        exclude = ('upvotes', 'downvotes', 'vote_score',
+                   'fingerprint', 'search_vector')
+
+
+class SimilarQuestionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for questions suggested as duplicates of a posted question
+    """
+    votes = serializers.ReadOnlyField()
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Question
+        fields = ('id', 'title', 'votes', 'similarity')
 
 
 class UpdateQuestionSerializer(serializers.ModelSerializer):
@@ -43,4 +56,5 @@ class UpdateQuestionSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Question
-        fields = '__all__'
+        exclude = ('upvotes', 'downvotes', 'vote_score',
+                   'fingerprint', 'search_vector')
@@ -1,7 +1,15 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.reverse import reverse
 
 from .basetests import BaseTest
 from questions.models import Question
+from meetups.models import Meetup
+from answers.models import Answer, AnswerVote
+from utils.fingerprint import fill_fingerprints
 import json
 
 class QuestionModelTest(BaseTest):
@@ -16,6 +24,37 @@ class QuestionModelTest(BaseTest):
         new_count = Question.objects.all().count()
         self.assertEqual(new_count, 1)
 
+    def test_fill_fingerprints(self):
+        """
+        Test that only the first of duplicate questions in a meetup keeps
+        its fingerprint when fingerprints are backfilled
+        """
+        other_meetup = Meetup.objects.create(
+            title='Behaviour Driven Development',
+            body='Developers need to discuss behaviour driven development',
+            location='Andela Campus',
+            creator=self.user,
+            scheduled_date=timezone.now() + timezone.timedelta(days=3)
+        )
+        for meetup in (self.meetup, self.meetup, other_meetup):
+            Question.objects.update(fingerprint=None)
+            Question.objects.create(
+                title="Is lunch provided",
+                body="Asking  for a friend",
+                meetup=meetup,
+                created_by=self.user2
+            )
+        Question.objects.update(fingerprint=None)
+        fill_fingerprints(Question.objects.all(), 'fingerprint',
+                          ('title', 'body'), ('meetup_id',), batch_size=2)
+        duplicates = Question.objects.filter(title="Is lunch provided")
+        first = duplicates.filter(meetup=self.meetup).order_by('pk').first()
+        self.assertEqual(
+            set(duplicates.exclude(fingerprint=None).values_list('id', flat=True)),
+            {first.id, duplicates.get(meetup=other_meetup).id})
+        self.assertFalse(Question.objects.filter(
+            fingerprint=None).exclude(title="Is lunch provided").exists())
+
 
 class PostQuestionTest(BaseTest):
     """
@@ -62,6 +101,80 @@ class PostQuestionTest(BaseTest):
         response = self.post_question()
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_duplicate_question_normalized(self):
+        """
+        Test that duplicates differing in case and spacing are rejected
+        """
+        self.is_authenticated()
+        url = reverse('question', args=[str(self.meetup.id)])
+        response = self.client.post(
+            url,
+            data=json.dumps({
+                "title": "why are  we TESTING models",
+                "body": self.question.body.upper()
+            }),
+            content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Question already exist")
+
+    def test_same_question_other_meetup(self):
+        """
+        Test that the same question can be asked on another meetup
+        """
+        self.is_authenticated()
+        other_meetup = Meetup.objects.create(
+            title='Behaviour Driven Development',
+            body='Writing specifications before the code',
+            location='Andela Campus',
+            creator=self.user,
+            scheduled_date=timezone.now() + timezone.timedelta(days=5)
+        )
+        url = reverse('question', args=[str(other_meetup.id)])
+        response = self.client.post(
+            url,
+            data=json.dumps({
+                "title": self.question.title,
+                "body": self.question.body
+            }),
+            content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_similar_questions_suggested(self):
+        """
+        Test that questions with a similar title on the meetup are suggested
+        """
+        self.is_authenticated()
+        Question.objects.create(
+            title="Where is the venue of the meetup",
+            body="I would like to know where the meetup is taking place",
+            meetup=self.meetup,
+            created_by=self.user
+        )
+        response = self.post_question()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        titles = [question["title"]
+                  for question in response.data["similar_questions"]]
+        self.assertEqual(titles, [self.question.title])
+
+    @override_settings(SIMILAR_QUESTIONS_THRESHOLD=0.2)
+    def test_low_similarity_threshold(self):
+        """
+        Test that thresholds below the pg_trgm default suggest questions
+        """
+        self.is_authenticated()
+        Question.objects.create(
+            title="Who is reviewing the test plan",
+            body="I would like to help with the reviews",
+            meetup=self.meetup,
+            created_by=self.user
+        )
+        response = self.post_question()
+        titles = [question["title"]
+                  for question in response.data["similar_questions"]]
+        self.assertEqual(titles, [self.question.title, "Who is reviewing the test plan"])
+
     def test_post_with_invalid_meetup(self):
         """
         Test posting question with a meetup that does not exist
@@ -100,6 +213,48 @@ class ViewQuestionTest(BaseTest):
         self.assertEqual(response.content,
                          b'{"error":"There are no questions"}')
 
+    def test_question_page_query_count(self):
+        """
+        Test that the number of queries for a page does not grow with its size
+        """
+        with CaptureQueriesContext(connection) as small_page:
+            self.get_questions_with_valid_meetup_id()
+        for index in range(5):
+            Question.objects.create(
+                title="Question number {}".format(index),
+                body="Checking the number of queries per page",
+                meetup=self.meetup,
+                created_by=self.user2
+            )
+        with CaptureQueriesContext(connection) as large_page:
+            response = self.get_questions_with_valid_meetup_id()
+        self.assertEqual(len(response.data.get('results')), 6)
+        self.assertEqual(len(large_page), len(small_page))
+
+    def test_top_questions(self):
+        """
+        Test that top ordering returns the highest scored questions first
+        without counting the votes table
+        """
+        for score in (3, -1, 7):
+            Question.objects.create(
+                title="Question with score {}".format(score),
+                body="Checking the top ordering",
+                meetup=self.meetup,
+                created_by=self.user2,
+                upvotes=max(score, 0),
+                downvotes=max(-score, 0),
+                vote_score=score
+            )
+        url = reverse('view_questions', args=[str(self.meetup.id)])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url + '?ordering=top')
+        scores = [question.get('votes').get('vote_score')
+                  for question in response.data.get('results')]
+        self.assertEqual(scores, [7, 3, 0, -1])
+        self.assertFalse([query for query in queries
+                          if 'questions_questionvote' in query['sql']])
+
 class ViewOneQuestionTest(BaseTest):
     """
     Tests for viewing one question for a specific meetup
@@ -125,4 +280,173 @@ class ViewOneQuestionTest(BaseTest):
         """
         response = self.get_one_question_with_invalid_questionId()
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
-        
\ No newline at end of file
+        
+
+class QuestionThreadTest(BaseTest):
+    """
+    Tests for fetching a question with its answers in one request
+    """
+
+    def get_thread(self, **headers):
+        """
+        Fetches the thread of the question
+        """
+        url = reverse('question_thread', args=[
+                      str(self.meetup.id), str(self.question.id)])
+        return self.client.get(url, **headers)
+
+    def test_question_thread(self):
+        """
+        Test fetching the question, its answers and their votes
+        """
+        answer = Answer.objects.create(
+            body="We test views to know if they respond",
+            creator=self.user,
+            question=self.question
+        )
+        AnswerVote.objects.create(creator=self.user, answer=answer, vote=1)
+        response = self.get_thread()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["question"]["title"], self.question.title)
+        answers = response.data["answers"]["results"]
+        self.assertEqual(len(answers), 1)
+        self.assertEqual(answers[0]["votes"]["upvotes"], 1)
+
+    def test_question_thread_query_count(self):
+        """
+        Test that the number of queries does not grow with the answers
+        """
+        Answer.objects.create(
+            body="The first answer", creator=self.user, question=self.question)
+        with CaptureQueriesContext(connection) as small_thread:
+            self.get_thread()
+        for index in range(5):
+            answer = Answer.objects.create(
+                body="Answer number {}".format(index),
+                creator=self.user,
+                question=self.question
+            )
+            AnswerVote.objects.create(creator=self.user, answer=answer, vote=1)
+        with CaptureQueriesContext(connection) as large_thread:
+            response = self.get_thread()
+        self.assertEqual(len(response.data["answers"]["results"]), 6)
+        self.assertEqual(len(large_thread), len(small_thread))
+
+    def test_question_thread_not_modified(self):
+        """
+        Test that an unchanged thread is answered with 304
+        """
+        response = self.get_thread()
+        etag = response["ETag"]
+        response = self.get_thread(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        answer = Answer.objects.create(
+            body="An answer that changes the thread",
+            creator=self.user,
+            question=self.question
+        )
+        response = self.get_thread(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        AnswerVote.objects.create(creator=self.user, answer=answer, vote=-1)
+        response = self.get_thread(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_question_thread_other_meetup(self):
+        """
+        Test fetching the thread of a question through another meetup
+        """
+        other_meetup = Meetup.objects.create(
+            title='Behaviour Driven Development',
+            body='Writing specifications before the code',
+            location='Andela Campus',
+            creator=self.user,
+            scheduled_date=timezone.now() + timezone.timedelta(days=5)
+        )
+        url = reverse('question_thread', args=[
+                      str(other_meetup.id), str(self.question.id)])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SearchQuestionsTest(BaseTest):
+    """
+    Tests for full text search over the questions of a meetup
+    """
+
+    def search_questions(self, text):
+        """
+        Searches the questions of the test meetup
+        """
+        url = reverse('search_questions', args=[str(self.meetup.id)])
+        return self.client.get(url, {'q': text})
+
+    def test_search_ranks_matches(self):
+        """
+        Test that title matches rank above body matches
+        """
+        Question.objects.create(
+            title="Where do we deploy",
+            body="Should the models be deployed with the views",
+            meetup=self.meetup,
+            created_by=self.user2
+        )
+        Question.objects.create(
+            title="Is lunch provided",
+            body="Asking for a friend",
+            meetup=self.meetup,
+            created_by=self.user2
+        )
+        response = self.search_questions('models')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [question.get('title')
+                  for question in response.data.get('results')]
+        self.assertEqual(titles, ["Why are we testing models",
+                                  "Where do we deploy"])
+
+    def test_search_follows_edits(self):
+        """
+        Test that the search vector is updated when a question changes
+        """
+        self.question.title = "Why are we testing serializers"
+        self.question.body = "Serializers need tests too"
+        self.question.save()
+        response = self.search_questions('models')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.search_questions('serializer')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search_without_query(self):
+        """
+        Test searching without a search query
+        """
+        response = self.search_questions('')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_cursor_pages(self):
+        """
+        Test that cursor pages over tied and untied ranks neither skip
+        nor repeat questions
+        """
+        for number in range(1, 8):
+            for copy in range(2):
+                Question.objects.create(
+                    title="Question {} on {}".format(number, copy),
+                    body=" ".join(["models"] * number + ["views"] * (copy + 1) * 3),
+                    meetup=self.meetup,
+                    created_by=self.user2
+                )
+        expected = set(Question.objects.filter(
+            meetup=self.meetup).search('models').values_list('id', flat=True))
+        url = reverse('search_questions', args=[str(self.meetup.id)])
+        response = self.client.get(
+            url, {'q': 'models', 'pagination': 'cursor', 'page_limit': 3})
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(question.get('id') for question in response.data.get('results'))
+            if not response.data.get('next'):
+                break
+            response = self.client.get(response.data.get('next'))
+        self.assertEqual(len(ids), len(expected))
+        self.assertEqual({str(question_id) for question_id in expected}, set(ids))
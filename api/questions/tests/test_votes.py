@@ -1,9 +1,24 @@
 """
 Tests for votes
 """
+import threading
+import time
+from io import StringIO
+from typing import Dict
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from meetups.tests.initial_setup import TestSetUp
 from questions.models import QuestionVote, Question
 from meetups.models import Meetup
+from answers.models import Answer, AnswerVote
+from questions.vote_buffer import QUESTION, buffer_vote, flush_votes, get_vote_buffer
+from redis.exceptions import ConnectionError
+from users.models import User
 import django
 from rest_framework.response import Response
 from rest_framework import status
@@ -176,6 +191,29 @@ class TestVoteModel(BaseTest):
                 'Error occured during creation of vote', message)
 
 
+    def test_upsert_statements(self) -> None:
+        """
+        Tests that a first vote is written by one statement and a changed
+        vote by two, without savepoints
+        """
+        self.clear_votes()
+        key = (self.question_id, self.user.id)
+        with self.assertNumQueries(1):
+            QuestionVote.objects.upsert_voter_votes({key: 1})
+        with self.assertNumQueries(2):
+            change = QuestionVote.objects.upsert_voter_votes({key: -1})[key]
+        self.assertEqual(change.previous_vote, 1)
+        answer = Answer.objects.create(
+            body='It is a meetup about testing',
+            creator=self.admin,
+            question=self.question
+        )
+        key = (answer.id, self.user.id)
+        with self.assertNumQueries(1):
+            AnswerVote.objects.upsert_voter_votes({key: 1})
+        with self.assertNumQueries(2):
+            self.assertEqual(AnswerVote.objects.upsert_voter_votes({key: -1}), {key: 1})
+
 class TestVote(BaseTest):
     def setUp(self):
         super().setUp()
@@ -338,3 +376,433 @@ class TestVote(BaseTest):
         self.downvote()
         vote_count = QuestionVote.objects.all().count()
         self.assertEqual(vote_count, 1)
+
+    def test_vote_counters(self) -> None:
+        """
+        Tests that stored vote counters follow a change of vote
+        """
+        self.clear_votes()
+        self.upvote()
+        response = self.downvote()
+        vote = response.data.get('data')[0]
+        self.assertEqual(vote.get('upvotes'), 0)
+        self.assertEqual(vote.get('downvotes'), 1)
+        self.assertEqual(vote.get('vote_score'), -1)
+        question = Question.objects.get(id=self.question_id)
+        self.assertEqual(question.votes, {
+            'upvotes': 0,
+            'downvotes': 1,
+            'vote_score': -1
+        })
+
+    def test_vote_single_write(self) -> None:
+        """
+        Tests that a vote reads and writes the votes table in one statement
+        """
+        self.clear_votes()
+        self.force_authenticate_user()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upvote_question()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        vote_queries = [query for query in queries.captured_queries
+                        if QuestionVote._meta.db_table in query['sql']]
+        self.assertEqual(len(vote_queries), 1)
+
+
+class TestReconcileVotes(BaseTest):
+    """
+    Tests the reconcile_question_votes command
+    """
+
+    def test_reconcile_votes(self) -> None:
+        """
+        Tests that counters are recomputed from the votes table
+        """
+        QuestionVote.objects.create(
+            vote=-1,
+            question=self.question,
+            user=self.admin
+        )
+        call_command('reconcile_question_votes', stdout=StringIO())
+        question = Question.objects.get(id=self.question_id)
+        self.assertEqual(question.upvotes, 1)
+        self.assertEqual(question.downvotes, 1)
+        self.assertEqual(question.vote_score, 0)
+
+    def test_reconcile_other_meetup(self) -> None:
+        """
+        Tests that questions of other meetups are left untouched
+        """
+        other_meetup = Meetup.objects.exclude(id=self.meetup_id)[0]
+        call_command('reconcile_question_votes',
+                     meetup=[str(other_meetup.id)], stdout=StringIO())
+        question = Question.objects.get(id=self.question_id)
+        self.assertEqual(question.upvotes, 0)
+
+
+class TestBulkVote(BaseTest):
+    """
+    Tests submitting many votes in one request
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.clear_votes()
+        self.answer = Answer.objects.create(
+            body='It is a meetup about testing',
+            creator=self.admin,
+            question=self.question
+        )
+        self.bulk_vote_url = '/api/meetups/{}/votes'.format(self.meetup_id)
+
+    def bulk_vote(self, questions=None, answers=None) -> Response:
+        """
+        Authenticates a user and submits votes in bulk
+        """
+        self.force_authenticate_user()
+        return self.client.post(
+            path=self.bulk_vote_url,
+            data={
+                'questions': questions or [],
+                'answers': answers or []
+            },
+            format='json'
+        )
+
+    def test_bulk_votes(self) -> None:
+        """
+        Tests that question and answer votes are written with their scores
+        """
+        response = self.bulk_vote(
+            questions=[{'id': str(self.question_id), 'vote': 'upvote'}],
+            answers=[{'id': str(self.answer.id), 'vote': 'downvote'}]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        question_vote = response.data['data']['questions'][0]
+        self.assertEqual(question_vote.get('message'),
+                         'Vote submitted sucessfully')
+        self.assertEqual(question_vote.get('vote_score'), 1)
+        answer_vote = response.data['data']['answers'][0]
+        self.assertEqual(answer_vote.get('downvotes'), 1)
+        self.assertEqual(answer_vote.get('vote_score'), -1)
+        self.assertEqual(Question.objects.get(
+            id=self.question_id).upvotes, 1)
+        self.assertEqual(AnswerVote.objects.get(
+            answer=self.answer).vote, -1)
+
+    def test_bulk_vote_changes(self) -> None:
+        """
+        Tests changing a vote and repeating a vote in bulk
+        """
+        self.upvote()
+        response = self.bulk_vote(
+            questions=[{'id': str(self.question_id), 'vote': 'downvote'}])
+        question_vote = response.data['data']['questions'][0]
+        self.assertEqual(question_vote.get('message'),
+                         'You have successfully updated your vote')
+        self.assertEqual(question_vote.get('upvotes'), 0)
+        self.assertEqual(question_vote.get('downvotes'), 1)
+        response = self.bulk_vote(
+            questions=[{'id': str(self.question_id), 'vote': 'downvote'}])
+        question_vote = response.data['data']['questions'][0]
+        self.assertEqual(question_vote.get('error'),
+                         'You cannot downvote a question more than once')
+        self.assertEqual(question_vote.get('vote_score'), -1)
+        self.assertEqual(QuestionVote.objects.count(), 1)
+
+    def test_bulk_vote_invalid_items(self) -> None:
+        """
+        Tests that votes outside the meetup are reported and not written
+        """
+        other_meetup = Meetup.objects.exclude(id=self.meetup_id)[0]
+        other_question = Question.objects.create(
+            title='Is this another meetup',
+            body='I was wondering about the other meetup',
+            meetup=other_meetup,
+            created_by=self.user
+        )
+        response = self.bulk_vote(questions=[
+            {'id': str(other_question.id), 'vote': 'upvote'},
+            {'id': self.fake_id, 'vote': 'upvote'},
+            {'id': 'not-an-id', 'vote': 'upvote'},
+            {'id': str(self.question_id), 'vote': 'sideways'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        errors = [vote.get('error')
+                  for vote in response.data['data']['questions']]
+        self.assertEqual(errors, [
+            'The meetup does not have a question with that id',
+            'The meetup does not have a question with that id',
+            'The question id is not valid',
+            'A vote must be an upvote or a downvote'
+        ])
+        self.assertEqual(QuestionVote.objects.count(), 0)
+
+    @override_settings(MAX_BULK_VOTES=1)
+    def test_bulk_vote_limit(self) -> None:
+        """
+        Tests that a request with too many votes is rejected
+        """
+        response = self.bulk_vote(
+            questions=[{'id': str(self.question_id), 'vote': 'upvote'}],
+            answers=[{'id': str(self.answer.id), 'vote': 'upvote'}]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_vote_query_count(self) -> None:
+        """
+        Tests that the number of queries does not grow with the votes
+        """
+        questions = [Question.objects.create(
+            title='Question number {}'.format(index),
+            body='Body of question number {}'.format(index),
+            meetup=self.meetup,
+            created_by=self.user
+        ) for index in range(5)]
+        self.force_authenticate_user()
+        with CaptureQueriesContext(connection) as single_vote:
+            self.bulk_vote(
+                questions=[{'id': str(self.question_id), 'vote': 'upvote'}])
+        with CaptureQueriesContext(connection) as many_votes:
+            response = self.bulk_vote(questions=[
+                {'id': str(question.id), 'vote': 'upvote'}
+                for question in questions
+            ])
+        self.assertEqual(len(response.data['data']['questions']), 5)
+        self.assertEqual(len(many_votes), len(single_vote))
+
+
+@override_settings(VOTE_BUFFER='memory', VOTE_BUFFER_FLUSH_INTERVAL=0)
+class TestVoteBuffer(BaseTest):
+    """
+    Tests accepting votes into the write-behind vote buffer
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.clear_votes()
+        self.buffer = get_vote_buffer()
+
+    def tearDown(self):
+        self.buffer.drain(settings.VOTE_BUFFER_BATCH_SIZE)
+        self.buffer.acknowledge()
+        super().tearDown()
+
+    def test_buffered_vote(self) -> None:
+        """
+        Tests that a buffered vote is counted before and after a flush
+        """
+        response = self.upvote()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['data'][0].get('upvotes'), 1)
+        self.assertEqual(QuestionVote.objects.count(), 0)
+        self.assertEqual(flush_votes(self.buffer), 1)
+        question = Question.objects.get(id=self.question_id)
+        self.assertEqual(question.upvotes, 1)
+        self.assertEqual(QuestionVote.objects.get().vote, 1)
+
+    def test_buffered_duplicate_vote(self) -> None:
+        """
+        Tests that a vote repeating a buffered vote is rejected
+        """
+        self.upvote()
+        response = self.upvote()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data.get('error'),
+                         'You cannot upvote a question more than once')
+
+    def test_buffered_vote_change(self) -> None:
+        """
+        Tests that a buffered vote replaces a stored vote
+        """
+        self.upvote()
+        flush_votes(self.buffer)
+        response = self.downvote()
+        vote = response.data['data'][0]
+        self.assertEqual(vote.get('upvotes'), 0)
+        self.assertEqual(vote.get('downvotes'), 1)
+        flush_votes(self.buffer)
+        question = Question.objects.get(id=self.question_id)
+        self.assertEqual(question.votes, {
+            'upvotes': 0,
+            'downvotes': 1,
+            'vote_score': -1
+        })
+
+    def test_buffered_answer_vote(self) -> None:
+        """
+        Tests that answer votes are buffered and flushed
+        """
+        answer = Answer.objects.create(
+            body='It is a meetup about testing',
+            creator=self.admin,
+            question=self.question
+        )
+        self.force_authenticate_user()
+        response = self.client.patch(
+            path='/api/meetups/{}/questions/{}/answers/{}/downvote'.format(
+                self.meetup_id, self.question_id, answer.id),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data.get('vote_score'), -1)
+        flush_votes(self.buffer)
+        self.assertEqual(AnswerVote.objects.get(
+            answer=answer).vote, -1)
+
+    def test_flush_skips_deleted_questions(self) -> None:
+        """
+        Tests that votes on questions deleted before the flush are dropped
+        """
+        self.upvote()
+        self.question.delete()
+        self.assertEqual(flush_votes(self.buffer), 1)
+        self.assertEqual(QuestionVote.objects.count(), 0)
+
+    def test_votes_in_flight_stay_pending(self) -> None:
+        """
+        Tests that votes drained by a flush that has not committed are
+        still counted and replaced, and are merged back when it fails
+        """
+        self.upvote()
+        self.buffer.drain(settings.VOTE_BUFFER_BATCH_SIZE)
+        response = self.upvote()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.downvote()
+        vote = response.data['data'][0]
+        self.assertEqual((vote.get('upvotes'), vote.get('downvotes')), (0, 1))
+        self.buffer.restore([])
+        self.assertEqual(flush_votes(self.buffer), 1)
+        self.assertEqual(QuestionVote.objects.get().vote, -1)
+        self.assertEqual(Question.objects.get(id=self.question_id).votes, {
+            'upvotes': 0,
+            'downvotes': 1,
+            'vote_score': -1
+        })
+
+    def test_bulk_vote_replaces_buffered_vote(self) -> None:
+        """
+        Tests that a bulk vote replaces a buffered vote of the user instead
+        of being overwritten by it on the next flush
+        """
+        self.upvote()
+        response = self.client.post(
+            path='/api/meetups/{}/votes'.format(self.meetup_id),
+            data={'questions': [{'id': str(self.question_id), 'vote': 'downvote'}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        result = response.data['data']['questions'][0]
+        self.assertEqual(result.get('message'), 'You have successfully updated your vote')
+        self.assertEqual((result.get('upvotes'), result.get('downvotes')), (0, 1))
+        flush_votes(self.buffer)
+        self.assertEqual(QuestionVote.objects.get().vote, -1)
+        self.assertEqual(Question.objects.get(id=self.question_id).votes, {
+            'upvotes': 0,
+            'downvotes': 1,
+            'vote_score': -1
+        })
+
+    def test_vote_cost_ignores_pending_voters(self) -> None:
+        """
+        Tests that buffering a vote does not read the pending votes of
+        other users
+        """
+        for number in range(5):
+            voter = User.objects.create_user(
+                name='Voter {}'.format(number),
+                email='voter{}@questioner.com'.format(number),
+                password='@Users123'
+            )
+            buffer_vote(QUESTION, self.question_id, voter.id, 'downvote')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upvote()
+        self.assertEqual(response.data['data'][0].get('upvotes'), 1)
+        self.assertEqual(response.data['data'][0].get('downvotes'), 5)
+        self.assertFalse([query for query in queries
+                          if 'users_user' in query['sql'] and ' IN ' in query['sql']])
+        self.assertEqual(len([query for query in queries
+                              if 'questions_questionvote' in query['sql']]), 1)
+
+    def test_buffer_errors_are_not_missing_questions(self) -> None:
+        """
+        Tests that errors of the buffer backend are not reported as a
+        question that does not exist
+        """
+        self.force_authenticate_user()
+        with mock.patch('questions.views.buffer_vote',
+                        side_effect=ConnectionError('vote buffer is down')):
+            with self.assertRaises(ConnectionError):
+                self.upvote_question()
+
+
+class TestConcurrentVotes(TransactionTestCase):
+    """
+    Tests votes of one user written by concurrent transactions
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            email='voter@questioner.com', name='Voter', nick_name='voter', password='@Users123')
+        meetup = Meetup.objects.create(
+            title='Test Driven Development',
+            body='Developers need to discuss test driven development',
+            location='Andela Campus',
+            creator=self.user,
+            scheduled_date=timezone.now() + timezone.timedelta(days=3)
+        )
+        self.question = Question.objects.create(
+            title='What is that supposed to be',
+            body='I was wondering what the meetup is for',
+            meetup=meetup,
+            created_by=self.user
+        )
+        self.answer = Answer.objects.create(
+            body='It is a meetup about testing', creator=self.user, question=self.question)
+
+    def race(self, manager, key) -> Dict:
+        """
+        Upvotes key in a transaction held open while a second transaction
+        downvotes key, returns the changes of the second transaction
+        """
+        upvoted = threading.Event()
+        release = threading.Event()
+        changes = {}
+
+        def upvote():
+            with transaction.atomic():
+                manager.upsert_voter_votes({key: 1})
+                upvoted.set()
+                release.wait(5)
+            connection.close()
+
+        def downvote():
+            upvoted.wait(5)
+            changes.update(manager.upsert_voter_votes({key: -1}))
+            connection.close()
+
+        threads = [threading.Thread(target=upvote), threading.Thread(target=downvote)]
+        for thread in threads:
+            thread.start()
+        # let the downvote wait on the uncommitted upvote
+        time.sleep(0.5)
+        release.set()
+        for thread in threads:
+            thread.join(10)
+        return changes
+
+    def test_concurrent_first_votes(self) -> None:
+        """
+        Tests that a first vote overwritten by a concurrent vote of the same
+        user moves the counters by the overwritten vote
+        """
+        changes = self.race(QuestionVote.objects, (self.question.id, self.user.id))
+        self.assertEqual(changes[(self.question.id, self.user.id)].previous_vote, 1)
+        self.assertEqual(QuestionVote.objects.get().vote, -1)
+        self.assertEqual(Question.objects.get(id=self.question.id).votes, {
+            'upvotes': 0,
+            'downvotes': 1,
+            'vote_score': -1
+        })
+        changes = self.race(AnswerVote.objects, (self.answer.id, self.user.id))
+        self.assertEqual(changes, {(self.answer.id, self.user.id): 1})
@@ -4,10 +4,14 @@ Urls for questions Epic
 
 from django.urls import path
 from questions.views import (QuestionViews, ViewQuestionsView,
-                             UpvoteQuestion, DownvoteQuestion, QuestionEditViews, ViewSpecificQuestionView)
+                             UpvoteQuestion, DownvoteQuestion, QuestionEditViews, ViewSpecificQuestionView,
+                             SearchQuestionsView, BulkVoteView, QuestionThreadView)
 urlpatterns = [
     path('<str:id>/questions/', QuestionViews.as_view(), name='question'),
     path('<str:id>/questions', ViewQuestionsView.as_view(), name='view_questions'),
+    path('<str:id>/questions/search',
+         SearchQuestionsView.as_view(), name='search_questions'),
+    path('<str:meetup_id>/votes', BulkVoteView.as_view(), name='bulk_votes'),
     path('<str:meetup_id>/questions/<str:question_id>/upvote',
          UpvoteQuestion.as_view(), name='upvote_question'),
     path('<str:meetup_id>/questions/<str:question_id>/downvote',
@@ -18,4 +22,6 @@ urlpatterns = [
          QuestionEditViews.as_view(), name='edit_question'),
     path('<str:m_id>/questions/<str:id>',
          ViewSpecificQuestionView.as_view(), name='specific_question'),
+    path('<str:m_id>/questions/<str:id>/thread',
+         QuestionThreadView.as_view(), name='question_thread'),
 ]
@@ -1,15 +1,39 @@
+import uuid
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, _get_queryset
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
 from utils.validators import valid_question
 from rest_framework import permissions, status
 from rest_framework.views import APIView, Response, Request
-from rest_framework.pagination import PageNumberPagination
+from utils.conditional import make_etag, not_modified, set_validators
+from utils.pagination import get_paginator
 from questions.models import Question, QuestionVote
-from questions.serializers import QuestionsSerializer, ViewQuestionsSerializer, UpdateQuestionSerializer
+from questions.vote_buffer import (
+    ANSWER,
+    QUESTION,
+    add_buffered_scores,
+    buffer_vote,
+    buffer_votes,
+    buffered_scores,
+    get_vote_buffer
+)
+from questions.serializers import (
+    QuestionsSerializer,
+    ViewQuestionsSerializer,
+    UpdateQuestionSerializer,
+    SimilarQuestionSerializer
+)
+from meetups.events import publish, publish_many
 from meetups.models import Meetup
+from answers.models import Answer, AnswerVote
+from answers.serializers import GetAnswerSerializer
 from utils.validators import valid_string
 from utils.token_validation import TokenAllowedPermission
 from users.serializers import FetchUserSerializer
+from typing import Dict, List, Tuple
 
 
 class QuestionViews(APIView):
@@ -26,25 +50,36 @@ class QuestionViews(APIView):
             queryset = Meetup.objects.all()
             request.data['created_by'] = request.user
             serializer = QuestionsSerializer(data=request.data)
-            q_title = Question.objects.filter(title=request.data.get('title'))
-            q_body = Question.objects.filter(body=request.data.get('body'))
             if serializer.is_valid():
-                if q_title and q_body:
-                    return Response({
-                        "error": "Question already exist"
-                    }, status=status.HTTP_400_BAD_REQUEST)
                 title_input = valid_string(request.data.get('title'))
                 body_input = valid_string(request.data.get('body'))
                 if title_input == True and body_input == True:
-                    Question.objects.update_or_create(
-                        title=request.data.get('title').strip(),
-                        body=request.data.get('body').strip(),
-                        defaults={
-                            'meetup': get_object_or_404(queryset, id=id),
-                            'created_by': request.data.get('created_by')
-                        }
-                    )
-                    return Response(serializer.data, status=status.HTTP_201_CREATED)
+                    meetup = get_object_or_404(queryset, id=id)
+                    try:
+                        with transaction.atomic():
+                            question = Question.objects.create(
+                                title=request.data.get('title').strip(),
+                                body=request.data.get('body').strip(),
+                                meetup=meetup,
+                                created_by=request.data.get('created_by')
+                            )
+                    except IntegrityError:
+                        return Response({
+                            "error": "Question already exist"
+                        }, status=status.HTTP_400_BAD_REQUEST)
+                    publish(meetup.id, 'question', {
+                        'id': question.id,
+                        'title': question.title,
+                        'created_by': question.created_by_id,
+                        'created_at': question.created_at
+                    })
+                    similar_questions = Question.objects.filter(
+                        meetup=meetup).exclude(id=question.id).similar_to(
+                            question.title)
+                    data = dict(serializer.data)
+                    data['similar_questions'] = SimilarQuestionSerializer(
+                        similar_questions, many=True).data
+                    return Response(data, status=status.HTTP_201_CREATED)
                 return Response({"error": "You cannot post special characters"}, status=status.HTTP_400_BAD_REQUEST)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except ValidationError as e:
@@ -79,26 +114,28 @@ class QuestionEditViews(APIView):
                 owner = question.created_by
                 if owner.id == request.user.id:
 
-                    obj = Question.objects.get(id=id)
-                    u_title = Question.objects.filter(
-                        title=request.data.get('title'))
-                    u_body = Question.objects.filter(
-                        body=request.data.get('body'))
+                    obj = question
                     if request.data.get('title'):
-                        if u_title:
+                        newtitle = request.data.get('title').strip()
+                        if newtitle == obj.title:
                             return Response({
                                 "message": "Question title is upto date"
                             }, status=status.HTTP_400_BAD_REQUEST)
-                        newtitle = request.data.get('title').strip()
                         obj.title = newtitle
                     if request.data.get('body'):
-                        if u_body:
+                        newbody = request.data.get('body').strip()
+                        if newbody == obj.body:
                             return Response({
                                 "message": "Question body upto date"
                             }, status=status.HTTP_400_BAD_REQUEST)
-                        newbody = request.data.get('body').strip()
                         obj.body = newbody
-                    obj.save()
+                    try:
+                        with transaction.atomic():
+                            obj.save()
+                    except IntegrityError:
+                        return Response({
+                            "error": "Question already exist"
+                        }, status=status.HTTP_400_BAD_REQUEST)
                     serializer = UpdateQuestionSerializer(obj)
                     context = {
                         'message': 'You have successfully updated the question',
@@ -168,15 +205,16 @@ class ViewQuestionsView(APIView):
 
     def get(self, request, id=None):
         """
-        Endpoint for fetching all questions specific to the meetup id specified
+        Endpoint for fetching all questions specific to the meetup id specified,
+        ?ordering=top returns the highest scored questions first
         """
-        questions = Question.objects.filter(meetup_id=id)
-        if questions:
-            page_limit = request.GET.get('page_limit')
-            if not page_limit:
-                page_limit = 10
-            pagination_class = PageNumberPagination()
-            pagination_class.page_size = page_limit
+        questions = Question.objects.filter(meetup_id=id).with_votes()
+        ordering = 'created_at'
+        if request.query_params.get('ordering') == 'top':
+            questions = questions.top()
+            ordering = Question.TOP_ORDERING
+        if questions.exists():
+            pagination_class = get_paginator(request, ordering=ordering)
             page = pagination_class.paginate_queryset(questions, request)
             serializer = ViewQuestionsSerializer(page, many=True)
             paginated_response = pagination_class.get_paginated_response(
@@ -189,27 +227,65 @@ class ViewQuestionsView(APIView):
         return response
 
 
+class SearchQuestionsView(APIView):
+    """
+    A view for full text search over the questions of a meetup
+    GET /api/meetups/{meetupId}/questions/search?q=
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, id=None):
+        """
+        Endpoint for searching questions of a meetup, best matches first
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({
+                'error': 'Please provide a search query'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            questions = Question.objects.filter(
+                meetup_id=id).with_votes().search(text)
+            if not questions.exists():
+                return Response({
+                    'error': 'No questions match your search'
+                }, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError:
+            return Response({
+                'error': 'The specified meetup does not exist'
+            }, status=status.HTTP_404_NOT_FOUND)
+        pagination_class = get_paginator(
+            request, ordering=('-rank', 'created_at'))
+        page = pagination_class.paginate_queryset(questions, request)
+        serializer = ViewQuestionsSerializer(page, many=True)
+        return pagination_class.get_paginated_response(serializer.data)
+
+
 def give_vote(request: Request, meetup_id: str, question_id: str, vote_value: int) -> Response:
     """
     A function to handle voting
     """
     response = None
+    buffered_question = None
     try:
         meetup = Meetup.objects.get(id=meetup_id)
         try:
-            question_query = Question.objects.filter(
-                id=question_id, meetup=meetup)
-            if not question_query:
+            question = Question.objects.filter(
+                id=question_id, meetup=meetup).first()
+            if not question:
                 response = Response(
                     data={
                         'error': 'The meetup does not have a question with that id'
                     },
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            elif get_vote_buffer():
+                buffered_question = question
             else:
-                question = question_query[0]
                 user = request.user
-                if QuestionVote.objects.filter(user=user, question=question, vote=vote_value):
+                change = QuestionVote.objects.upsert_votes(
+                    user, {question.id: vote_value}).get(question.id)
+                if not change:
                     if vote_value == 1:
                         error_message = 'You cannot upvote a question more than once'
                     else:
@@ -221,54 +297,34 @@ def give_vote(request: Request, meetup_id: str, question_id: str, vote_value: in
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 else:
-                    vote, created = QuestionVote.objects.update_or_create(
-                        question=question,
-                        user=user,
-                        defaults={
-                            'vote': vote_value
-                        },
-                    )
-                    upvotes = QuestionVote.objects.filter(
-                        question=question, vote__gte=1).count()
-                    downvotes = QuestionVote.objects.filter(
-                        question=question, vote__lt=1).count()
-                    votes = upvotes-downvotes
+                    publish(question.meetup_id, 'question_votes', {
+                        'id': question.id,
+                        'upvotes': change.upvotes,
+                        'downvotes': change.downvotes,
+                        'vote_score': change.vote_score
+                    })
                     voter = FetchUserSerializer(
-                        vote.user.__dict__, many=False).data
-                    if created:
-                        response = Response(
-                            data={
-                                'data':
-                                [{
-                                    'question_id': vote.question.id,
-                                    'question_title': vote.question.title,
-                                    'question_body': vote.question.body,
-                                    'upvotes': upvotes,
-                                    'downvotes': downvotes,
-                                    'vote_score': votes,
-                                    'voter': voter
-                                }],
-                                'message': 'Vote submitted sucessfully'
-                            },
-                            status=status.HTTP_201_CREATED
-                        )
+                        user.__dict__, many=False).data
+                    if change.previous_vote is None:
+                        message = 'Vote submitted sucessfully'
                     else:
-                        response = Response(
-                            data={
-                                'data':
-                                [{
-                                    'question_id': vote.question.id,
-                                    'question_title': vote.question.title,
-                                    'question_body': vote.question.body,
-                                    'upvotes': upvotes,
-                                    'downvotes': downvotes,
-                                    'vote_score': votes,
-                                    'voter': voter
-                                }],
-                                'message': 'You have successfully updated your vote'
-                            },
-                            status=status.HTTP_201_CREATED
-                        )
+                        message = 'You have successfully updated your vote'
+                    response = Response(
+                        data={
+                            'data':
+                            [{
+                                'question_id': question.id,
+                                'question_title': question.title,
+                                'question_body': question.body,
+                                'upvotes': change.upvotes,
+                                'downvotes': change.downvotes,
+                                'vote_score': change.vote_score,
+                                'voter': voter
+                            }],
+                            'message': message
+                        },
+                        status=status.HTTP_201_CREATED
+                    )
         except:
             response = Response(
                 data={
@@ -283,9 +339,46 @@ def give_vote(request: Request, meetup_id: str, question_id: str, vote_value: in
             },
             status=status.HTTP_400_BAD_REQUEST
         )
+    if buffered_question:
+        # errors of the buffer backend are not reported as a missing question
+        response = buffer_question_vote(
+            buffered_question, request.user, vote_value)
     return response
 
 
+def buffer_question_vote(question: Question, user, vote_value: int) -> Response:
+    """
+    Accepts a question vote into the vote buffer, the vote is written
+    to the database by the next flush of the buffer
+    """
+    vote_type = 'upvote' if vote_value == 1 else 'downvote'
+    if not buffer_vote(QUESTION, question.id, user.id, vote_type):
+        return Response(
+            data={
+                'error': 'You cannot {} a question more than once'.format(vote_type)
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    scores = buffered_scores(QUESTION, question.id, question.votes)
+    publish(question.meetup_id, 'question_votes', dict(scores, id=question.id))
+    return Response(
+        data={
+            'data':
+            [{
+                'question_id': question.id,
+                'question_title': question.title,
+                'question_body': question.body,
+                'upvotes': scores['upvotes'],
+                'downvotes': scores['downvotes'],
+                'vote_score': scores['vote_score'],
+                'voter': FetchUserSerializer(user.__dict__, many=False).data
+            }],
+            'message': 'Vote accepted'
+        },
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
 class UpvoteQuestion(APIView):
     """
     A viw for handling question upvotes
@@ -326,6 +419,159 @@ class DownvoteQuestion(APIView):
         )
 
 
+VOTE_VALUES = {'upvote': 1, 'downvote': -1}
+
+
+def parse_bulk_votes(items: List, kind: str) -> Tuple[List[Dict], Dict]:
+    """
+    Validates the votes of a bulk vote request, returns a result for
+    every item and the vote type of every valid item keyed by its id
+    """
+    results = []
+    votes = {}
+    for item in items:
+        if not isinstance(item, dict):
+            results.append({'error': 'A vote must have an id and a vote'})
+            continue
+        result = {'id': item.get('id'), 'vote': item.get('vote')}
+        results.append(result)
+        if item.get('vote') not in VOTE_VALUES:
+            result['error'] = 'A vote must be an upvote or a downvote'
+            continue
+        try:
+            item_id = uuid.UUID(str(item.get('id')))
+        except ValueError:
+            result['error'] = 'The {} id is not valid'.format(kind)
+            continue
+        if item_id in votes:
+            result['error'] = 'The {} is voted more than once in the request'.format(
+                kind)
+            continue
+        result['uuid'] = item_id
+        votes[item_id] = item.get('vote')
+    return results, votes
+
+
+def bulk_vote_results(results: List[Dict], members: Dict, changed: Dict, kind: str) -> List[Dict]:
+    """
+    Completes the results of a bulk vote request with the outcome
+    of the upsert and the refreshed scores of the voted items
+    """
+    for result in results:
+        item_id = result.pop('uuid', None)
+        if item_id is None:
+            continue
+        if item_id not in members:
+            result['error'] = 'The meetup does not have {} {} with that id'.format(
+                'an' if kind == 'answer' else 'a', kind)
+            continue
+        if item_id not in changed:
+            result['error'] = 'You cannot {} {} {} more than once'.format(
+                result['vote'], 'an' if kind == 'answer' else 'a', kind)
+        elif changed[item_id] is None:
+            result['message'] = 'Vote submitted sucessfully'
+        else:
+            result['message'] = 'You have successfully updated your vote'
+        result.update(members[item_id])
+    return results
+
+
+class BulkVoteView(APIView):
+    """
+    A view for submitting many question and answer votes at once
+    POST /api/meetups/{meetupId}/votes
+    """
+    permission_classes = [permissions.IsAuthenticated, TokenAllowedPermission]
+
+    def post(self, request: Request, meetup_id: str) -> Response:
+        """
+        Checks that the voted questions and answers belong to the meetup with
+        one query per table and writes the votes with one upsert per table,
+        or pushes them to the vote buffer when it is enabled
+        """
+        try:
+            meetup = Meetup.objects.filter(id=meetup_id).first()
+        except ValidationError:
+            meetup = None
+        if not meetup:
+            return Response({
+                'error': 'A meetup with that id does not exist'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        question_items = request.data.get('questions') or []
+        answer_items = request.data.get('answers') or []
+        if not isinstance(question_items, list) or not isinstance(answer_items, list):
+            return Response({
+                'error': 'Questions and answers must be lists of votes'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not question_items and not answer_items:
+            return Response({
+                'error': 'Provide the questions or answers to vote'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(question_items) + len(answer_items) > settings.MAX_BULK_VOTES:
+            return Response({
+                'error': 'You cannot submit more than {} votes at once'.format(
+                    settings.MAX_BULK_VOTES)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        question_results, question_votes = parse_bulk_votes(
+            question_items, 'question')
+        answer_results, answer_votes = parse_bulk_votes(answer_items, 'answer')
+        question_ids = set(Question.objects.filter(
+            meetup=meetup, id__in=question_votes).values_list('id', flat=True))
+        answer_ids = set(Answer.objects.filter(
+            question__meetup=meetup, id__in=answer_votes).values_list('id', flat=True))
+        question_votes = {question_id: vote for question_id, vote in question_votes.items()
+                          if question_id in question_ids}
+        answer_votes = {answer_id: vote for answer_id, vote in answer_votes.items()
+                        if answer_id in answer_ids}
+        buffered = bool(get_vote_buffer())
+        if buffered:
+            # pending votes of the user are replaced in the buffer, a later
+            # flush never overwrites these votes with older ones
+            changed_questions = {
+                question_id: previous or None for question_id, previous in buffer_votes(
+                    QUESTION, request.user.id, question_votes).items()
+            }
+            changed_answers = {
+                answer_id: previous or None for answer_id, previous in buffer_votes(
+                    ANSWER, request.user.id, answer_votes).items()
+            }
+        else:
+            with transaction.atomic():
+                question_changes = QuestionVote.objects.upsert_votes(request.user, {
+                    question_id: VOTE_VALUES[vote]
+                    for question_id, vote in question_votes.items()
+                })
+                changed_answers = AnswerVote.objects.upsert_votes(request.user, {
+                    answer_id: VOTE_VALUES[vote] for answer_id, vote in answer_votes.items()
+                })
+            changed_questions = {question_id: change.previous_vote
+                                 for question_id, change in question_changes.items()}
+        scores = ('upvotes', 'downvotes', 'vote_score')
+        questions = add_buffered_scores(QUESTION, {
+            question.pop('id'): question for question in Question.objects.filter(
+                id__in=question_ids).values('id', *scores)
+        } if question_ids else {})
+        answers = add_buffered_scores(ANSWER, {
+            answer.pop('id'): answer for answer in Answer.objects.filter(
+                id__in=answer_ids).with_votes().values('id', *scores)
+        } if answer_ids else {})
+        publish_many(meetup.id, [
+            ('question_votes', dict(questions[question_id], id=question_id))
+            for question_id in changed_questions
+        ] + [
+            ('answer_votes', dict(answers[answer_id], id=answer_id))
+            for answer_id in changed_answers
+        ])
+        return Response({
+            'data': {
+                'questions': bulk_vote_results(
+                    question_results, questions, changed_questions, 'question'),
+                'answers': bulk_vote_results(
+                    answer_results, answers, changed_answers, 'answer')
+            }
+        }, status=status.HTTP_202_ACCEPTED if buffered else status.HTTP_200_OK)
+
+
 class ViewSpecificQuestionView(APIView):
     """
     Class for viewing specific question
@@ -344,7 +590,8 @@ class ViewSpecificQuestionView(APIView):
         try:
             meetup_id = Question.objects.filter(meetup_id=m_id).first()
             if meetup_id:
-                question = Question.objects.filter(id=id).first()
+                question = Question.objects.filter(
+                    id=id).with_votes().first()
                 if question:
                     serializer = ViewQuestionsSerializer(question)
                     return Response({'question': serializer.data}, status.HTTP_200_OK)
@@ -357,3 +604,60 @@ class ViewSpecificQuestionView(APIView):
         except ValidationError:
             data = {'error': 'The specified question does not exist'}
             return Response(data, status.HTTP_404_NOT_FOUND)
+
+
+class QuestionThreadView(APIView):
+    """
+    A view for fetching a question with its first page of answers
+    GET /api/meetups/{meetupId}/questions/{questionId}/thread
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request: Request, m_id: str, id: str) -> Response:
+        """
+        Returns the question, a page of its answers and their vote statistics
+        in a fixed number of queries, answers 304 while the thread is unchanged
+        """
+        try:
+            question = Question.objects.filter(
+                id=id, meetup_id=m_id).with_votes().annotate(
+                    votes_updated=Max('questionvote__updated_on')).first()
+        except ValidationError:
+            question = None
+        if not question:
+            return Response({
+                "error": "That question is not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+        answers = Answer.objects.filter(question=question)
+        activity = answers.aggregate(
+            answer_count=Count('id', distinct=True),
+            answers_updated=Max('date_updated_on'),
+            vote_count=Count('answervote'),
+            votes_updated=Max('answervote__updated_on')
+        )
+        last_modified = max(filter(None, (
+            question.updated_at,
+            question.votes_updated,
+            activity['answers_updated'],
+            activity['votes_updated']
+        )))
+        etag = make_etag(
+            question.updated_at,
+            question.upvotes,
+            question.downvotes,
+            activity['answer_count'],
+            activity['vote_count'],
+            last_modified,
+            request.get_full_path()
+        )
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            pagination_class = get_paginator(request, ordering='-date_created_on')
+            page = pagination_class.paginate_queryset(
+                answers.with_votes(), request)
+            response = Response({
+                'question': ViewQuestionsSerializer(question).data,
+                'answers': pagination_class.get_paginated_response(
+                    GetAnswerSerializer(page, many=True).data).data
+            }, status=status.HTTP_200_OK)
+        return set_validators(response, etag, last_modified)
@@ -0,0 +1,502 @@
+"""
+Write-behind buffering of question and answer votes. When enabled the vote
+endpoints only validate a vote and push it to a buffer, buffered votes are
+written to the database in batches by flush_votes
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from answers.models import Answer, AnswerVote
+from questions.models import Question, QuestionVote
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+QUESTION = 'question'
+ANSWER = 'answer'
+VOTE_VALUES = {'upvote': 1, 'downvote': -1}
+
+# kind, item id, user id, vote type, vote type stored when the user first
+# voted or ''
+Entry = Tuple[str, str, str, str, str]
+
+
+class MemoryVoteBuffer:
+    """
+    Buffers votes in the memory of the process for single node setups.
+    Votes are flushed by a background thread every flush interval and the
+    votes not flushed yet are lost if the process dies. Drained votes stay
+    in flight, counted as pending, until their flush commits
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.votes = OrderedDict()
+        self.deltas = {}
+        self.inflight = {}
+        self.inflight_deltas = {}
+        self.flusher = None
+        atexit.register(self.flush_all)
+
+    def pending_vote(self, key: Tuple[str, str], user_id: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns the buffered or in flight vote of a user on an item and the
+        vote stored when the user first voted
+        """
+        entry = self.votes.get(key, {}).get(user_id)
+        if entry is None:
+            entry = self.inflight.get(key, {}).get(user_id)
+            if entry is not None:
+                # the vote in flight is the stored vote once its flush commits
+                entry = (entry[0], entry[0])
+        return entry
+
+    def pending_votes(self, kind: str, user_id: str, item_ids: List[str]) -> Dict[str, str]:
+        """
+        Returns the buffered votes of a user on questions or answers by item id
+        """
+        votes = {}
+        with self.lock:
+            for item_id in item_ids:
+                entry = self.pending_vote((kind, item_id), user_id)
+                if entry:
+                    votes[item_id] = entry[0]
+        return votes
+
+    def push(self, kind: str, item_id: str, user_id: str, vote: str, stored: str) -> Optional[str]:
+        """
+        Buffers the vote of a user, replacing a pending vote of the user, and
+        moves the pending deltas of the item. stored is the vote of the user
+        in the database, '' when there is none. Returns the vote replaced,
+        '' for a first vote, or None when vote is already the current vote
+        """
+        key = (kind, item_id)
+        with self.lock:
+            previous, base = self.pending_vote(key, user_id) or (stored, stored)
+            if previous == vote:
+                return None
+            self.votes.setdefault(key, {})[user_id] = (vote, base)
+            self.move_deltas(self.deltas, key, vote, previous)
+        self.start_flusher()
+        return previous
+
+    def move_deltas(self, deltas: Dict, key: Tuple[str, str], vote: str, previous: str) -> None:
+        """
+        Counts vote in the deltas of an item in place of previous
+        """
+        counts = deltas.setdefault(key, Counter())
+        counts[vote] += 1
+        if previous:
+            counts[previous] -= 1
+
+    def pending_deltas(self, kind: str, item_ids: List[str]) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns the upvotes and downvotes the buffered and in flight votes
+        add to items
+        """
+        deltas = {}
+        with self.lock:
+            for item_id in item_ids:
+                buffered = self.deltas.get((kind, item_id), Counter())
+                inflight = self.inflight_deltas.get((kind, item_id), Counter())
+                deltas[item_id] = (buffered['upvote'] + inflight['upvote'],
+                                   buffered['downvote'] + inflight['downvote'])
+        return deltas
+
+    def drain(self, limit: int) -> List[Entry]:
+        """
+        Moves about limit of the oldest buffered votes in flight
+        """
+        entries = []
+        with self.lock:
+            while self.votes and len(entries) < limit:
+                key, votes = self.votes.popitem(last=False)
+                deltas = self.deltas.pop(key, Counter())
+                self.inflight.setdefault(key, {}).update(votes)
+                self.inflight_deltas.setdefault(key, Counter()).update(deltas)
+                entries.extend(key + (user_id, vote, base)
+                               for user_id, (vote, base) in votes.items())
+        return entries
+
+    def restore(self, entries: List[Entry]) -> None:
+        """
+        Puts back the votes in flight that could not be written, votes
+        pushed since the drain are kept and replace them from the vote
+        stored before the drained ones
+        """
+        with self.lock:
+            for key, votes in self.inflight.items():
+                buffered = self.votes.setdefault(key, {})
+                for user_id, (vote, base) in votes.items():
+                    if user_id in buffered:
+                        buffered[user_id] = (buffered[user_id][0], base)
+                    else:
+                        buffered[user_id] = (vote, base)
+                self.deltas.setdefault(key, Counter()).update(
+                    self.inflight_deltas.get(key, Counter()))
+            self.inflight.clear()
+            self.inflight_deltas.clear()
+
+    def acknowledge(self) -> None:
+        """
+        Drops the votes in flight once they are written
+        """
+        with self.lock:
+            self.inflight.clear()
+            self.inflight_deltas.clear()
+
+    def start_flusher(self) -> None:
+        """
+        Starts the background flusher thread when it is not running
+        """
+        if self.flush_interval <= 0:
+            return
+        with self.lock:
+            if self.flusher and self.flusher.is_alive():
+                return
+            self.flusher = threading.Thread(
+                target=self.run_flusher, name='vote-buffer-flusher', daemon=True)
+            self.flusher.start()
+
+    def run_flusher(self) -> None:
+        """
+        Flushes the buffer every flush interval
+        """
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush_all()
+            except Exception:
+                logger.exception('Flushing buffered votes failed')
+            finally:
+                close_old_connections()
+
+    def flush_all(self) -> None:
+        """
+        Flushes batches of votes until the buffer is empty
+        """
+        while flush_votes(self):
+            pass
+
+
+class RedisVoteBuffer:
+    """
+    Buffers votes in redis where they survive restarts of the web processes,
+    votes are flushed by the flush_vote_buffer command. A durable buffer
+    keeps drained votes in redis until they are committed to the database
+    so that a flush interrupted by a crash is retried by the next one.
+    The hash of an item maps user ids to their vote and the vote stored in
+    the database when they first voted, its :upvote and :downvote fields
+    hold the pending deltas of the item so that they are drained with it
+    """
+    prefix = 'vote_buffer'
+    # KEYS: item hash, pending set. ARGV: user id, vote, stored vote
+    push_script = """
+        local entry = redis.call('HGET', KEYS[1], ARGV[1])
+        local previous, base = ARGV[3], ARGV[3]
+        if entry then
+            local separator = string.find(entry, ':', 1, true)
+            previous = string.sub(entry, 1, separator - 1)
+            base = string.sub(entry, separator + 1)
+        end
+        if previous == ARGV[2] then
+            return false
+        end
+        redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. ':' .. base)
+        redis.call('HINCRBY', KEYS[1], ':' .. ARGV[2], 1)
+        if previous ~= '' then
+            redis.call('HINCRBY', KEYS[1], ':' .. previous, -1)
+        end
+        redis.call('SADD', KEYS[2], KEYS[1])
+        return previous
+    """
+    # KEYS: item hash, pending set. ARGV: user id, vote, stored vote
+    restore_script = """
+        if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2] .. ':' .. ARGV[3]) == 1 then
+            redis.call('HINCRBY', KEYS[1], ':' .. ARGV[2], 1)
+            if ARGV[3] ~= '' then
+                redis.call('HINCRBY', KEYS[1], ':' .. ARGV[3], -1)
+            end
+        end
+        redis.call('SADD', KEYS[2], KEYS[1])
+    """
+
+    def __init__(self, durable: bool):
+        self.redis = get_redis_connection('default')
+        self.durable = durable
+        self.pending_key = '{}:pending'.format(self.prefix)
+        self.inflight_key = '{}:inflight'.format(self.prefix)
+        self.inflight = []
+        self.push_vote = self.redis.register_script(self.push_script)
+        self.restore_vote = self.redis.register_script(self.restore_script)
+
+    def key(self, kind: str, item_id: str) -> str:
+        """
+        Returns the redis hash holding the buffered votes of an item
+        """
+        return '{}:{}:{}'.format(self.prefix, kind, item_id)
+
+    def pending_votes(self, kind: str, user_id: str, item_ids: List[str]) -> Dict[str, str]:
+        """
+        Returns the buffered votes of a user on questions or answers by item id
+        """
+        pipeline = self.redis.pipeline(transaction=False)
+        for item_id in item_ids:
+            pipeline.hget(self.key(kind, item_id), user_id)
+        return {item_id: entry.decode().split(':', 1)[0]
+                for item_id, entry in zip(item_ids, pipeline.execute()) if entry}
+
+    def push(self, kind: str, item_id: str, user_id: str, vote: str, stored: str) -> Optional[str]:
+        """
+        Buffers the vote of a user, replacing a pending vote of the user, and
+        moves the pending deltas of the item. stored is the vote of the user
+        in the database, '' when there is none. Returns the vote replaced,
+        '' for a first vote, or None when vote is already the current vote
+        """
+        previous = self.push_vote(
+            keys=[self.key(kind, item_id), self.pending_key],
+            args=[user_id, vote, stored])
+        return None if previous is None else previous.decode()
+
+    def pending_deltas(self, kind: str, item_ids: List[str]) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns the upvotes and downvotes the buffered votes add to items
+        """
+        pipeline = self.redis.pipeline(transaction=False)
+        for item_id in item_ids:
+            pipeline.hmget(self.key(kind, item_id), ':upvote', ':downvote')
+        return {item_id: (int(upvotes or 0), int(downvotes or 0))
+                for item_id, (upvotes, downvotes) in zip(item_ids, pipeline.execute())}
+
+    def drain(self, limit: int) -> List[Entry]:
+        """
+        Takes about limit buffered votes out of the buffer, a durable
+        buffer also takes the votes left over by an interrupted flush
+        """
+        votes = OrderedDict()
+        if self.durable:
+            for inflight in self.redis.smembers(self.inflight_key):
+                inflight = inflight.decode()
+                self.read_hash(inflight, inflight.rsplit(':', 1)[0], votes)
+                self.inflight.append(inflight)
+        while len(votes) < limit:
+            key = self.redis.spop(self.pending_key)
+            if key is None:
+                break
+            key = key.decode()
+            if self.durable:
+                inflight = '{}:{}'.format(key, uuid.uuid4().hex)
+                pipeline = self.redis.pipeline()
+                pipeline.sadd(self.inflight_key, inflight)
+                pipeline.rename(key, inflight)
+                try:
+                    pipeline.execute()
+                except ResponseError:
+                    # the key was emptied by an earlier drain
+                    self.redis.srem(self.inflight_key, inflight)
+                    continue
+                self.inflight.append(inflight)
+                self.read_hash(inflight, key, votes)
+            else:
+                pipeline = self.redis.pipeline()
+                pipeline.hgetall(key)
+                pipeline.delete(key)
+                items, deleted = pipeline.execute()
+                self.add_votes(key, items, votes)
+        return [vote_key + entry for vote_key, entry in votes.items()]
+
+    def read_hash(self, name: str, key: str, votes: Dict) -> None:
+        """
+        Reads the votes of the hash name buffered under key into votes
+        """
+        self.add_votes(key, self.redis.hgetall(name), votes)
+
+    def add_votes(self, key: str, items: Dict, votes: Dict) -> None:
+        """
+        Adds the votes of a redis hash to votes keyed by kind, item id and
+        user id, the pending deltas of the hash are left out
+        """
+        prefix, kind, item_id = key.split(':')
+        for user_id, entry in items.items():
+            user_id = user_id.decode()
+            if not user_id.startswith(':'):
+                votes[(kind, item_id, user_id)] = tuple(entry.decode().split(':', 1))
+
+    def restore(self, entries: List[Entry]) -> None:
+        """
+        Puts back drained votes that could not be written, votes pushed
+        since the drain are kept
+        """
+        pipeline = self.redis.pipeline()
+        for kind, item_id, user_id, vote, base in entries:
+            self.restore_vote(keys=[self.key(kind, item_id), self.pending_key],
+                              args=[user_id, vote, base], client=pipeline)
+        pipeline.execute()
+        self.acknowledge()
+
+    def acknowledge(self) -> None:
+        """
+        Drops the drained votes of a durable buffer once they are written
+        """
+        if self.inflight:
+            pipeline = self.redis.pipeline()
+            pipeline.delete(*self.inflight)
+            pipeline.srem(self.inflight_key, *self.inflight)
+            pipeline.execute()
+            self.inflight = []
+
+
+_buffers = {}
+
+
+def get_vote_buffer():
+    """
+    Returns the vote buffer configured by VOTE_BUFFER, None when
+    votes are written synchronously
+    """
+    backend = settings.VOTE_BUFFER
+    if not backend:
+        return None
+    key = (backend, settings.VOTE_BUFFER_DURABLE,
+           settings.VOTE_BUFFER_FLUSH_INTERVAL)
+    if key not in _buffers:
+        if backend == 'memory':
+            _buffers[key] = MemoryVoteBuffer(
+                settings.VOTE_BUFFER_FLUSH_INTERVAL)
+        elif backend == 'redis':
+            _buffers[key] = RedisVoteBuffer(settings.VOTE_BUFFER_DURABLE)
+        else:
+            raise ValueError('Unknown vote buffer {}'.format(backend))
+    return _buffers[key]
+
+
+def flush_votes(buffer, batch_size: Optional[int] = None) -> int:
+    """
+    Writes a batch of buffered votes to the database with one upsert per
+    vote table and returns the number of votes taken from the buffer.
+    Votes on questions, answers or users deleted since are dropped
+    """
+    entries = buffer.drain(batch_size or settings.VOTE_BUFFER_BATCH_SIZE)
+    if not entries:
+        return 0
+    item_ids = {QUESTION: set(), ANSWER: set()}
+    for kind, item_id, user_id, vote, base in entries:
+        item_ids[kind].add(item_id)
+    try:
+        with transaction.atomic():
+            questions = existing_ids(Question, item_ids[QUESTION])
+            answers = existing_ids(Answer, item_ids[ANSWER])
+            users = existing_ids(User, {entry[2] for entry in entries})
+            question_votes = {}
+            answer_votes = {}
+            for kind, item_id, user_id, vote, base in entries:
+                if user_id not in users:
+                    continue
+                if kind == QUESTION and item_id in questions:
+                    question_votes[(item_id, user_id)] = VOTE_VALUES[vote]
+                elif kind == ANSWER and item_id in answers:
+                    answer_votes[(item_id, user_id)] = VOTE_VALUES[vote]
+            QuestionVote.objects.upsert_voter_votes(question_votes)
+            AnswerVote.objects.upsert_voter_votes(answer_votes)
+    except Exception:
+        buffer.restore(entries)
+        raise
+    buffer.acknowledge()
+    return len(entries)
+
+
+def existing_ids(model, ids: Iterable[str]) -> set:
+    """
+    Returns the ids among ids that still exist in the table of model
+    """
+    if not ids:
+        return set()
+    return {str(pk) for pk in model.objects.filter(
+        pk__in=ids).values_list('pk', flat=True)}
+
+
+def stored_votes(kind: str, user_id: str, item_ids: List[str]) -> Dict[str, str]:
+    """
+    Returns the vote types stored in the database for a user on
+    questions or answers by item id
+    """
+    if not item_ids:
+        return {}
+    if kind == QUESTION:
+        votes = QuestionVote.objects.filter(
+            user_id=user_id, question_id__in=item_ids).values_list('question_id', 'vote')
+    else:
+        votes = AnswerVote.objects.filter(
+            creator_id=user_id, answer_id__in=item_ids).values_list('answer_id', 'vote')
+    return {str(item_id): 'upvote' if vote >= 1 else 'downvote'
+            for item_id, vote in votes}
+
+
+def buffer_votes(kind: str, user_id, votes: Dict) -> Dict:
+    """
+    Pushes the votes of a user on questions or answers to the buffer and
+    returns the vote type every accepted vote replaced, '' for a first
+    vote, keyed like votes. Votes repeating the current vote of the user
+    are not buffered and left out. The database is only read for the items
+    the user has no buffered vote on
+    """
+    buffer = get_vote_buffer()
+    user_id = str(user_id)
+    keys = {str(item_id): item_id for item_id in votes}
+    pending = buffer.pending_votes(kind, user_id, list(keys))
+    stored = stored_votes(
+        kind, user_id, [item_id for item_id in keys if item_id not in pending])
+    accepted = {}
+    for item_id, key in keys.items():
+        previous = buffer.push(
+            kind, item_id, user_id, votes[key], stored.get(item_id, ''))
+        if previous is not None:
+            accepted[key] = previous
+    return accepted
+
+
+def buffer_vote(kind: str, item_id, user_id, vote: str) -> bool:
+    """
+    Pushes the vote of a user to the buffer, returns False without
+    buffering when the vote is already the current vote of the user
+    """
+    return bool(buffer_votes(kind, user_id, {item_id: vote}))
+
+
+def add_buffered_scores(kind: str, scores: Dict) -> Dict:
+    """
+    Adds the pending deltas of the buffer to the stored vote statistics of
+    questions or answers keyed by item id, scores lag the votes by at most
+    one flush
+    """
+    buffer = get_vote_buffer()
+    if not buffer or not scores:
+        return scores
+    deltas = buffer.pending_deltas(kind, [str(item_id) for item_id in scores])
+    buffered = {}
+    for item_id, item_scores in scores.items():
+        upvotes, downvotes = deltas[str(item_id)]
+        upvotes += item_scores['upvotes']
+        downvotes += item_scores['downvotes']
+        buffered[item_id] = dict(item_scores, upvotes=upvotes, downvotes=downvotes,
+                                 vote_score=upvotes - downvotes)
+    return buffered
+
+
+def buffered_scores(kind: str, item_id, scores: Dict) -> Dict:
+    """
+    Adds the pending deltas of the buffer to the stored vote statistics of
+    a question or an answer
+    """
+    return add_buffered_scores(kind, {item_id: scores})[item_id]
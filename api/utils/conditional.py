@@ -0,0 +1,42 @@
+"""
+Conditional GET support for API views
+"""
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.request import Request
+
+
+def make_etag(*parts) -> str:
+    """
+    Returns a quoted entity tag derived from the given parts
+    """
+    digest = hashlib.sha1(
+        '\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return quote_etag(digest)
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> Optional[HttpResponse]:
+    """
+    Returns a 304 response when the validators sent by the client match
+    etag and last_modified, None when the response has to be rendered
+    """
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None
+    )
+
+
+def set_validators(response: HttpResponse, etag: str, last_modified: Optional[datetime]) -> HttpResponse:
+    """
+    Adds the ETag and Last-Modified headers to response
+    """
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
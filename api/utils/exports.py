@@ -0,0 +1,59 @@
+"""
+Streaming of rows as CSV or newline delimited JSON documents
+"""
+import csv
+import json
+from typing import Iterable, Iterator, Sequence
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Echo:
+    """
+    File-like object handing the lines written by csv.writer back
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_lines(columns: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    """
+    Yields a header line followed by one CSV line per row
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(columns: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    """
+    Yields one JSON object per row keyed by columns
+    """
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+FORMATS = {
+    'csv': ('text/csv', csv_lines),
+    'ndjson': ('application/x-ndjson', ndjson_lines),
+}
+
+
+def chunked(lines: Iterator[str], size: int = 64 * 1024) -> Iterator[str]:
+    """
+    Joins lines into chunks of about size characters so that a streaming
+    response does not write every line on its own
+    """
+    chunk = []
+    length = 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk = []
+            length = 0
+    if chunk:
+        yield ''.join(chunk)
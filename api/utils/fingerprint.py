@@ -0,0 +1,48 @@
+"""
+Content fingerprints used to detect duplicate posts through indexes
+"""
+import hashlib
+from typing import Tuple
+
+
+def content_fingerprint(*parts: str) -> str:
+    """
+    Returns the sha256 hex digest of the given text parts compared
+    case insensitively and with runs of whitespace collapsed
+    """
+    normalized = '\x1f'.join(
+        ' '.join((part or '').split()).lower() for part in parts)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def fill_fingerprints(queryset, fingerprint_field: str, content_fields: Tuple,
+                      scope_fields: Tuple, batch_size: int = 2000) -> None:
+    """
+    Fingerprints the rows of queryset in batches, used by data migrations.
+    A row whose fingerprint is already taken within its scope is left with
+    a NULL fingerprint so that existing duplicates do not break the unique
+    index on the fingerprint. Rows are walked scope by scope so that only
+    the fingerprints of the current scope are kept in memory
+    """
+    seen = set()
+    scope = None
+    batch = []
+    rows = queryset.order_by(*(scope_fields + ('pk',))).only(
+        'pk', *(content_fields + scope_fields))
+    for row in rows.iterator(chunk_size=batch_size):
+        key = tuple(getattr(row, field) for field in scope_fields)
+        if key != scope:
+            seen.clear()
+            scope = key
+        fingerprint = content_fingerprint(
+            *(getattr(row, field) for field in content_fields))
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        setattr(row, fingerprint_field, fingerprint)
+        batch.append(row)
+        if len(batch) >= batch_size:
+            queryset.model.objects.bulk_update(batch, [fingerprint_field])
+            batch = []
+    if batch:
+        queryset.model.objects.bulk_update(batch, [fingerprint_field])
@@ -0,0 +1,83 @@
+"""
+Rendering of iCalendar (RFC 5545) documents
+"""
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator
+
+PRODUCT_ID = '-//Questioner//Meetups//EN'
+LINE_LIMIT = 75
+
+
+def escape_text(value: str) -> str:
+    """
+    Escapes a text property value
+    """
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n'))
+
+
+def format_datetime(value: datetime) -> str:
+    """
+    Formats an aware datetime as a UTC date-time value
+    """
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def fold_line(line: str) -> str:
+    """
+    Folds a content line into lines of at most 75 octets, continuation
+    lines start with a space and characters are never split
+    """
+    parts = []
+    part = ''
+    size = 0
+    for character in line:
+        length = len(character.encode('utf-8'))
+        if size + length > LINE_LIMIT:
+            parts.append(part)
+            part = ' '
+            size = 1
+        part += character
+        size += length
+    parts.append(part)
+    return '\r\n'.join(parts)
+
+
+def event_lines(event: Dict) -> Iterator[str]:
+    """
+    Yields the content lines of an event, an event holds its uid, stamp,
+    start and summary and optionally its description, location, geo
+    position and last modification
+    """
+    yield 'BEGIN:VEVENT'
+    yield 'UID:' + event['uid']
+    yield 'DTSTAMP:' + format_datetime(event['stamp'])
+    yield 'DTSTART:' + format_datetime(event['start'])
+    yield 'SUMMARY:' + escape_text(event['summary'])
+    if event.get('description'):
+        yield 'DESCRIPTION:' + escape_text(event['description'])
+    if event.get('location'):
+        yield 'LOCATION:' + escape_text(event['location'])
+    if event.get('geo'):
+        yield 'GEO:{};{}'.format(*event['geo'])
+    if event.get('last_modified'):
+        yield 'LAST-MODIFIED:' + format_datetime(event['last_modified'])
+    yield 'END:VEVENT'
+
+
+def render_calendar(name: str, events: Iterable[Dict]) -> str:
+    """
+    Renders a calendar named name holding events
+    """
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:' + PRODUCT_ID,
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:' + escape_text(name),
+    ]
+    for event in events:
+        lines.extend(event_lines(event))
+    lines.append('END:VCALENDAR')
+    return ''.join(fold_line(line) + '\r\n' for line in lines)
@@ -0,0 +1,46 @@
+"""
+Pagination classes shared by the list endpoints
+"""
+from django.conf import settings
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination
+)
+from rest_framework.request import Request
+from typing import Tuple, Union
+
+
+class PageLimitPagination(PageNumberPagination):
+    """
+    Page number pagination sized by the page_limit query parameter
+    """
+    page_size = 10
+    page_size_query_param = 'page_limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class PageLimitCursorPagination(CursorPagination):
+    """
+    Keyset pagination sized by the page_limit query parameter, pages are
+    fetched by seeking on the ordering of the endpoint instead of an OFFSET
+    and no COUNT(*) is run
+    """
+    page_size = 10
+    page_size_query_param = 'page_limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def __init__(self, ordering: Union[str, Tuple]):
+        self.ordering = ordering
+
+
+def get_paginator(request: Request, ordering: Union[str, Tuple]) -> BasePagination:
+    """
+    Returns a cursor paginator keyed on ordering when the client asks
+    for cursor pagination, a page number paginator otherwise
+    GET /api/meetups/?pagination=cursor
+    """
+    if (request.query_params.get('pagination') == 'cursor'
+            or request.query_params.get('cursor')):
+        return PageLimitCursorPagination(ordering)
+    return PageLimitPagination()
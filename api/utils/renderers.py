@@ -0,0 +1,46 @@
+"""
+Renderers for responses that are not plain JSON
+"""
+import json
+from typing import Dict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+def format_event(event: str, data: Dict) -> str:
+    """
+    Formats an event as a server-sent event
+    """
+    return 'event: {}\ndata: {}\n\n'.format(
+        event, json.dumps(data, cls=DjangoJSONEncoder))
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Renderer for server-sent event streams, the events themselves are
+    streamed by the view and responses rendered by this renderer are
+    errors sent as a single error event
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event('error', data).encode(self.charset)
+
+
+class CalendarRenderer(BaseRenderer):
+    """
+    Renderer for iCalendar feeds, the feeds themselves are rendered by
+    the view and responses rendered by this renderer are errors sent as
+    plain text
+    """
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'error' in data:
+            data = data['error']
+        return str(data).encode(self.charset)
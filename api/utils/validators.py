@@ -4,7 +4,7 @@ A collection of validators used for Questioner application
 from validator_collection import checkers
 import re
 from rest_framework.request import Request
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 def valid_string(input_string: str) -> bool:
     """
@@ -25,37 +25,39 @@ def valid_url(input_url: str) -> bool:
     return checkers.is_url(input_url)
 
 
-def valid_meetup(request: Request) -> Tuple:
+def meetup_errors(data: Dict) -> List[Dict]:
     """
-    Validates meeetup data that is not handled by django
+    Returns the errors of meeetup data that are not handled by django
     """
-    data = request.data
     errors = []
-    is_valid = True
     if data.get('title') and not valid_string(data.get('title')):
         errors.append({
             'error': '{} is not a valid meetup title'.format(data.get('title'))
         })
-        is_valid = False
     elif data.get('body') and not valid_string(data.get('body')):
         errors.append({
             'error': '{} is not a valid meetup body'.format(data.get('body'))
         })
-        is_valid = False
     elif data.get('location') and not valid_string(data.get('location')):
         errors.append({
             'error': '{} is not a valid meetup location'.format(data.get('location'))
         })
-        is_valid = False
     if data.get('images'):
         for image in data.get('images'):
             if not valid_url(image):
-                is_valid = False
                 errors.append({
                     'error': '{} is not a valid image url'.format(image)
                 })
                 break
-    return is_valid, errors
+    return errors
+
+
+def valid_meetup(request: Request) -> Tuple:
+    """
+    Validates meeetup data that is not handled by django
+    """
+    errors = meetup_errors(request.data)
+    return not errors, errors
 
 
 def valid_question(request: Request) -> Tuple: